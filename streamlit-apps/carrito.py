@@ -0,0 +1,164 @@
+"""
+Carrito de pedido en columnas NumPy para la app de pedidos (reybanpac.py).
+
+Cada línea ocupa una posición en arreglos paralelos (precio base, precio de
+lista, descuento, cantidad, marca de línea ajustada y los importes
+derivados), que crecen por duplicación de capacidad. Los totales del pedido (total global, pérdida por
+descuentos y monto recuperado con líneas ajustadas) se mantienen al agregar
+o quitar una línea sumando o restando solo esa línea; el recálculo
+vectorizado de todas las líneas se reserva para las ediciones masivas.
+Las fórmulas de importes son las de ``precios.py``, compartidas con la
+tarificación por lotes.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from precios import importes, recuperacion
+
+
+class Carrito:
+    """Líneas del pedido en columnas, con totales incrementales"""
+
+    _COLUMNAS = {
+        'id': np.int64,
+        'precio_base': np.float64,
+        'precio_lista': np.float64,
+        'descuento': np.float64,
+        'cantidad': np.int64,
+        'ajustado': np.bool_,
+        'precio_desc': np.float64,
+        'total': np.float64,
+        'perdida': np.float64,
+    }
+
+    def __init__(self, capacidad: int = 16):
+        self._n = 0
+        self._siguiente_id = 0
+        self._datos = {nombre: np.zeros(capacidad, dtype=tipo) for nombre, tipo in self._COLUMNAS.items()}
+        self.productos: List[str] = []
+        self.sugerencias: List[List[Dict]] = []
+        self.total_global = 0.0
+        self.perdida_total = 0.0
+        self.ganancia_extra = 0.0
+        # Cambia con cada modificación: sirve de clave para widgets que muestran el carrito
+        self.version = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __bool__(self) -> bool:
+        return self._n > 0
+
+    def columna(self, nombre: str) -> np.ndarray:
+        """Vista (sin copia) de una columna, solo con las líneas ocupadas"""
+        return self._datos[nombre][:self._n]
+
+    @property
+    def faltante(self) -> float:
+        """Pérdida que las líneas ajustadas aún no cubren (0 si ya está recuperada)"""
+        return max(self.perdida_total - self.ganancia_extra, 0.0)
+
+    @property
+    def recuperado(self) -> bool:
+        return self.ganancia_extra >= self.perdida_total
+
+    def _crecer(self):
+        capacidad = max(2 * len(self._datos['id']), 16)
+        for nombre, columna in self._datos.items():
+            ampliada = np.zeros(capacidad, dtype=columna.dtype)
+            ampliada[:self._n] = columna[:self._n]
+            self._datos[nombre] = ampliada
+
+    def _sumar(self, i: int, signo: int):
+        datos = self._datos
+        self.total_global += signo * datos['total'][i]
+        self.perdida_total += signo * datos['perdida'][i]
+        if datos['ajustado'][i]:
+            self.ganancia_extra += signo * float(recuperacion(
+                datos['precio_base'][i], datos['precio_lista'][i], datos['cantidad'][i], True))
+
+    def agregar(self, producto: str, precio_base: float, descuento: float, cantidad: int,
+                sugerencias: Sequence[Dict] = (), ajustado: bool = False,
+                precio_lista: Optional[float] = None) -> int:
+        """
+        Agrega una línea y devuelve su id (estable aunque se quiten otras
+        líneas). En una línea ajustada, ``precio_lista`` es el precio antes del
+        recargo: lo recuperado es la diferencia por la cantidad.
+        """
+        if self._n == len(self._datos['id']):
+            self._crecer()
+        i = self._n
+        precio_desc, total, perdida = importes(float(precio_base), float(descuento), int(cantidad))
+        fila = {
+            'id': self._siguiente_id, 'precio_base': precio_base,
+            'precio_lista': precio_base if precio_lista is None else precio_lista, 'descuento': descuento,
+            'cantidad': cantidad, 'ajustado': ajustado,
+            'precio_desc': precio_desc, 'total': total, 'perdida': perdida,
+        }
+        for nombre, valor in fila.items():
+            self._datos[nombre][i] = valor
+        self.productos.append(producto)
+        self.sugerencias.append(list(sugerencias))
+        self._n += 1
+        self._siguiente_id += 1
+        self.version += 1
+        self._sumar(i, +1)
+        return fila['id']
+
+    def posicion(self, linea_id: int) -> int:
+        posiciones = np.flatnonzero(self.columna('id') == linea_id)
+        if not posiciones.size:
+            raise KeyError(linea_id)
+        return int(posiciones[0])
+
+    def quitar(self, linea_id: int):
+        """Quita una línea por id; los totales se ajustan restando solo esa línea"""
+        i = self.posicion(linea_id)
+        self._sumar(i, -1)
+        for columna in self._datos.values():
+            columna[i:self._n - 1] = columna[i + 1:self._n]
+        del self.productos[i]
+        del self.sugerencias[i]
+        self._n -= 1
+        self.version += 1
+        if not self._n:
+            # Sin líneas no queda nada que sumar: se descarta el redondeo acumulado
+            self.total_global = self.perdida_total = self.ganancia_extra = 0.0
+
+    def editar(self, descuentos: Optional[Iterable[float]] = None, cantidades: Optional[Iterable[int]] = None):
+        """Edición masiva (p. ej. desde una grilla editable): un valor por línea, en orden"""
+        if descuentos is not None:
+            self.columna('descuento')[:] = np.asarray(list(descuentos), dtype=np.float64)
+        if cantidades is not None:
+            self.columna('cantidad')[:] = np.asarray(list(cantidades), dtype=np.int64)
+        self.version += 1
+        self.recalcular()
+
+    def recalcular(self):
+        """Recalcula importes y totales de todas las líneas en una sola pasada vectorizada"""
+        precio_base, cantidad = self.columna('precio_base'), self.columna('cantidad')
+        precio_desc, total, perdida = importes(precio_base, self.columna('descuento'), cantidad)
+        self.columna('precio_desc')[:] = precio_desc
+        self.columna('total')[:] = total
+        self.columna('perdida')[:] = perdida
+        self.total_global = float(total.sum())
+        self.perdida_total = float(perdida.sum())
+        self.ganancia_extra = float(
+            recuperacion(precio_base, self.columna('precio_lista'), cantidad, self.columna('ajustado')).sum())
+
+    def linea(self, i: int) -> Dict:
+        """Línea en la posición ``i`` como diccionario, para mostrarla"""
+        return {
+            'producto': self.productos[i],
+            'sugerencias': self.sugerencias[i],
+            **{nombre: columna[i].item() for nombre, columna in self._datos.items()},
+        }
+
+    def como_tabla(self) -> pd.DataFrame:
+        """Líneas como DataFrame (una copia), para grillas y exportación"""
+        tabla = pd.DataFrame({nombre: self.columna(nombre).copy() for nombre in self._COLUMNAS})
+        tabla.insert(1, 'producto', self.productos)
+        return tabla
@@ -0,0 +1,128 @@
+"""
+Catálogo de productos indexado para la app de pedidos (reybanpac.py).
+
+El catálogo se lee una sola vez desde CSV o Parquet con las columnas
+``nombre``, ``precio``, ``categoria`` (opcional: si falta se toma del prefijo
+"CATEGORÍA - " del nombre) y ``sugerencias`` (opcional: nombres de otros
+productos del catálogo separados por ``|``).
+
+Los precios quedan en un arreglo NumPy y las búsquedas por prefijo se
+resuelven con ``np.searchsorted`` sobre claves normalizadas y ordenadas
+(sin tildes ni mayúsculas), así que cuestan O(log n) aunque el catálogo
+tenga miles de SKUs. No depende de Streamlit: la app lo cachea y el resto
+del código puede importarlo directamente.
+"""
+
+import os
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+SEPARADOR_SUGERENCIAS = '|'
+
+
+def normalizar(texto: str) -> str:
+    """Clave de búsqueda: sin tildes, sin mayúsculas y sin espacios sobrantes"""
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_tildes.casefold().split())
+
+
+def _lista_sugerencias(valor) -> List[str]:
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return [str(nombre).strip() for nombre in valor if str(nombre).strip()]
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return []
+    return [nombre.strip() for nombre in str(valor).split(SEPARADOR_SUGERENCIAS) if nombre.strip()]
+
+
+class Catalogo:
+    """Productos, precios, categorías y sugerencias, indexados para búsqueda"""
+
+    def __init__(self, tabla: pd.DataFrame):
+        faltantes = [columna for columna in ('nombre', 'precio') if columna not in tabla.columns]
+        if faltantes:
+            raise ValueError(f'El catálogo no tiene las columnas {faltantes}')
+
+        tabla = tabla.drop_duplicates('nombre', keep='last').reset_index(drop=True)
+        self.nombres = tabla['nombre'].astype(str).str.strip().to_numpy(dtype=object)
+        self.precios = pd.to_numeric(tabla['precio'], errors='raise').to_numpy(dtype=np.float64)
+        if 'categoria' in tabla.columns:
+            categorias = tabla['categoria'].astype(str).str.strip()
+        else:
+            categorias = pd.Series(self.nombres).str.split(' - ', n=1).str[0].str.strip()
+        codigos = pd.Categorical(categorias)
+        self.categorias = list(codigos.categories)
+        self.codigos_categoria = codigos.codes.astype(np.int16)
+
+        self.posicion = {nombre: i for i, nombre in enumerate(self.nombres)}
+        columna = tabla['sugerencias'] if 'sugerencias' in tabla.columns else [None] * len(tabla)
+        # Sugerencias como posiciones en el catálogo; las que no existen se descartan
+        self.indices_sugerencias = [
+            np.array([self.posicion[nombre] for nombre in _lista_sugerencias(valor) if nombre in self.posicion],
+                     dtype=np.int64)
+            for valor in columna
+        ]
+
+        # Cada producto se encuentra por su nombre completo y por la descripción sin categoría
+        claves, posiciones = [], []
+        for i, nombre in enumerate(self.nombres):
+            completo = normalizar(nombre)
+            descripcion = normalizar(nombre.split(' - ', 1)[1]) if ' - ' in nombre else completo
+            for clave in {completo, descripcion}:
+                claves.append(clave)
+                posiciones.append(i)
+        orden = np.argsort(np.array(claves, dtype=object), kind='stable')
+        self._claves = np.array(claves, dtype=object)[orden]
+        self._posiciones = np.array(posiciones, dtype=np.int64)[orden]
+
+    @classmethod
+    def desde_archivo(cls, ruta: str) -> 'Catalogo':
+        if os.path.splitext(ruta)[1].lower() in ('.parquet', '.pq'):
+            tabla = pd.read_parquet(ruta)
+        else:
+            tabla = pd.read_csv(ruta, dtype={'nombre': str, 'categoria': str, 'sugerencias': str})
+        return cls(tabla)
+
+    def __len__(self) -> int:
+        return len(self.nombres)
+
+    def __contains__(self, nombre: str) -> bool:
+        return nombre in self.posicion
+
+    def precio(self, nombre: str) -> float:
+        return float(self.precios[self.posicion[nombre]])
+
+    def categoria(self, nombre: str) -> str:
+        return self.categorias[self.codigos_categoria[self.posicion[nombre]]]
+
+    def sugerencias(self, nombre: str) -> List[Dict]:
+        """Productos sugeridos con su precio, en el formato que usa el carrito"""
+        indices = self.indices_sugerencias[self.posicion[nombre]]
+        return [{'nombre': self.nombres[i], 'precio': float(self.precios[i])} for i in indices]
+
+    def buscar(self, texto: str = '', categoria: Optional[str] = None, limite: int = 50) -> List[str]:
+        """
+        Nombres que empiezan por ``texto`` (en el nombre completo o en la
+        descripción sin categoría), opcionalmente de una sola categoría, en
+        orden alfabético y hasta ``limite`` resultados. Sin ``texto`` se
+        respeta el orden del archivo, así el primer producto (el que queda
+        seleccionado por defecto) es el mismo que en el catálogo.
+        """
+        prefijo = normalizar(texto)
+        if prefijo:
+            inicio = np.searchsorted(self._claves, prefijo, side='left')
+            fin = np.searchsorted(self._claves, prefijo + '\U0010ffff', side='left')
+            candidatos = self._posiciones[inicio:fin]
+        else:
+            candidatos = np.arange(len(self.nombres), dtype=np.int64)
+        if categoria is not None:
+            codigo = self.categorias.index(categoria) if categoria in self.categorias else -1
+            candidatos = candidatos[self.codigos_categoria[candidatos] == codigo]
+
+        # Un producto puede coincidir por sus dos claves: se conserva la primera aparición
+        _, primeros = np.unique(candidatos, return_index=True)
+        unicos = candidatos[np.sort(primeros)]
+        return [self.nombres[i] for i in unicos[:limite]]
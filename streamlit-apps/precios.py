@@ -0,0 +1,294 @@
+"""
+Tarificación de pedidos sin interfaz: las mismas fórmulas que usa la app de
+pedidos (reybanpac.py), aplicadas en lote a archivos de pedidos históricos.
+
+Por cada línea se calcula, con operaciones vectorizadas sobre columnas:
+
+* ``precio_desc = precio_base × (1 − descuento / 100)``
+* ``total = precio_desc × cantidad``
+* ``perdida = (precio_base − precio_desc) × cantidad``
+* ``recuperado = (precio_base − precio_lista) × cantidad`` en las líneas
+  ajustadas (las sugerencias agregadas para recuperar la pérdida), 0 en las
+  demás: solo el recargo sobre el precio de lista cubre pérdida, como en el
+  plan de recuperación (recuperacion.py).
+
+El archivo de pedidos puede ser:
+
+* JSON Lines, un pedido por línea: ``pedido`` (opcional), ``punto_venta``,
+  ``cliente``, ``tipo_cliente``, ``vendedor``, ``fecha`` y ``lineas``, una
+  lista de ``{producto, precio_base, precio_lista, descuento, cantidad,
+  ajustado}``.
+* CSV o Parquet con una fila por línea de pedido y esos mismos campos como
+  columnas (aquí ``pedido`` es obligatorio).
+
+``precio_base``, ``precio_lista`` y ``ajustado`` son opcionales: sin precio
+se toma el del catálogo, sin precio de lista también (y si tampoco está, la
+línea no recupera nada) y sin marca la línea se considera no ajustada.
+
+El archivo se lee por lotes, las líneas tarificadas se escriben a Parquet a
+medida que salen y los totales por vendedor y por punto de venta se van
+acumulando, así que la memoria no crece con las líneas del archivo: solo
+con la cantidad de pedidos distintos, de los que se guarda un hash de 64
+bits para contar cada uno una vez::
+
+    python precios.py pedidos.jsonl --salida reporte/ --catalogo data/catalogo_productos.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+CAMPOS_PEDIDO = ['pedido', 'punto_venta', 'cliente', 'tipo_cliente', 'vendedor', 'fecha']
+CAMPOS_LINEA = ['producto', 'precio_base', 'precio_lista', 'descuento', 'cantidad', 'ajustado']
+IMPORTES = ['precio_desc', 'total', 'perdida', 'recuperado']
+AGRUPACIONES = {'vendedores': 'vendedor', 'puntos_venta': 'punto_venta'}
+TAMANO_LOTE = 10000
+
+
+def importes(precio_base, descuento, cantidad):
+    """Precio con descuento, total y pérdida por descuento; acepta escalares o arreglos"""
+    precio_desc = precio_base * (1 - descuento / 100)
+    total = precio_desc * cantidad
+    perdida = (precio_base - precio_desc) * cantidad
+    return precio_desc, total, perdida
+
+
+def recuperacion(precio_base, precio_lista, cantidad, ajustado):
+    """
+    Monto con el que una línea ajustada cubre pérdida: el recargo sobre el
+    precio de lista por la cantidad (0 en las líneas normales)
+    """
+    return np.where(ajustado, np.maximum(precio_base - precio_lista, 0) * cantidad, 0.0)
+
+
+def tarificar(lineas: pd.DataFrame, precios: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    Agrega ``precio_desc``, ``total``, ``perdida`` y ``recuperado`` a un
+    DataFrame de líneas (una copia). ``precios`` (precio por nombre de
+    producto) completa las líneas sin ``precio_base`` o sin ``precio_lista``;
+    las que siguen sin precio quedan con importes nulos.
+    """
+    lineas = lineas.copy()
+    precio_base = pd.to_numeric(lineas['precio_base'], errors='coerce') if 'precio_base' in lineas \
+        else pd.Series(np.nan, index=lineas.index)
+    precio_lista = pd.to_numeric(lineas['precio_lista'], errors='coerce') if 'precio_lista' in lineas \
+        else pd.Series(np.nan, index=lineas.index)
+    if precios is not None:
+        precio_base = precio_base.fillna(lineas['producto'].map(precios))
+        precio_lista = precio_lista.fillna(lineas['producto'].map(precios))
+    lineas['precio_base'] = precio_base.astype(np.float64)
+    lineas['precio_lista'] = precio_lista.fillna(precio_base).astype(np.float64)
+    lineas['descuento'] = pd.to_numeric(lineas['descuento'], errors='coerce').fillna(0).astype(np.float64)
+    lineas['cantidad'] = pd.to_numeric(lineas['cantidad'], errors='coerce').fillna(0).astype(np.int64)
+    lineas['ajustado'] = lineas['ajustado'].fillna(False).astype(bool) if 'ajustado' in lineas else False
+
+    base, cantidad = lineas['precio_base'].to_numpy(), lineas['cantidad'].to_numpy()
+    lineas['precio_desc'], lineas['total'], lineas['perdida'] = importes(
+        base, lineas['descuento'].to_numpy(), cantidad)
+    lineas['recuperado'] = recuperacion(base, lineas['precio_lista'].to_numpy(), cantidad,
+                                        lineas['ajustado'].to_numpy())
+    lineas.loc[np.isnan(base), 'recuperado'] = np.nan
+    return lineas
+
+
+class Acumulador:
+    """
+    Totales por grupo (vendedor, punto de venta...) sumados lote a lote.
+
+    Un pedido puede venir repartido en varios lotes, así que cada par
+    (grupo, pedido) se cuenta la primera vez que aparece: de los pares ya
+    vistos se guarda solo su hash de 64 bits, y de cada lote, los pedidos
+    nuevos por grupo. Dos pares distintos con el mismo hash contarían como
+    uno; con los volúmenes de pedidos la probabilidad es despreciable.
+    """
+
+    def __init__(self, columna: str):
+        self.columna = columna
+        self._sumas: List[pd.DataFrame] = []
+        self._vistos: Set[int] = set()
+        self._pedidos: List[pd.Series] = []
+
+    def agregar(self, tarifadas: pd.DataFrame, pedidos: Optional[pd.DataFrame] = None):
+        """
+        Suma un lote de líneas tarificadas. ``pedidos`` (una fila por pedido)
+        cuenta también los pedidos sin líneas; sin él se cuentan los pedidos
+        que aparecen en las líneas.
+        """
+        grupos = tarifadas.assign(lineas=1, unidades=tarifadas['cantidad']) \
+            .groupby(self.columna, dropna=False, sort=False)
+        self._sumas.append(grupos[['lineas', 'unidades', *IMPORTES[1:]]].sum(min_count=1))
+        origen = tarifadas if pedidos is None else pedidos
+        pares = origen[[self.columna, 'pedido']].drop_duplicates()
+        claves = pd.util.hash_pandas_object(pares, index=False).tolist()
+        nuevos = np.fromiter((clave not in self._vistos for clave in claves), dtype=bool, count=len(claves))
+        self._vistos.update(claves)
+        self._pedidos.append(pares[nuevos].groupby(self.columna, dropna=False).size())
+
+    def resultado(self) -> pd.DataFrame:
+        columnas = ['pedidos', 'lineas', 'unidades', *IMPORTES[1:], 'faltante', 'porcentaje_recuperado']
+        if not self._sumas:
+            return pd.DataFrame(columns=[self.columna, *columnas])
+        totales = pd.concat(self._sumas).groupby(level=0, dropna=False, sort=True).sum(min_count=1)
+        self._sumas = [totales]
+        conteo = pd.concat(self._pedidos).groupby(level=0, dropna=False).sum()
+        self._pedidos = [conteo]
+        # Grupos con pedidos pero sin ninguna línea: cero líneas e importes nulos
+        totales = totales.reindex(totales.index.union(conteo.index)).sort_index(na_position='last')
+        totales[['lineas', 'unidades']] = totales[['lineas', 'unidades']].fillna(0).astype(np.int64)
+        totales.insert(0, 'pedidos', conteo.reindex(totales.index, fill_value=0))
+        totales['faltante'] = (totales['perdida'] - totales['recuperado']).clip(lower=0)
+        # Sin pérdida (nula o no positiva) el porcentaje no está definido
+        perdida = totales['perdida'].where(totales['perdida'] > 0)
+        totales['porcentaje_recuperado'] = 100 * totales['recuperado'] / perdida
+        totales.index.name = self.columna
+        return totales.reset_index()[[self.columna, *columnas]]
+
+
+def _lotes_jsonl(ruta: str, tamano_lote: int) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+    pedidos = []
+    with open(ruta, encoding='utf-8') as archivo:
+        for numero, renglon in enumerate(archivo, start=1):
+            if not renglon.strip():
+                continue
+            pedido = json.loads(renglon)
+            pedido.setdefault('pedido', numero)
+            pedidos.append(pedido)
+            if len(pedidos) >= tamano_lote:
+                yield _aplanar(pedidos), _encabezados(pedidos)
+                pedidos = []
+    if pedidos:
+        yield _aplanar(pedidos), _encabezados(pedidos)
+
+
+def _encabezados(pedidos: List[Dict]) -> pd.DataFrame:
+    """Una fila por pedido con sus datos, tenga o no líneas"""
+    return pd.DataFrame.from_records(
+        [{campo: pedido.get(campo) for campo in CAMPOS_PEDIDO} for pedido in pedidos], columns=CAMPOS_PEDIDO)
+
+
+def _aplanar(pedidos: List[Dict]) -> pd.DataFrame:
+    """Pedidos con lista de líneas -> una fila por línea con los datos del pedido"""
+    lineas = [linea for pedido in pedidos for linea in pedido.get('lineas') or ()]
+    por_pedido = np.fromiter((len(pedido.get('lineas') or ()) for pedido in pedidos),
+                             dtype=np.int64, count=len(pedidos))
+    tabla = pd.DataFrame.from_records(lineas, columns=CAMPOS_LINEA) if lineas \
+        else pd.DataFrame(columns=CAMPOS_LINEA)
+    # Los datos del pedido se repiten una vez por cada una de sus líneas
+    for campo in CAMPOS_PEDIDO:
+        valores = np.array([pedido.get(campo) for pedido in pedidos], dtype=object)
+        tabla[campo] = np.repeat(valores, por_pedido)
+    return tabla
+
+
+def _lotes(ruta: str, tamano_lote: int) -> Iterator[Tuple[pd.DataFrame, Optional[pd.DataFrame]]]:
+    """
+    Lotes de ``(líneas, pedidos)``. Solo JSON Lines trae los pedidos aparte
+    (incluidos los que no tienen líneas); en CSV y Parquet cada fila es una
+    línea y ``pedidos`` es ``None``.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        yield from _lotes_jsonl(ruta, tamano_lote)
+    elif extension in ('.parquet', '.pq'):
+        import pyarrow.parquet as pq
+
+        for lote in pq.ParquetFile(ruta).iter_batches(batch_size=tamano_lote):
+            yield lote.to_pandas(), None
+    elif extension == '.csv':
+        for lote in pd.read_csv(ruta, chunksize=tamano_lote):
+            yield lote, None
+    else:
+        raise ValueError(f'Formato de pedidos no soportado: {ruta}')
+
+
+def leer_lineas(ruta: str, tamano_lote: int = TAMANO_LOTE) -> Iterator[pd.DataFrame]:
+    """Líneas de pedido por lotes, del formato que indique la extensión del archivo"""
+    for lineas, _ in _lotes(ruta, tamano_lote):
+        yield lineas
+
+
+def _columnas_salida(tarifadas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Columnas y tipos fijos para todos los lotes: el Parquet tiene un solo
+    esquema aunque un lote traiga campos vacíos o de más.
+    """
+    salida = tarifadas.reindex(columns=CAMPOS_PEDIDO + CAMPOS_LINEA + IMPORTES)
+    for campo in CAMPOS_PEDIDO + ['producto']:
+        if campo != 'fecha':
+            salida[campo] = salida[campo].astype('string')
+    salida['fecha'] = pd.to_datetime(salida['fecha'], errors='coerce').astype('datetime64[ms]')
+    return salida
+
+
+def procesar_pedidos(ruta: str, salida: str, precios: Optional[pd.Series] = None,
+                     tamano_lote: int = TAMANO_LOTE) -> Dict:
+    """
+    Tarifica ``ruta`` y escribe en el directorio ``salida``: ``lineas.parquet``
+    (una fila por línea, escrita lote a lote), ``vendedores.parquet`` y
+    ``puntos_venta.parquet``. Devuelve un resumen del proceso.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(salida, exist_ok=True)
+    acumuladores = {nombre: Acumulador(columna) for nombre, columna in AGRUPACIONES.items()}
+    escritor, esquema = None, None
+    resumen = {'lineas': 0, 'sin_precio': 0, 'lotes': 0}
+    inicio = time.perf_counter()
+    try:
+        for lineas, pedidos in _lotes(ruta, tamano_lote):
+            if 'pedido' not in lineas.columns:
+                raise ValueError('Los pedidos en CSV o Parquet necesitan la columna "pedido"')
+            tarifadas = _columnas_salida(tarificar(lineas, precios))
+            for acumulador in acumuladores.values():
+                acumulador.agregar(tarifadas, pedidos)
+
+            if esquema is None:
+                esquema = pa.Schema.from_pandas(tarifadas, preserve_index=False)
+                escritor = pq.ParquetWriter(os.path.join(salida, 'lineas.parquet'), esquema)
+            escritor.write_table(pa.Table.from_pandas(tarifadas, schema=esquema, preserve_index=False))
+            resumen['lineas'] += len(tarifadas)
+            resumen['sin_precio'] += int(tarifadas['precio_base'].isna().sum())
+            resumen['lotes'] += 1
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+    for nombre, acumulador in acumuladores.items():
+        acumulador.resultado().to_parquet(os.path.join(salida, f'{nombre}.parquet'), index=False)
+    resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumen
+
+
+def precios_catalogo(ruta: str) -> pd.Series:
+    """Precio por nombre de producto, tomado del catálogo de la app"""
+    from catalogo import Catalogo
+
+    catalogo = Catalogo.desde_archivo(ruta)
+    return pd.Series(catalogo.precios, index=catalogo.nombres)
+
+
+def main(argumentos: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Tarificación por lotes de pedidos históricos')
+    parser.add_argument('pedidos', help='archivo de pedidos (.jsonl, .csv o .parquet)')
+    parser.add_argument('--salida', required=True, help='directorio donde se escriben los Parquet')
+    parser.add_argument('--catalogo', help='catálogo (CSV o Parquet) para las líneas sin precio_base')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE,
+                        help='pedidos (JSON Lines) o filas (CSV/Parquet) por lote')
+    args = parser.parse_args(argumentos)
+
+    precios = precios_catalogo(args.catalogo) if args.catalogo else None
+    resumen = procesar_pedidos(args.pedidos, args.salida, precios, args.lote)
+    print(json.dumps(resumen))
+    if resumen['sin_precio']:
+        print(f"{resumen['sin_precio']} líneas sin precio (ni en el archivo ni en el catálogo)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
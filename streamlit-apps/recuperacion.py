@@ -0,0 +1,150 @@
+"""
+Plan de recuperación de la pérdida por descuentos para la app de pedidos
+(reybanpac.py).
+
+En lugar de repartir la pérdida de cada línea en partes iguales entre sus
+sugerencias, el plan se resuelve para todo el carrito de una vez:
+
+* Los candidatos son los productos sugeridos por las líneas con pérdida,
+  sin repetir y sin los que ya están en el carrito como sugerencia; la
+  cantidad de cada uno es la suma de las cantidades de las líneas que lo
+  sugieren.
+* Se eligen hasta ``max_productos`` candidatos, los de mayor base
+  (precio × cantidad): cuanto más grande la base, menor el recargo que hace
+  falta para cubrir la misma pérdida.
+* A los elegidos se les aplica el mismo recargo porcentual ``m``, que es el
+  que minimiza el mayor recargo individual. Con elasticidad ``e`` las
+  unidades vendidas caen a ``cantidad × (1 − e·m)``, así que lo recuperado
+  es ``base × m × (1 − e·m)`` y ``m`` sale de una ecuación de segundo grado.
+  Lo recuperado es solo el recargo, no el importe de la línea: es lo mismo
+  que suma el carrito por cada sugerencia agregada (``precios.recuperacion``).
+* El plan cubre lo que falta (``carrito.faltante``): la pérdida menos lo que
+  ya recuperan las sugerencias agregadas antes.
+* ``m`` nunca supera ``tope_porcentaje``; si con el tope no alcanza, el plan
+  informa lo que queda por cubrir.
+
+Todo se calcula con operaciones NumPy sobre los candidatos, y el último
+plan se guarda junto con la versión del carrito para no recalcularlo en
+cada ejecución de la app.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from carrito import Carrito
+
+
+class Plan:
+    """Productos sugeridos con su recargo, y cuánto de la pérdida cubren"""
+
+    def __init__(self, tabla: pd.DataFrame, perdida: float, recargo_pct: float, recuperado: float):
+        self.tabla = tabla
+        self.perdida = perdida
+        self.recargo_pct = recargo_pct
+        self.recuperado = recuperado
+
+    @property
+    def faltante(self) -> float:
+        return max(self.perdida - self.recuperado, 0.0)
+
+    @property
+    def cubre(self) -> bool:
+        # Tolerancia de redondeo: el recargo se calcula para cubrir la pérdida exacta
+        return self.faltante <= 1e-6 * max(self.perdida, 1.0)
+
+    def __bool__(self) -> bool:
+        return not self.tabla.empty
+
+
+def _candidatos(carrito: Carrito):
+    """Nombres, precios y cantidades de los productos sugeridos por líneas con pérdida"""
+    perdidas, cantidades = carrito.columna('perdida'), carrito.columna('cantidad')
+    agregados = {carrito.productos[i] for i in np.flatnonzero(carrito.columna('ajustado'))}
+    nombres, precios, unidades = [], [], []
+    for i in np.flatnonzero(perdidas > 0):
+        for sugerencia in carrito.sugerencias[i]:
+            if sugerencia['nombre'] in agregados:
+                continue
+            nombres.append(sugerencia['nombre'])
+            precios.append(sugerencia['precio'])
+            unidades.append(cantidades[i])
+    if not nombres:
+        return np.array([], dtype=object), np.array([]), np.array([], dtype=np.int64)
+
+    unicos, primeros, grupo = np.unique(np.array(nombres, dtype=object), return_index=True, return_inverse=True)
+    cantidad = np.bincount(grupo, weights=np.asarray(unidades, dtype=np.float64)).astype(np.int64)
+    precio = np.asarray(precios, dtype=np.float64)[primeros]
+    validos = precio > 0
+    return unicos[validos], precio[validos], cantidad[validos]
+
+
+def recargo_necesario(perdida: float, base: float, elasticidad: float = 0.0) -> float:
+    """
+    Recargo (fracción, no porcentaje) que recupera ``perdida`` sobre ``base``.
+    Si la elasticidad impide cubrirla, devuelve el recargo que más recupera.
+    """
+    if base <= 0 or perdida <= 0:
+        return 0.0
+    if elasticidad <= 0:
+        return perdida / base
+    discriminante = 1 - 4 * elasticidad * perdida / base
+    if discriminante < 0:
+        return 1 / (2 * elasticidad)
+    return (1 - np.sqrt(discriminante)) / (2 * elasticidad)
+
+
+def plan_recuperacion(carrito: Carrito, tope_porcentaje: float = 25.0, max_productos: int = 8,
+                      elasticidad: float = 0.0) -> Plan:
+    """Plan para cubrir ``carrito.faltante`` con el menor recargo por producto"""
+    perdida = carrito.faltante
+    nombres, precios, cantidades = _candidatos(carrito)
+    if perdida <= 0 or not len(nombres):
+        return Plan(pd.DataFrame(columns=['producto', 'precio', 'cantidad', 'recargo_pct',
+                                          'precio_nuevo', 'recuperacion']), max(perdida, 0.0), 0.0, 0.0)
+
+    bases = precios * cantidades
+    # Orden estable por base descendente: a igual base, orden alfabético
+    elegidos = np.argsort(-bases, kind='stable')[:max_productos]
+    nombres, precios, cantidades, bases = nombres[elegidos], precios[elegidos], cantidades[elegidos], bases[elegidos]
+
+    recargo = min(recargo_necesario(perdida, float(bases.sum()), elasticidad), tope_porcentaje / 100)
+    cantidades_esperadas = np.maximum(np.rint(cantidades * (1 - elasticidad * recargo)), 1).astype(np.int64)
+    recuperacion = bases * recargo * (1 - elasticidad * recargo)
+    tabla = pd.DataFrame({
+        'producto': nombres,
+        'precio': precios,
+        'cantidad': cantidades_esperadas,
+        'recargo_pct': np.full(len(nombres), recargo * 100),
+        'precio_nuevo': precios * (1 + recargo),
+        'recuperacion': recuperacion,
+    })
+    return Plan(tabla, perdida, recargo * 100, float(recuperacion.sum()))
+
+
+class OptimizadorRecuperacion:
+    """
+    ``plan_recuperacion`` con topes fijos y memoria del último plan: mientras
+    el carrito no cambie (misma ``version``) se devuelve el plan ya calculado.
+    """
+
+    def __init__(self, tope_porcentaje: float = 25.0, max_productos: int = 8, elasticidad: float = 0.0):
+        if tope_porcentaje <= 0:
+            raise ValueError('tope_porcentaje debe ser mayor que 0')
+        if max_productos < 1:
+            raise ValueError('max_productos debe ser al menos 1')
+        if elasticidad < 0:
+            raise ValueError('elasticidad no puede ser negativa')
+        self.tope_porcentaje = tope_porcentaje
+        self.max_productos = max_productos
+        self.elasticidad = elasticidad
+        self._carrito: Optional[Carrito] = None
+        self._version = -1
+        self._plan: Optional[Plan] = None
+
+    def plan(self, carrito: Carrito) -> Plan:
+        if carrito is not self._carrito or carrito.version != self._version:
+            self._plan = plan_recuperacion(carrito, self.tope_porcentaje, self.max_productos, self.elasticidad)
+            self._carrito, self._version = carrito, carrito.version
+        return self._plan
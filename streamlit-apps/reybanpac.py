@@ -1,33 +1,46 @@
+import os
+
 import streamlit as st
 
-# --- Datos de productos (extraídos de la imagen) ---
-productos = {
-    "AGROQUÍMICOS - XNHHMY MVUIHEUIPO 400 MK": {
-        "precio": 4.73,
-        "sugerencias": [
-            {"nombre": "AGROQUÍMICOS - XNHHMY SUINUIHEOW 500HMYW", "precio": 7.23},
-            {"nombre": "AGROQUÍMICOS - MYISP UWIIPON 60MK HEOUIMYVUUINVUO", "precio": 3.07}
-        ]
-    },
-    "FERTILIZANTES - XVW XOVWVIQUOK BOWO PKUS 250EHE": {
-        "precio": 4.47,
-        "sugerencias": [
-            {"nombre": "FERTILIZANTES - XVW XOVWVIQUOK ZN PKUS (250EHE)", "precio": 4.47},
-            {"nombre": "FERTILIZANTES - XVW HMOYKMY SVUIM (200HMYW)", "precio": 6.49}
-        ]
-    },
-    "AGROQUÍMICOS - WOHMY UIBKUINMYUIMYOW 200 HMYW HEOUIMYVUUINVUO": {
-        "precio": 3.23,
-        "sugerencias": [
-            {"nombre": "AGROQUÍMICOS - MYISP UWIIPON 60MK HEOUIMYVUUINVUO", "precio": 3.07},
-            {"nombre": "DIVERSIFICADOS - JUIMWUUIS MYOSIXHEIUMYVOUIS 250HEHE", "precio": 0.90}
-        ]
-    }
-}
+from carrito import Carrito
+from catalogo import Catalogo
+from recuperacion import OptimizadorRecuperacion
+
+# --- Catálogo de productos ---
+# CSV o Parquet con columnas nombre, categoria, precio y sugerencias (nombres separados por "|")
+RUTA_CATALOGO = os.environ.get(
+    "REYBANPAC_CATALOGO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "catalogo_productos.csv")
+)
+LIMITE_RESULTADOS = 50
+
+# --- Topes del plan de recuperación de pérdida ---
+TOPE_RECARGO = float(os.environ.get("REYBANPAC_TOPE_RECARGO", "25"))          # % máximo por producto
+MAX_SUGERENCIAS = int(os.environ.get("REYBANPAC_MAX_SUGERENCIAS", "8"))       # productos en el plan
+ELASTICIDAD = float(os.environ.get("REYBANPAC_ELASTICIDAD", "0"))             # caída de unidades por recargo
+
+
+@st.cache_resource(max_entries=2)
+def cargar_catalogo(ruta, firma):
+    """
+    Catálogo indexado, construido una vez y compartido por todas las sesiones.
+    ``firma`` (fecha de modificación y tamaño del archivo) forma parte de la
+    clave de caché, así que un archivo actualizado se vuelve a cargar solo.
+    """
+    return Catalogo.desde_archivo(ruta)
+
+
+estado_archivo = os.stat(RUTA_CATALOGO)
+catalogo = cargar_catalogo(RUTA_CATALOGO, (estado_archivo.st_mtime_ns, estado_archivo.st_size))
 
 # --- Estado del carrito ---
+# Carrito en columnas NumPy: se modifica en su lugar y lleva los totales al día
 if "carrito" not in st.session_state:
-    st.session_state.carrito = []
+    st.session_state.carrito = Carrito()
+carrito = st.session_state.carrito
+# El optimizador recuerda el último plan y solo lo recalcula cuando cambia el carrito
+if "optimizador" not in st.session_state:
+    st.session_state.optimizador = OptimizadorRecuperacion(TOPE_RECARGO, MAX_SUGERENCIAS, ELASTICIDAD)
 
 # --- Información del pedido ---
 st.markdown("## 📋 Información del pedido")
@@ -49,108 +62,184 @@ fecha = st.date_input("Fecha del pedido", key="fecha")
 # --- Agregar producto ---
 st.markdown("## 📝 Agregar Producto")
 
+colF1, colF2 = st.columns([1, 2])
+with colF1:
+    categoria_sel = st.selectbox("Categoría", ["Todas"] + catalogo.categorias, key="categoria")
+with colF2:
+    busqueda = st.text_input("Buscar producto", key="busqueda", placeholder="Inicio del nombre del producto")
+# Búsqueda por prefijo en el índice: solo los resultados llegan al selectbox
+opciones = catalogo.buscar(busqueda, None if categoria_sel == "Todas" else categoria_sel, limite=LIMITE_RESULTADOS)
+if len(opciones) == LIMITE_RESULTADOS:
+    st.caption(f"Se muestran los primeros {LIMITE_RESULTADOS} productos; escriba más letras para afinar la búsqueda.")
+
 col1, col2, col3, col4 = st.columns([3, 1.5, 2, 2])
 with col1:
-    producto_sel = st.selectbox("Producto", list(productos.keys()))
+    producto_sel = st.selectbox("Producto", opciones)
 with col2:
-    precio_unitario = productos[producto_sel]["precio"]
+    precio_unitario = catalogo.precio(producto_sel) if producto_sel else 0.0
     st.markdown(f"<p style='font-size: 18px;'>💲<b>{precio_unitario:.2f}</b></p>", unsafe_allow_html=True)
 with col3:
     descuento = st.number_input("Descuento %", min_value=0, max_value=50, value=1)
 with col4:
     cantidad = st.number_input("Cantidad", min_value=1, value=3)
 
-if st.button("➕ Agregar al Carrito"):
-    st.session_state.carrito.append({
-        "producto": producto_sel,
-        "precio_base": precio_unitario,
-        "descuento": descuento,
-        "cantidad": cantidad,
-        "sugerencias": productos[producto_sel]["sugerencias"],
-        "ajustado": False
-    })
+if not opciones:
+    st.warning("Ningún producto coincide con la búsqueda.")
+
+if st.button("➕ Agregar al Carrito", disabled=producto_sel is None):
+    carrito.agregar(producto_sel, precio_unitario, descuento, cantidad, catalogo.sugerencias(producto_sel))
     st.success(f"{producto_sel} agregado correctamente.")
 
 # --- Mostrar carrito ---
-if st.session_state.carrito:
+# Hasta UMBRAL_TARJETAS líneas el carrito se muestra como tarjetas; por encima,
+# como una sola grilla editable, para que la cantidad de widgets no crezca con
+# el tamaño del pedido. Las sugerencias son un único plan para todo el carrito,
+# de a lo sumo MAX_SUGERENCIAS productos
+UMBRAL_TARJETAS = 10
+
+
+# Los botones y la grilla modifican el carrito en callbacks: el cambio queda
+# hecho antes de que Streamlit vuelva a ejecutar el fragmento, sin st.rerun()
+def agregar_sugerencia(carrito, nombre, precio, precio_nuevo, clave_cantidad):
+    carrito.agregar(nombre, precio_nuevo, 0, st.session_state[clave_cantidad], ajustado=True,
+                    precio_lista=precio)
+
+
+def aplicar_grilla(carrito, clave):
+    """Lleva al carrito las ediciones de la grilla (descuento, cantidad y líneas a quitar)"""
+    editadas = st.session_state[clave]["edited_rows"]
+    if not editadas:
+        return
+    descuentos = carrito.columna("descuento").copy()
+    cantidades = carrito.columna("cantidad").copy()
+    ids = carrito.columna("id").copy()
+    quitar = []
+    for fila, cambios in editadas.items():
+        if cambios.get("descuento") is not None:
+            descuentos[fila] = cambios["descuento"]
+        if cambios.get("cantidad") is not None:
+            cantidades[fila] = cambios["cantidad"]
+        if cambios.get("quitar"):
+            quitar.append(int(ids[fila]))
+    carrito.editar(descuentos=descuentos, cantidades=cantidades)
+    for linea_id in quitar:
+        carrito.quitar(linea_id)
+
+
+def tabla_plan(carrito, plan):
+    """Productos sugeridos para recuperar la pérdida de todo el carrito"""
+    st.markdown(f"**🍍 Sugerencias para recuperar la pérdida del pedido "
+                f"(recargo de {plan.recargo_pct:.2f}% por producto):**")
+
+    headers = st.columns([3, 2, 2, 2, 2, 2, 1])
+    headers[0].markdown("**Producto**")
+    headers[1].markdown("**Precio real**")
+    headers[2].markdown("**% aplicado**")
+    headers[3].markdown("**Diferencia**")
+    headers[4].markdown("**Precio nuevo**")
+    headers[5].markdown("**Cantidad**")
+    headers[6].markdown("")
+
+    for idx, sug in enumerate(plan.tabla.itertuples(index=False)):
+        fila = st.columns([3, 2, 2, 2, 2, 2, 1])
+        fila[0].write(sug.producto)
+        fila[1].write(f"${sug.precio:.2f}")
+        fila[2].write(f"{sug.recargo_pct:.2f}%")
+        fila[3].write(f"+${sug.precio_nuevo - sug.precio:.2f}")
+        fila[4].write(f"${sug.precio_nuevo:.2f}")
+        # La versión en la clave devuelve la cantidad a la del plan cuando este cambia
+        clave_cantidad = f"cant_sug_{carrito.version}_{idx}"
+        fila[5].number_input(" ", min_value=1, value=int(sug.cantidad), key=clave_cantidad)
+        fila[6].button("➕", key=f"add_sug_{carrito.version}_{idx}", on_click=agregar_sugerencia,
+                       args=(carrito, sug.producto, sug.precio, sug.precio_nuevo, clave_cantidad))
+
+    if not plan.cubre:
+        st.caption(f"Con un recargo máximo de {TOPE_RECARGO:g}% el plan cubre ${plan.recuperado:,.2f} "
+                   f"de los ${plan.perdida:,.2f} que faltan.")
+
+
+def tarjeta(carrito, item):
+    """Una línea del carrito como tarjeta, con su botón para quitarla"""
+    linea_id = item["id"]
+    st.markdown(f"### {item['producto']}")
+    # Importes calculados al agregar la línea; aquí solo se muestran
+    precio_desc, total, perdida = item["precio_desc"], item["total"], item["perdida"]
+
+    colA, colB = st.columns([6, 1])
+    with colA:
+        color = "red" if perdida > 0 else "green"
+        mensaje = f"📉 Pérdida por descuento: ${perdida:.2f}" if perdida > 0 else "✅ Sin pérdida"
+        st.markdown(f"""
+        <div style="background-color:#f0f2f6;padding:10px;border-radius:10px;">
+        <b>Cantidad:</b> {item['cantidad']}<br>
+        <b>Precio base:</b> ${item['precio_base']:.2f}<br>
+        <b>Descuento:</b> {item['descuento']:g}%<br>
+        <b>Precio con descuento:</b> ${precio_desc:.2f}<br>
+        <b>Total:</b> ${total:,.2f}<br>
+        <span style="color:{color};font-weight:bold;">{mensaje}</span>
+        </div>
+        """, unsafe_allow_html=True)
+    with colB:
+        st.button("🗑️ Quitar", key=f"remove_{linea_id}", on_click=carrito.quitar, args=(linea_id,))
+
+
+def grilla(carrito):
+    """Todo el carrito en una grilla editable: descuento y cantidad se editan en bloque"""
+    tabla = carrito.como_tabla()
+    tabla["quitar"] = False
+    # La clave cambia con el carrito, así la grilla arranca de los datos vigentes
+    clave = f"grilla_{carrito.version}"
+    st.data_editor(
+        tabla,
+        key=clave,
+        on_change=aplicar_grilla,
+        args=(carrito, clave),
+        hide_index=True,
+        column_order=("producto", "precio_base", "descuento", "cantidad", "precio_desc", "total", "perdida", "quitar"),
+        disabled=("producto", "precio_base", "precio_desc", "total", "perdida"),
+        column_config={
+            "producto": st.column_config.TextColumn("Producto", width="large"),
+            "precio_base": st.column_config.NumberColumn("Precio base", format="$%.2f"),
+            "descuento": st.column_config.NumberColumn("Descuento %", min_value=0, max_value=50, step=1),
+            "cantidad": st.column_config.NumberColumn("Cantidad", min_value=1, step=1),
+            "precio_desc": st.column_config.NumberColumn("Precio con descuento", format="$%.2f"),
+            "total": st.column_config.NumberColumn("Total", format="$%.2f"),
+            "perdida": st.column_config.NumberColumn("Pérdida", format="$%.2f"),
+            "quitar": st.column_config.CheckboxColumn("Quitar"),
+        },
+    )
+
+
+@st.fragment
+def seccion_carrito():
+    """
+    Carrito, sugerencias y totales. Es un fragmento: quitar líneas, agregar
+    sugerencias o editar la grilla vuelve a ejecutar solo esta
+    sección, no la información del pedido ni el buscador de productos.
+    """
+    carrito = st.session_state.carrito
+    if not carrito:
+        st.info("No hay productos agregados aún.")
+        return
+
     st.markdown("## 🛒 Productos Seleccionados")
-    total_global = 0
-    perdida_total = 0
-
-    for i, item in enumerate(st.session_state.carrito.copy()):
-        st.markdown(f"### {item['producto']}")
-        precio_desc = item["precio_base"] * (1 - item["descuento"] / 100)
-        total = precio_desc * item["cantidad"]
-        perdida = (item["precio_base"] - precio_desc) * item["cantidad"]
-
-        total_global += total
-        perdida_total += perdida
-
-        colA, colB = st.columns([6, 1])
-        with colA:
-            color = "red" if perdida > 0 else "green"
-            mensaje = f"📉 Pérdida por descuento: ${perdida:.2f}" if perdida > 0 else "✅ Sin pérdida"
-            st.markdown(f"""
-            <div style="background-color:#f0f2f6;padding:10px;border-radius:10px;">
-            <b>Cantidad:</b> {item['cantidad']}<br>
-            <b>Precio base:</b> ${item['precio_base']:.2f}<br>
-            <b>Descuento:</b> {item['descuento']}%<br>
-            <b>Precio con descuento:</b> ${precio_desc:.2f}<br>
-            <b>Total:</b> ${total:,.2f}<br>
-            <span style="color:{color};font-weight:bold;">{mensaje}</span>
-            </div>
-            """, unsafe_allow_html=True)
-        with colB:
-            if st.button("🗑️ Quitar", key=f"remove_{i}"):
-                st.session_state.carrito.pop(i)
-                st.rerun()
-
-        # --- Sugerencias para recuperar pérdida ---
-        if item['sugerencias'] and perdida > 0:
-            st.markdown(f"**🍍 Sugerencias para {item['producto']} (tabla ajustada para recuperar pérdida):**")
-            perdida_por_sugerencia = perdida / len(item['sugerencias'])
-
-            headers = st.columns([3, 2, 2, 2, 2, 2, 1])
-            headers[0].markdown("**Producto**")
-            headers[1].markdown("**Precio real**")
-            headers[2].markdown("**% aplicado**")
-            headers[3].markdown("**Diferencia**")
-            headers[4].markdown("**Precio nuevo**")
-            headers[5].markdown("**Cantidad**")
-            headers[6].markdown("")
-
-            for idx, sug in enumerate(item['sugerencias']):
-                precio_real = sug['precio']
-                precio_nuevo = precio_real + perdida_por_sugerencia
-                diferencia = precio_nuevo - precio_real
-                pct_aplicado = (diferencia / precio_real) * 100 if precio_real else 0
-
-                fila = st.columns([3, 2, 2, 2, 2, 2, 1])
-                fila[0].write(sug['nombre'])
-                fila[1].write(f"${precio_real:.2f}")
-                fila[2].write(f"{pct_aplicado:.2f}%")
-                fila[3].write(f"+${diferencia:.2f}")
-                fila[4].write(f"${precio_nuevo:.2f}")
-                cantidad_sug = fila[5].number_input(" ", min_value=1, value=1, key=f"cant_sug_{i}_{idx}")
-                if fila[6].button("➕", key=f"add_sug_{i}_{idx}"):
-                    st.session_state.carrito.append({
-                        "producto": sug['nombre'],
-                        "precio_base": precio_nuevo,
-                        "descuento": 0,
-                        "cantidad": cantidad_sug,
-                        "sugerencias": [],
-                        "ajustado": True
-                    })
-                    st.success(f"{sug['nombre']} agregado correctamente.")
-                    st.rerun()
-
-    st.markdown(f"### 💵 Total Global: `${total_global:,.2f}`")
-    ganancia_extra = sum(item['precio_base'] * item['cantidad'] for item in st.session_state.carrito if item.get("ajustado"))
-    if ganancia_extra >= perdida_total:
-        st.success(f"✅ ¡Pérdida recuperada! Ganancia extra: ${ganancia_extra - perdida_total:,.2f}")
+    if len(carrito) <= UMBRAL_TARJETAS:
+        for i in range(len(carrito)):
+            tarjeta(carrito, carrito.linea(i))
     else:
-        st.error(f"📉 Pérdida total por descuentos: ${perdida_total:,.2f}")
-        faltante = perdida_total - ganancia_extra
-        st.warning(f"⚠️ Aún faltan ${faltante:,.2f} para cubrir la pérdida.")
-else:
-    st.info("No hay productos agregados aún.")
\ No newline at end of file
+        grilla(carrito)
+
+    # --- Sugerencias para recuperar pérdida ---
+    plan = st.session_state.optimizador.plan(carrito)
+    if plan and not carrito.recuperado:
+        tabla_plan(carrito, plan)
+
+    st.markdown(f"### 💵 Total Global: `${carrito.total_global:,.2f}`")
+    if carrito.recuperado:
+        st.success(f"✅ ¡Pérdida recuperada! Ganancia extra: ${carrito.ganancia_extra - carrito.perdida_total:,.2f}")
+    else:
+        st.error(f"📉 Pérdida total por descuentos: ${carrito.perdida_total:,.2f}")
+        st.warning(f"⚠️ Aún faltan ${carrito.faltante:,.2f} para cubrir la pérdida.")
+
+
+seccion_carrito()
@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from precios import CAMPOS_LINEA, CAMPOS_PEDIDO, IMPORTES, procesar_pedidos
+
+CATALOGO = pd.Series({'Z': 2.5})
+
+# A1 tiene una sugerencia ajustada (recargo de 1 sobre el precio de lista),
+# A2 no tiene líneas y la línea de B1 toma el precio del catálogo
+PEDIDOS = [
+    {'pedido': 'A1', 'punto_venta': 'P1', 'vendedor': 'Ana', 'fecha': '2024-01-05', 'lineas': [
+        {'producto': 'X', 'precio_base': 10, 'descuento': 10, 'cantidad': 2},
+        {'producto': 'Y', 'precio_base': 5, 'precio_lista': 4, 'descuento': 0, 'cantidad': 1, 'ajustado': True},
+    ]},
+    {'pedido': 'A2', 'punto_venta': 'P2', 'vendedor': 'Ana', 'fecha': '2024-01-06', 'lineas': []},
+    {'pedido': 'B1', 'punto_venta': 'P1', 'vendedor': 'Beto', 'fecha': '2024-01-07', 'lineas': [
+        {'producto': 'Z', 'descuento': 0, 'cantidad': 4},
+    ]},
+]
+
+VENDEDORES = pd.DataFrame({
+    'vendedor': ['Ana', 'Beto'],
+    'pedidos': [2, 1],
+    'lineas': [2, 1],
+    'unidades': [3, 4],
+    'total': [23.0, 10.0],
+    'perdida': [2.0, 0.0],
+    'recuperado': [1.0, 0.0],
+    'faltante': [1.0, 0.0],
+    'porcentaje_recuperado': [50.0, np.nan],
+})
+
+
+def _jsonl(tmp_path):
+    ruta = tmp_path / 'pedidos.jsonl'
+    ruta.write_text('\n'.join(json.dumps(pedido) for pedido in PEDIDOS), encoding='utf-8')
+    return str(ruta)
+
+
+def _csv(tmp_path):
+    filas = [{**{campo: pedido.get(campo) for campo in CAMPOS_PEDIDO}, **linea}
+             for pedido in PEDIDOS for linea in pedido['lineas']]
+    ruta = tmp_path / 'pedidos.csv'
+    pd.DataFrame(filas).to_csv(ruta, index=False)
+    return str(ruta)
+
+
+def _agregados(salida, nombre):
+    tabla = pd.read_parquet(salida / f'{nombre}.parquet')
+    tabla[tabla.columns[0]] = tabla[tabla.columns[0]].astype(object)
+    return tabla
+
+
+@pytest.mark.parametrize('tamano_lote', [1, 2, 10])
+def test_aggregates_per_seller_and_point_of_sale(tmp_path, tamano_lote):
+    salida = tmp_path / 'salida'
+    resumen = procesar_pedidos(_jsonl(tmp_path), str(salida), CATALOGO, tamano_lote)
+
+    assert (resumen['lineas'], resumen['sin_precio']) == (3, 0)
+    pd.testing.assert_frame_equal(_agregados(salida, 'vendedores'), VENDEDORES, check_dtype=False)
+    puntos = _agregados(salida, 'puntos_venta').set_index('punto_venta')
+    assert puntos['pedidos'].to_dict() == {'P1': 2, 'P2': 1}
+    assert puntos.loc['P1', 'total'] == 33.0
+    assert puntos.loc['P2', 'lineas'] == 0 and np.isnan(puntos.loc['P2', 'total'])
+
+
+def test_order_split_across_batches_is_counted_once(tmp_path):
+    salida = tmp_path / 'salida'
+    # Una fila por lote: las dos líneas de A1 llegan en lotes distintos
+    procesar_pedidos(_csv(tmp_path), str(salida), CATALOGO, tamano_lote=1)
+
+    # En CSV no hay pedidos sin líneas: A2 no aparece
+    esperado = VENDEDORES.assign(pedidos=[1, 1])
+    pd.testing.assert_frame_equal(_agregados(salida, 'vendedores'), esperado, check_dtype=False)
+
+
+def test_lines_parquet_has_one_fixed_schema(tmp_path):
+    salida = tmp_path / 'salida'
+    procesar_pedidos(_jsonl(tmp_path), str(salida), CATALOGO, tamano_lote=1)
+
+    archivo = pq.ParquetFile(salida / 'lineas.parquet')
+    assert archivo.schema_arrow.names == CAMPOS_PEDIDO + CAMPOS_LINEA + IMPORTES
+    tipos = {campo.name: campo.type for campo in archivo.schema_arrow}
+    texto = [campo for campo in CAMPOS_PEDIDO + ['producto'] if campo != 'fecha']
+    assert all(pa.types.is_string(tipos[campo]) or pa.types.is_large_string(tipos[campo]) for campo in texto)
+    assert tipos['fecha'] == pa.timestamp('ms')
+    assert tipos['cantidad'] == pa.int64() and tipos['ajustado'] == pa.bool_()
+    assert all(tipos[campo] == pa.float64() for campo in ['precio_base', 'precio_lista', 'descuento', *IMPORTES])
+    # Un row group por lote, también el de A2 sin líneas, todos con el mismo esquema
+    assert archivo.metadata.num_row_groups == 3
+
+    lineas = archivo.read().to_pandas()
+    assert lineas['recuperado'].tolist() == [0.0, 1.0, 0.0]
+    assert lineas['precio_base'].tolist() == [10.0, 5.0, 2.5]
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Cold-start and warm-start benchmark for the validation engine Lambda.
+
+Each cold run is a fresh interpreter that imports enhanced-validation-engine.py
+and invokes lambda_handler once; the same process then measures warm
+invocations. Every AWS call is answered locally by a botocore ``before-send``
+stub, so the numbers reflect imports, client creation and validation only.
+Every invocation sees a new ETag, so the result cache never short-circuits
+the validation being measured.
+
+Usage: python benchmark_startup.py [--runs 5] [--warm 20] [--rows 1000]
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_PATH = os.path.join(SCRIPTS_DIR, 'enhanced-validation-engine.py')
+
+STUB_ENVIRONMENT = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_EC2_METADATA_DISABLED': 'true',
+}
+
+SCHEMA_ITEM = {
+    'hc_type': 'Contractors',
+    'version': 'latest',
+    'required_sheet': 'Contractors_Data',
+    'fields': [
+        {'name': 'company_name', 'type': 'string', 'mandatory': True, 'min_length': 3, 'max_length': 100},
+        {'name': 'employee_id', 'type': 'string', 'mandatory': True,
+         'pattern': r'^[A-Za-z0-9]{4,12}$', 'primary_key_component': True},
+    ],
+}
+
+
+def build_workbook(rows: int) -> bytes:
+    """Small Contractors workbook that passes every check"""
+    import pandas as pd
+
+    frame = pd.DataFrame({
+        'company_name': [f'Company {i % 50:03d}' for i in range(rows)],
+        'employee_id': [f'EMP{i:06d}' for i in range(rows)],
+    })
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        frame.to_excel(writer, sheet_name=SCHEMA_ITEM['required_sheet'], index=False)
+    return buffer.getvalue()
+
+
+class _RawBody(io.BytesIO):
+    """Minimal urllib3-like body accepted by botocore's AWSResponse"""
+
+    def stream(self, **kwargs):
+        contents = self.read()
+        while contents:
+            yield contents
+            contents = self.read()
+
+
+def make_stub(workbook: bytes):
+    """before-send handler answering every operation the engine performs"""
+    from botocore.awsrequest import AWSResponse
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+    schema_item = {key: serializer.serialize(value) for key, value in SCHEMA_ITEM.items()}
+    bodies = {
+        'ssm.GetParameter': json.dumps({'Parameter': {'Name': 'max-file-size-mb', 'Value': '50'}}).encode(),
+        'dynamodb.GetItem': json.dumps({'Item': schema_item}).encode(),
+        'dynamodb.PutItem': b'{}',
+        'dynamodb.BatchWriteItem': json.dumps({'UnprocessedItems': {}}).encode(),
+        'apigatewaymanagementapi.PostToConnection': b'',
+        's3.GetObject': workbook,
+        's3.HeadObject': b'',
+    }
+    # A new ETag on every HEAD: each invocation looks like a fresh upload, so
+    # the result cache never answers and warm runs still measure validation
+    versions = itertools.count()
+
+    def stub(request, event_name, **kwargs):
+        operation = event_name.split('.', 1)[1]
+        body = bodies.get(operation, b'{}')
+        headers = {'Content-Length': str(len(body)), 'ETag': '"benchmark"'}
+        if operation == 's3.HeadObject':
+            headers['Content-Length'] = str(len(workbook))
+            headers['ETag'] = f'"benchmark-{next(versions)}"'
+        return AWSResponse(request.url, 200, headers, _RawBody(body))
+
+    return stub
+
+
+def _load_engine():
+    import importlib.util
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    spec = importlib.util.spec_from_file_location('enhanced_validation_engine', ENGINE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_child(workbook_path: str, warm: int) -> Dict:
+    """One cold start followed by ``warm`` warm invocations, in this process"""
+    event = {
+        'file_info': {
+            'filename': 'HC_Contratistas_BENCH_202401.xlsx',
+            'hc_type': 'Contractors',
+            'size_bytes': os.path.getsize(workbook_path),
+            's3_key': 'bench/HC_Contratistas_BENCH_202401.xlsx',
+        },
+        'partner_id': 'BENCH',
+        'connection_id': 'bench-connection',
+    }
+
+    started = time.perf_counter()
+    engine_module = _load_engine()
+    imported = time.perf_counter()
+
+    with open(workbook_path, 'rb') as handle:
+        stub = make_stub(handle.read())
+    # Registering on the session covers every client the pool creates later
+    engine_module.AWS_CLIENTS.session.events.register('before-send', stub)
+
+    response = engine_module.lambda_handler(event, None)
+    first = time.perf_counter()
+    status = json.loads(response['body'])['status']
+
+    warm_ms = []
+    for _ in range(warm):
+        call_started = time.perf_counter()
+        engine_module.lambda_handler(event, None)
+        warm_ms.append((time.perf_counter() - call_started) * 1000)
+
+    return {
+        'status': status,
+        'import_ms': (imported - started) * 1000,
+        'first_invocation_ms': (first - imported) * 1000,
+        'cold_start_ms': (first - started) * 1000,
+        'warm_ms': warm_ms,
+    }
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=5, help='cold starts (fresh interpreters)')
+    parser.add_argument('--warm', type=int, default=20, help='warm invocations per cold start')
+    parser.add_argument('--rows', type=int, default=1000, help='rows in the synthetic workbook')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.warm)))
+        return
+
+    with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as handle:
+        handle.write(build_workbook(args.rows))
+        workbook_path = handle.name
+
+    try:
+        environment = {**os.environ, **STUB_ENVIRONMENT}
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', workbook_path, '--warm', str(args.warm)],
+                check=True, capture_output=True, text=True, env=environment
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        os.remove(workbook_path)
+
+    warm_ms = [value for run in runs for value in run['warm_ms']]
+    report = {
+        'rows': args.rows,
+        'runs': args.runs,
+        'statuses': sorted({run['status'] for run in runs}),
+        'import_ms_median': statistics.median(run['import_ms'] for run in runs),
+        'first_invocation_ms_median': statistics.median(run['first_invocation_ms'] for run in runs),
+        'cold_start_ms_median': statistics.median(run['cold_start_ms'] for run in runs),
+        'cold_start_ms_max': max(run['cold_start_ms'] for run in runs),
+        'warm_ms_median': statistics.median(warm_ms) if warm_ms else None,
+        'warm_ms_p95': _percentile(warm_ms, 0.95) if warm_ms else None,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Stage benchmarks and load test for the HeadCount validation pipeline.
+
+A synthetic Contractors workbook (configurable rows, columns, error rate and
+duplicate rate) is validated against an in-process fake of S3, DynamoDB, SSM
+and API Gateway, so the numbers cover parsing and validation only. Reported
+per stage: wall time, rows per second and peak traced allocations; per run:
+peak RSS. The load test validates many files at once through
+validate_files(). Allocations are measured in a second pass, since
+tracemalloc slows the code it traces several times over. With --check,
+results are compared with the stored baselines and the roadmap targets,
+and the exit code is 1 on regression.
+
+Usage:
+  python benchmark_validation.py [--rows 10000] [--columns 30] [--error-rate 0.01]
+                                 [--duplicate-rate 0.005] [--files 50] [--load-rows 2000]
+                                 [--check | --update-baselines] [--no-allocations]
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List
+
+from benchmark_startup import SCRIPTS_DIR, STUB_ENVIRONMENT, _load_engine
+
+BASELINES_PATH = os.path.join(SCRIPTS_DIR, 'benchmark_baselines.json')
+# Allowed slowdown (times) or growth (memory) over the stored baseline
+TOLERANCE = {'seconds': 1.5, 'bytes': 1.3}
+# Roadmap target for 10K rows x 30 columns, checked whatever the baseline says
+TARGET_END_TO_END_SECONDS = 30.0
+
+SHEET_NAME = 'Contractors_Data'
+CORE_FIELDS = [
+    {'name': 'company_name', 'type': 'string', 'mandatory': True, 'min_length': 3, 'max_length': 100},
+    {'name': 'employee_id', 'type': 'string', 'mandatory': True,
+     'pattern': r'^[A-Za-z0-9]{4,12}$', 'primary_key_component': True},
+    {'name': 'email', 'type': 'email', 'mandatory': True},
+    {'name': 'start_date', 'type': 'date', 'mandatory': True},
+    {'name': 'termination_date', 'type': 'date'},
+    {'name': 'termination_reason', 'type': 'string', 'max_length': 200},
+]
+
+
+def synthetic_schema(columns: int) -> Dict:
+    """Contractors schema with ``columns`` fields: the core ones plus text fillers"""
+    fillers = [
+        {'name': f'attribute_{index:02d}', 'type': 'string', 'max_length': 50}
+        for index in range(1, max(columns - len(CORE_FIELDS), 0) + 1)
+    ]
+    return {
+        'hc_type': 'Contractors',
+        'version': 'latest',
+        'required_sheet': SHEET_NAME,
+        'fields': CORE_FIELDS[:columns] + fillers,
+        'business_rules': [
+            {
+                'rule': 'termination_reason_required',
+                'type': 'required_if',
+                'field': 'termination_reason',
+                'when': {'field': 'termination_date', 'present': True}
+            },
+            {
+                'rule': 'termination_after_start',
+                'type': 'compare',
+                'left': 'termination_date', 'op': '>=', 'right': 'start_date', 'as': 'date'
+            }
+        ]
+    }
+
+
+def _valid_row(index: int, names: List[str], rng: random.Random) -> Dict:
+    row = {
+        'company_name': f'Contractor {index % 97:02d} S.A.',
+        'employee_id': f'EMP{index:07d}',
+        'email': f'user{index}@partner{index % 13}.com',
+        'start_date': f'20{10 + index % 14}-{1 + index % 12:02d}-{1 + index % 28:02d}',
+        'termination_date': None,
+        'termination_reason': None,
+    }
+    if index % 10 == 0:
+        row['termination_date'] = '2024-06-30'
+        row['termination_reason'] = 'End of contract'
+    for name in names[len(CORE_FIELDS):]:
+        row[name] = f'value {rng.randrange(1000)}'
+    return row
+
+
+def _break_row(row: Dict, rng: random.Random):
+    """One realistic defect per erroneous row"""
+    defect = rng.randrange(5)
+    if defect == 0:
+        row['company_name'] = 'AB'
+    elif defect == 1:
+        row['employee_id'] = 'E-' + row['employee_id']
+    elif defect == 2:
+        row['email'] = row['email'].replace('@', ' at ')
+    elif defect == 3:
+        row['start_date'] = '31/12/2020'
+    else:
+        row['termination_date'], row['termination_reason'] = '2024-01-31', None
+
+
+def generate_workbook(path: str, rows: int, columns: int = 30, error_rate: float = 0.0,
+                      duplicate_rate: float = 0.0, seed: int = 7) -> Dict:
+    """Write a synthetic HeadCount workbook; returns the schema it follows and what was injected"""
+    from openpyxl import Workbook
+
+    schema = synthetic_schema(columns)
+    names = [field['name'] for field in schema['fields']]
+    rng = random.Random(seed)
+    injected = {'error_rows': 0, 'duplicate_rows': 0}
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    sheet.append(names)
+    for index in range(rows):
+        row = _valid_row(index, names, rng)
+        if index and rng.random() < duplicate_rate:
+            row['employee_id'] = f'EMP{rng.randrange(index):07d}'
+            injected['duplicate_rows'] += 1
+        elif rng.random() < error_rate:
+            _break_row(row, rng)
+            injected['error_rows'] += 1
+        sheet.append([row.get(name) for name in names])
+    workbook.save(path)
+    return {'schema': schema, **injected}
+
+
+class _Body:
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+    def iter_chunks(self, chunk_size: int = 1024):
+        chunk = self._stream.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = self._stream.read(chunk_size)
+
+
+class FakeS3:
+    """In-memory S3 covering the calls the engine and the processor make"""
+
+    def __init__(self):
+        self.objects = {}
+        self._uploads = {}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        data = self.objects[(Bucket, Key)]
+        return {'Body': _Body(data), 'ContentLength': len(data), 'ETag': f'"{hash(data):x}"'}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        data = self.objects[(Bucket, Key)]
+        return {'ContentLength': len(data), 'ETag': f'"{hash(data):x}"'}
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode('utf-8')
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        self._uploads[upload_id] = []
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._uploads[UploadId].append(Body)
+        return {'ETag': str(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[(Bucket, Key)] = b''.join(self._uploads.pop(UploadId))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._uploads.pop(UploadId, None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.s3.local/{Params['Key']}?expires={ExpiresIn}"
+
+
+class FakeTable:
+    """DynamoDB table keyed by the sorted key attributes"""
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(tuple(sorted(Key.items())))
+        return {'Item': item} if item is not None else {}
+
+    def put_item(self, Item, key_names=None):
+        self.items[tuple(sorted((name, Item[name]) for name in (key_names or Item)))] = Item
+
+
+class FakeDynamoDB:
+    """DynamoDB resource: only the audit writer's batch_write_item"""
+
+    def __init__(self):
+        self.written = []
+
+    def batch_write_item(self, RequestItems):
+        for requests in RequestItems.values():
+            self.written.extend(request['PutRequest']['Item'] for request in requests)
+        return {'UnprocessedItems': {}}
+
+
+class FakeSSM:
+    def get_parameter(self, Name):
+        return {'Parameter': {'Name': Name, 'Value': '50'}}
+
+
+class FakeWebSocket:
+    def post_to_connection(self, ConnectionId, Data):
+        return {}
+
+
+def local_engine(engine_module, schema: Dict):
+    """Engine whose AWS clients are all local fakes"""
+    clients = engine_module.AWSClientPool()
+    s3 = FakeS3()
+    schemas = FakeTable()
+    schemas.items[(('hc_type', schema['hc_type']), ('version', schema['version']))] = schema
+    cache = FakeTable()
+    cache.put_item = lambda Item: FakeTable.put_item(cache, Item, ('cache_key',))
+    clients.register('client', 's3', s3)
+    clients.register('client', 'ssm', FakeSSM())
+    clients.register('client', 'apigatewaymanagementapi', FakeWebSocket())
+    clients.register('table', 'hc-validation-schemas', schemas)
+    clients.register('resource', 'dynamodb', FakeDynamoDB())
+    clients.register('table', engine_module.RESULT_CACHE_TABLE, cache)
+    return engine_module.HeadCountValidationEngine(clients), s3
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageTimer:
+    """Wall time per stage; with ``allocations`` also the peak traced allocation"""
+
+    def __init__(self, allocations: bool):
+        self.allocations = allocations
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        gc.collect()
+        if self.allocations:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            entry = {'seconds': round(seconds, 4)}
+            if rows:
+                entry['rows_per_second'] = round(rows / seconds) if seconds else None
+            if self.allocations:
+                entry['peak_alloc_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self.stages[name] = entry
+
+
+def _file_info(s3_key: str, size: int, **extra) -> Dict:
+    return {
+        'filename': 'HC_Contratistas_BENCH_202401.xlsx',
+        'hc_type': 'Contractors',
+        'size_bytes': size,
+        's3_key': s3_key,
+        **extra
+    }
+
+
+def benchmark_stages(engine_module, workbook: bytes, schema: Dict, rows: int, allocations: bool) -> Dict:
+    """Each F-stage on its own, then validate_file end to end"""
+    engine, s3 = local_engine(engine_module, schema)
+    s3.objects[(engine_module.EXCHANGE_BUCKET, 'bench/stages.xlsx')] = workbook
+    file_info = _file_info('bench/stages.xlsx', len(workbook))
+    timer = StageTimer(allocations)
+    budget = engine_module.ErrorBudget.from_config({'per_field': rows, 'total': rows * 10})
+
+    engine_module.SCHEMA_CACHE.clear()
+    with timer.stage('schema'):
+        plan = engine._get_validator_plan('Contractors', 'latest')
+    with timer.stage('filename'):
+        engine._validate_filename(file_info, plan)
+    with timer.stage('file_size'):
+        engine._validate_file_size(file_info)
+
+    context = engine_module.ValidationContext(engine, file_info)
+    try:
+        with timer.stage('download'):
+            context.download()
+        with timer.stage('structure'):
+            engine._validate_structure(context)
+        with timer.stage('parse', rows):
+            batches = list(context.batches())
+
+        checks = {
+            'data_types': engine_module.DataTypeCheck(plan, budget),
+            'uniqueness': engine_module.UniquenessCheck(plan.pk_fields, budget),
+            'business_rules': engine_module.BusinessRuleCheck(plan.business_rules, budget)
+        }
+        executor = engine_module.column_executor()
+        with timer.stage('data_types', rows):
+            for batch in batches:
+                checks['data_types'].consume(batch, executor)
+        with timer.stage('uniqueness', rows):
+            for batch in batches:
+                checks['uniqueness'].consume(batch)
+        with timer.stage('business_rules', rows):
+            for batch in batches:
+                checks['business_rules'].consume(batch)
+        validations = {name: check.result() for name, check in checks.items()}
+        del batches
+    finally:
+        context.close()
+
+    with timer.stage('error_report'):
+        engine._generate_error_report({
+            'partner_id': 'BENCH', 'file_info': file_info, 'validations': validations
+        })
+
+    # Fresh content hash: the result cache must not answer for the whole run
+    with timer.stage('end_to_end', rows):
+        results = engine.validate_file(
+            _file_info('bench/stages.xlsx', len(workbook), content_hash=uuid.uuid4().hex), 'BENCH', ''
+        )
+
+    return {
+        'status': results['status'],
+        'error_counts': {name: result.get('error_count', 0) for name, result in validations.items()},
+        'stages': timer.stages
+    }
+
+
+def benchmark_processor(workbook: bytes, rows: int, allocations: bool) -> Dict:
+    """lambda_excel_processor.validate_data on the same sheet, read the processor's way"""
+    os.environ.update({key: value for key, value in STUB_ENVIRONMENT.items() if key not in os.environ})
+    sys.path.insert(0, SCRIPTS_DIR)
+    import lambda_excel_processor
+    from excel_streaming import ExcelBatchReader
+
+    timer = StageTimer(allocations)
+    with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as handle:
+        handle.write(workbook)
+    try:
+        with timer.stage('read_all', rows):
+            with ExcelBatchReader(handle.name) as reader:
+                frame = reader.read_all()
+        with timer.stage('validate_data', rows):
+            result = lambda_excel_processor.validate_data(frame, 'bench.xlsx')
+    finally:
+        os.remove(handle.name)
+    return {'valid': result['valid'], 'stages': timer.stages}
+
+
+def load_test(engine_module, workbook: bytes, schema: Dict, files: int, rows: int) -> Dict:
+    """``files`` uploads validated at the same time through the batch API"""
+    engine, s3 = local_engine(engine_module, schema)
+    requests = []
+    for index in range(files):
+        key = f'bench/load/{index:03d}.xlsx'
+        s3.objects[(engine_module.EXCHANGE_BUCKET, key)] = workbook
+        requests.append({
+            'file_info': _file_info(key, len(workbook), content_hash=uuid.uuid4().hex),
+            'partner_id': f'P{index:03d}',
+            'connection_id': ''
+        })
+
+    latencies = []
+    validate_file = engine.validate_file
+
+    def timed(file_info, partner_id, connection_id):
+        started = time.perf_counter()
+        try:
+            return validate_file(file_info, partner_id, connection_id)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    engine.validate_file = timed
+    started = time.perf_counter()
+    results = engine.validate_files(requests, max_workers=files)
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for result in results:
+        statuses[result['status']] = statuses.get(result['status'], 0) + 1
+    ordered = sorted(latencies)
+    return {
+        'files': files,
+        'rows_per_file': rows,
+        'statuses': statuses,
+        'seconds': round(elapsed, 3),
+        'files_per_second': round(files / elapsed, 2),
+        'rows_per_second': round(files * rows / elapsed),
+        'latency_p50_seconds': round(statistics.median(ordered), 3),
+        'latency_p95_seconds': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+    }
+
+
+def flatten(report: Dict, prefix: str = '') -> Dict[str, float]:
+    """Comparable metrics: every number whose name ends in seconds or bytes"""
+    metrics = {}
+    for key, value in report.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key.endswith(('seconds', 'bytes')):
+            metrics[name] = value
+    return metrics
+
+
+def regressions(report: Dict, baseline: Dict) -> List[str]:
+    problems = []
+    current, previous = flatten(report['results']), flatten(baseline.get('results', {}))
+    for name, value in current.items():
+        if name not in previous or not previous[name]:
+            continue
+        kind = 'seconds' if name.endswith('seconds') else 'bytes'
+        # Sub-10ms stages are too noisy to compare
+        if kind == 'seconds' and previous[name] < 0.01:
+            continue
+        if value > previous[name] * TOLERANCE[kind]:
+            problems.append(f'{name}: {value} vs baseline {previous[name]} (limit x{TOLERANCE[kind]})')
+
+    end_to_end = report['results']['engine']['stages']['end_to_end']['seconds']
+    if report['parameters']['rows'] >= 10000 and end_to_end > TARGET_END_TO_END_SECONDS:
+        problems.append(f"end_to_end: {end_to_end}s exceeds the {TARGET_END_TO_END_SECONDS}s target")
+    load = report['results'].get('load')
+    if load and load['statuses'].get('ERROR'):
+        problems.append(f"load test: {load['statuses']} over {load['files']} files")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--columns', type=int, default=30)
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--duplicate-rate', type=float, default=0.005)
+    parser.add_argument('--files', type=int, default=50, help='concurrent files in the load test (0 skips it)')
+    parser.add_argument('--load-rows', type=int, default=2000, help='rows per file in the load test')
+    parser.add_argument('--no-allocations', action='store_true', help='skip tracemalloc (faster, no alloc peaks)')
+    parser.add_argument('--check', action='store_true', help='exit 1 on regression against the baselines')
+    parser.add_argument('--update-baselines', action='store_true')
+    args = parser.parse_args()
+
+    os.environ.update({key: value for key, value in STUB_ENVIRONMENT.items() if key not in os.environ})
+    engine_module = _load_engine()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'stages.xlsx')
+        generated = generate_workbook(path, args.rows, args.columns, args.error_rate, args.duplicate_rate)
+        with open(path, 'rb') as handle:
+            workbook = handle.read()
+        load_workbook = None
+        if args.files:
+            load_path = os.path.join(directory, 'load.xlsx')
+            generate_workbook(load_path, args.load_rows, args.columns)
+            with open(load_path, 'rb') as handle:
+                load_workbook = handle.read()
+
+    schema = generated['schema']
+    results = {
+        'engine': benchmark_stages(engine_module, workbook, schema, args.rows, allocations=False),
+        'processor': benchmark_processor(workbook, args.rows, allocations=False),
+    }
+    if not args.no_allocations:
+        traced = {
+            'engine': benchmark_stages(engine_module, workbook, schema, args.rows, allocations=True),
+            'processor': benchmark_processor(workbook, args.rows, allocations=True),
+        }
+        for part, report in traced.items():
+            for name, entry in report['stages'].items():
+                results[part]['stages'][name]['peak_alloc_bytes'] = entry['peak_alloc_bytes']
+    if load_workbook is not None:
+        results['load'] = load_test(engine_module, load_workbook, schema, args.files, args.load_rows)
+    results['peak_rss_bytes'] = peak_rss_bytes()
+
+    report = {
+        'parameters': {
+            'rows': args.rows, 'columns': args.columns,
+            'error_rate': args.error_rate, 'duplicate_rate': args.duplicate_rate,
+            'files': args.files, 'load_rows': args.load_rows,
+            'workbook_bytes': len(workbook),
+            'injected': {key: generated[key] for key in ('error_rows', 'duplicate_rows')}
+        },
+        'results': results
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.update_baselines:
+        with open(BASELINES_PATH, 'w') as handle:
+            json.dump(report, handle, indent=2)
+            handle.write('\n')
+    elif args.check:
+        if not os.path.exists(BASELINES_PATH):
+            sys.exit(f'No baselines at {BASELINES_PATH}; run with --update-baselines first')
+        with open(BASELINES_PATH) as handle:
+            baseline = json.load(handle)
+        recorded = {key: value for key, value in baseline.get('parameters', {}).items() if key != 'workbook_bytes'}
+        current = {key: value for key, value in report['parameters'].items() if key != 'workbook_bytes'}
+        if recorded != current:
+            # Numbers from another workload are not comparable; only the targets apply
+            print('Baseline was recorded with different parameters; checking targets only', file=sys.stderr)
+            baseline = {}
+        problems = regressions(report, baseline)
+        for problem in problems:
+            print(f'REGRESSION {problem}', file=sys.stderr)
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
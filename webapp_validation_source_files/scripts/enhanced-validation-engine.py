@@ -2,31 +2,1543 @@
 """
 Enhanced HeadCount File Validation Engine
 Implements all F-1 through F-12 functional requirements
+
+Cold start is kept light: boto3, pandas and the Excel helpers are imported
+on first use, and clients plus the engine itself are reused across warm
+invocations of the same Lambda container.
 """
 
+from __future__ import annotations
+
+import csv
 import json
-import boto3
-import pandas as pd
 import re
 import io
+import hashlib
+import zlib
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Tuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Any, Tuple, Callable, Optional
 import uuid
+import operator
+import os
+import queue
+import random
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 
-class HeadCountValidationEngine:
+import regex_vetting
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from excel_streaming import ExcelBatchReader
+
+EXCHANGE_BUCKET = 'hc-validation-s3-exchange-prod'
+# Engine-internal objects; kept out of the exchange bucket, whose uploads feed SDLF ingestion
+STATE_BUCKET = 'hc-validation-s3-state-prod'
+MAX_FILE_SIZE_PARAMETER = '/hc-validation/config/max-file-size-mb'
+DEFAULT_MAX_FILE_SIZE_MB = 50
+RESULT_CACHE_TABLE = 'hc-validation-result-cache'
+AUDIT_TABLE = 'hc-validation-audit-log'
+AUDIT_TTL_DAYS = 90
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get('HC_RESULT_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+# Row-hash index of each partner's last PASSED file, for incremental validation
+ROW_INDEX_PREFIX = 'row-index'
+# F-7 report files: jsonl, csv or xlsx
+ERROR_REPORT_PREFIX = 'error-reports'
+ERROR_REPORT_FORMAT = os.environ.get('HC_ERROR_REPORT_FORMAT', 'jsonl')
+# Errors kept inline per validation when the F-7 report could not be uploaded
+INLINE_ERROR_SAMPLE = int(os.environ.get('HC_INLINE_ERROR_SAMPLE', 20))
+# Results that depend only on file content and schema, and can be reused
+CONTENT_STAGES = ('structure', 'data_types', 'uniqueness', 'business_rules')
+# Files validated at once by one batch invocation
+BATCH_WORKERS = int(os.environ.get('HC_BATCH_WORKERS', 4))
+# AWS error codes worth an SQS redelivery; other errors come from the file or
+# the schema and would fail the same way again
+RETRYABLE_ERROR_CODES = frozenset({
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestLimitExceeded', 'SlowDown',
+    'ProvisionedThroughputExceededException', 'RequestTimeout', 'RequestTimeoutException',
+    'InternalError', 'InternalFailure', 'InternalServerError', 'ServiceUnavailable'
+})
+# Per-stage metrics go to stdout as CloudWatch Embedded Metric Format lines;
+# on by default inside Lambda only, so local runs and benchmarks stay quiet
+METRICS_NAMESPACE = os.environ.get('HC_METRICS_NAMESPACE', 'HCValidation')
+EMIT_METRICS = os.environ.get('HC_EMIT_METRICS', '1' if os.environ.get('AWS_LAMBDA_FUNCTION_NAME') else '0') == '1'
+# Threads for per-column F-4 checks; 1 disables the column pool
+COLUMN_WORKERS = int(os.environ.get('HC_COLUMN_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+class UnsafePatternError(ValueError):
+    """A schema regex that could backtrack catastrophically on some inputs"""
+
+
+class RuleDefinitionError(ValueError):
+    """A business rule in the schema record that cannot be compiled"""
+
+
+class PatternRegistry:
+    """
+    Compiled regexes shared by the F-1 filename check, F-4 schema patterns and
+    the email check. Each pattern is vetted and compiled once per container.
+    
+    Vetting (regex_vetting) rejects the usual catastrophic-backtracking
+    shapes, such as (a+)+ or (a|ab)*, from the pattern text alone. Patterns
+    are rejected when the schema is loaded, before they run against any row.
+    """
+    
+    def __init__(self):
+        self._compiled = {}
+        self._lock = threading.Lock()
+    
+    def compile(self, pattern: str) -> re.Pattern:
+        compiled = self._compiled.get(pattern)
+        if compiled is None:
+            problem = self.backtracking_risk(pattern)
+            if problem:
+                raise UnsafePatternError(f'Rejected regex {pattern!r}: {problem}')
+            compiled = re.compile(pattern)
+            with self._lock:
+                self._compiled[pattern] = compiled
+        return compiled
+    
+    @staticmethod
+    def backtracking_risk(pattern: str) -> Optional[str]:
+        """Why the pattern is unsafe, or None"""
+        try:
+            return regex_vetting.backtracking_risk(pattern)
+        except re.error as e:
+            raise UnsafePatternError(f'Invalid regex {pattern!r}: {e}')
+
+
+# Shared by every engine instance in this Lambda container
+PATTERNS = PatternRegistry()
+EMAIL_PATTERN = PATTERNS.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Used when the schema record has no 'filename_pattern'
+DEFAULT_FILENAME_PATTERNS = {
+    'Contractors': r'^HC_Contratistas_[A-Za-z0-9]+_\d{6}\.xlsx$',
+    'Stores': r'^HC_Tiendas_\d{6}\.xlsx$',
+    'D2D': r'^HC_D2D_\d{6}\.xlsx$'
+}
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """Render non-null values exactly as str(value) would, as object dtype for Python's re"""
+    import pandas as pd
+    
+    if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+        # object dtype keeps matching on Python's re semantics
+        return values.astype(object)
+    return values.map(str).astype(object)
+
+
+def check_field_rules(field: Dict, column: pd.Series, pattern: Optional[re.Pattern] = None,
+                      limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+    """
+    F-4 value rules for a single column, evaluated as whole-column operations.
+    Error rows are built only from the cells flagged by each boolean mask,
+    so the cost of a clean column does not depend on per-cell Python work.
+    Mandatory checks are accumulated separately by DataTypeCheck. ``pattern``
+    is the field's pre-compiled regex, when the caller has one.
+    
+    Returns at most ``limit`` error dicts plus the total number of violations,
+    so a systematically broken column costs a count, not a dict per cell.
+    
+    Columns typed at read time (datetime64 dates, Int64/Float64 numbers) are
+    valid by construction; a column whose cells did not all convert arrives
+    raw and is checked value by value.
+    """
+    import numpy as np
+    import pandas as pd
+    
+    field_name = field['name']
+    errors = []
+    violations = 0
+    
+    def room() -> Optional[int]:
+        return None if limit is None else max(limit - len(errors), 0)
+    
+    def flagged_rows(values: pd.Series, mask):
+        positions = np.flatnonzero(mask)[:room()]
+        return zip(values.index[positions], values.iloc[positions], positions)
+    
+    present = column[column.notna()]
+    if present.empty:
+        return errors, violations
+    
+    # Validate data type
+    if field['type'] == 'string':
+        # String length validation
+        if 'min_length' in field or 'max_length' in field:
+            # Typed text answers lengths natively; only pattern matching needs object dtype
+            text = present if isinstance(present.dtype, pd.StringDtype) else _as_text(present)
+            lengths = text.str.len()
+            too_short = (lengths < field.get('min_length', 0)).to_numpy(dtype=bool)
+            too_long = (lengths > field.get('max_length', float('inf'))).to_numpy(dtype=bool)
+            violations += int(too_short.sum() + too_long.sum())
+            for idx, value, position in flagged_rows(text, too_short | too_long):
+                if too_short[position] and room() != 0:
+                    errors.append({
+                        'field': field_name,
+                        'row': idx + 2,
+                        'message': f'Value too short (min: {field["min_length"]})',
+                        'value': value
+                    })
+                if too_long[position] and room() != 0:
+                    errors.append({
+                        'field': field_name,
+                        'row': idx + 2,
+                        'message': f'Value too long (max: {field["max_length"]})',
+                        'value': value
+                    })
+        
+        # Pattern validation
+        if 'pattern' in field:
+            text = _as_text(present)
+            invalid = ~text.str.match(pattern or PATTERNS.compile(field['pattern'])).to_numpy(dtype=bool)
+            violations += int(invalid.sum())
+            for idx, value, _ in flagged_rows(text, invalid):
+                errors.append({
+                    'field': field_name,
+                    'row': idx + 2,
+                    'message': f'Value does not match required pattern',
+                    'pattern': field['pattern'],
+                    'value': value
+                })
+    
+    elif field['type'] == 'date':
+        if pd.api.types.is_datetime64_dtype(present):
+            return errors, violations
+        # ISO 8601 date validation
+        parsed = pd.to_datetime(present, format='%Y-%m-%d', errors='coerce')
+        invalid = parsed.isna().to_numpy()
+        violations += int(invalid.sum())
+        for idx, value, _ in flagged_rows(present, invalid):
+            errors.append({
+                'field': field_name,
+                'row': idx + 2,
+                'message': 'Invalid date format (expected: YYYY-MM-DD)',
+                'value': str(value)
+            })
+    
+    elif field['type'] == 'email':
+        # Email validation
+        text = _as_text(present)
+        invalid = ~text.str.match(EMAIL_PATTERN).to_numpy(dtype=bool)
+        violations += int(invalid.sum())
+        for idx, value, _ in flagged_rows(text, invalid):
+            errors.append({
+                'field': field_name,
+                'row': idx + 2,
+                'message': 'Invalid email format',
+                'value': value
+            })
+    
+    elif field['type'] in ('int', 'decimal'):
+        numeric = pd.to_numeric(present, errors='coerce')
+        invalid = numeric.isna().to_numpy(dtype=bool)
+        if field['type'] == 'int':
+            invalid = invalid | (numeric.fillna(0) % 1 != 0).to_numpy(dtype=bool)
+        violations += int(invalid.sum())
+        for idx, value, _ in flagged_rows(present, invalid):
+            errors.append({
+                'field': field_name,
+                'row': idx + 2,
+                'message': 'Invalid integer' if field['type'] == 'int' else 'Invalid decimal number',
+                'value': str(value)
+            })
+    
+    elif field['type'] == 'enum':
+        allowed = [str(value) for value in field.get('values', [])]
+        values = present if isinstance(present.dtype, pd.CategoricalDtype) else _as_text(present)
+        invalid = ~values.isin(allowed).to_numpy(dtype=bool)
+        violations += int(invalid.sum())
+        for idx, value, _ in flagged_rows(values, invalid):
+            errors.append({
+                'field': field_name,
+                'row': idx + 2,
+                'message': 'Value is not one of the allowed values',
+                'allowed_values': allowed,
+                'value': str(value)
+            })
+    
+    return errors, violations
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a TTL.
+    Lives at module level so it survives across warm Lambda invocations.
+    """
+    
+    def __init__(self, ttl_seconds: float, max_entries: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Cached value, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def get_or_load(self, key, loader: Callable[[], Any]):
+        """Cached value, loading and storing it on a miss; loader errors are not cached"""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.put(key, value)
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ValidatorPlan:
+    """
+    A schema compiled once into what the validators need at run time:
+    expected columns, primary key, parse-time field types, compiled patterns and
+    compiled business rules, plus the error budget settings.
+    """
+    
+    def __init__(self, schema: Dict):
+        self.schema = schema
+        self.hc_type = schema.get('hc_type')
+        self.version = schema.get('version', 'latest')
+        self.required_sheet = schema.get('required_sheet')
+        # DynamoDB returns numbers as Decimal; resolve limits to ints once here
+        self.fields = [
+            {**field, **{limit: int(field[limit]) for limit in ('min_length', 'max_length') if limit in field}}
+            for field in schema.get('fields', [])
+        ]
+        self.expected_columns = [field['name'] for field in self.fields]
+        self.pk_fields = [f['name'] for f in self.fields if f.get('primary_key_component', False)]
+        # Column -> field definition: ExcelBatchReader types these columns as it parses
+        self.column_fields = {field['name']: field for field in self.fields}
+        # Column -> field type: keys and row hashes are compared in each type's canonical form
+        self.field_types = {field['name']: field.get('type') for field in self.fields}
+        # Unsafe regexes raise UnsafePatternError here, before any row is checked
+        self.patterns = {f['name']: PATTERNS.compile(f['pattern']) for f in self.fields if 'pattern' in f}
+        filename_pattern = schema.get('filename_pattern', DEFAULT_FILENAME_PATTERNS.get(self.hc_type))
+        self.filename_pattern = PATTERNS.compile(filename_pattern) if filename_pattern else None
+        self.business_rules = [
+            BusinessRule(definition)
+            for definition in schema.get('business_rules', DEFAULT_BUSINESS_RULES.get(self.hc_type, []))
+        ]
+        self.error_budget = schema.get('error_budget', {})
+        self.incremental = bool(schema.get('incremental', False))
+        # Changes whenever the schema record does, even if 'latest' keeps its name
+        self.fingerprint = hashlib.sha256(
+            json.dumps(schema, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()[:16]
+
+
+# Shared by every engine instance in this Lambda container
+SCHEMA_CACHE = TTLCache(ttl_seconds=300, max_entries=32)
+
+
+class ResultCache:
+    """
+    F-3 to F-6 results keyed by file content, schema and HC type.
+    
+    A re-upload of an identical workbook (renamed, or retried after a network
+    failure) skips the download and the scan. Entries live in a DynamoDB
+    table (any store with get_item/put_item works, e.g. DynamoDB Local or a
+    test double) with a TTL attribute, fronted by an in-process TTLCache for
+    warm containers. Results are stored as zlib-compressed JSON so large
+    error lists stay under the 400 KB item limit; bigger ones are not cached.
+    Cache failures never fail a validation: they count as misses. Only full
+    validations are cached: an incremental result depends on the partner's
+    row-index baseline, which a hit would also leave unrefreshed.
+    """
+    
+    MAX_ITEM_BYTES = 350 * 1024
+    
+    def __init__(self, table: Callable[[], Any], ttl_seconds: int = RESULT_CACHE_TTL_SECONDS,
+                 memory: Optional[TTLCache] = None):
+        self._table = table
+        self.ttl_seconds = ttl_seconds
+        self.memory = memory if memory is not None else TTLCache(ttl_seconds=300, max_entries=64)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(file_info: Dict, plan: ValidatorPlan, content_id: str) -> str:
+        # 'full' keeps entries stored by earlier incremental runs (partial row checks) from being reused
+        return f"{file_info['hc_type']}#{plan.version}#{plan.fingerprint}#full#{content_id}"
+    
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+    
+    def get(self, key: str) -> Optional[Dict]:
+        # The payload, not the decoded dict, is kept in memory: every hit gets its own copy
+        payload = self.memory.get(key)
+        if payload is None:
+            try:
+                item = self._table().get_item(Key={'cache_key': key}).get('Item')
+                if item and int(item.get('expires_at', 0)) > time.time():
+                    payload = bytes(item['results'])
+                    self.memory.put(key, payload)
+            except Exception as e:
+                print(f"Result cache lookup failed: {str(e)}")
+        self._count(payload is not None)
+        return None if payload is None else json.loads(zlib.decompress(payload))
+    
+    def put(self, key: str, value: Dict):
+        payload = zlib.compress(json.dumps(value, default=str).encode('utf-8'))
+        self.memory.put(key, payload)
+        if len(payload) > self.MAX_ITEM_BYTES:
+            return
+        try:
+            self._table().put_item(Item={
+                'cache_key': key,
+                'results': payload,
+                'expires_at': int(time.time()) + self.ttl_seconds
+            })
+        except Exception as e:
+            print(f"Result cache store failed: {str(e)}")
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+class ValidationContext:
+    """
+    Per-validation state shared by the F-3 to F-6 validators.
+    The S3 object is spooled to disk once, the schema is resolved once and the
+    required sheet is streamed in row batches, so memory stays bounded by the
+    batch size rather than the workbook size. The plan is pinned for the whole
+    run: a schema refresh mid-validation does not change the rules applied.
+    """
+    
+    def __init__(self, engine: HeadCountValidationEngine, file_info: Dict,
+                 batch_size: Optional[int] = None, partner_id: str = '',
+                 tracer: Optional[StageTracer] = None):
+        self.engine = engine
+        self.file_info = file_info
+        self.partner_id = partner_id
+        self.hc_type = file_info['hc_type']
+        self.schema_version = file_info.get('schema_version', 'latest')
+        self.batch_size = batch_size
+        self.tracer = tracer or StageTracer()
+        self._plan = None
+        self._budget = None
+        self._path = None
+        self._reader = None
+        self.rows_scanned = 0
+        self.stopped_early = False
+        self.cache_key = None
+        self.cached = None
+        self.baseline = None
+        self.delta = None
+    
+    @property
+    def plan(self) -> ValidatorPlan:
+        if self._plan is None:
+            self._plan = self.engine._get_validator_plan(self.hc_type, self.schema_version)
+        return self._plan
+    
+    @property
+    def schema(self) -> Dict:
+        return self.plan.schema
+    
+    @property
+    def incremental(self) -> bool:
+        """Delta mode: per file_info, else per schema"""
+        return bool(self.file_info.get('incremental', self.plan.incremental))
+    
+    @property
+    def budget(self) -> ErrorBudget:
+        """Fresh per validation: the counters must not leak between runs"""
+        if self._budget is None:
+            self._budget = ErrorBudget.from_config(self.plan.error_budget)
+        return self._budget
+    
+    def download(self) -> str:
+        """Spool the workbook to local disk; needs no schema, so it can overlap the schema lookup"""
+        if self._path is None:
+            self._path = self.engine._load_excel_file(self.file_info)
+        return self._path
+    
+    @property
+    def reader(self) -> ExcelBatchReader:
+        if self._reader is None:
+            from excel_streaming import ExcelBatchReader, DEFAULT_BATCH_SIZE
+            
+            self.download()
+            self._reader = ExcelBatchReader(
+                self._path,
+                sheet_name=self.plan.required_sheet,
+                batch_size=self.batch_size or DEFAULT_BATCH_SIZE,
+                fields=self.plan.column_fields
+            )
+        return self._reader
+    
+    @property
+    def sheet_names(self) -> List[str]:
+        return self.reader.sheet_names
+    
+    @property
+    def header(self) -> List[str]:
+        return self.reader.header
+    
+    def batches(self):
+        """Row batches of the required sheet, typed from the schema's field types"""
+        return iter(self.reader)
+    
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+        if self._path is not None and os.path.exists(self._path):
+            os.remove(self._path)
+
+
+class ErrorBudget:
+    """
+    Limits on how much error detail one validation keeps.
+    
+    per_field     error dicts kept per F-4 field; F-5 duplicate groups kept
+    total         error dicts kept across the run; once spent, the scan stops
+    sample_rows   row numbers listed in aggregated errors (nulls, F-6 rules)
+    stop_on_structure_failure
+                  skip the F-4 to F-6 scan when F-3 fails
+    
+    Counts are always exact for the rows scanned; only the detail is capped.
+    Configured per HC type through the schema record's 'error_budget' map.
+    """
+    
+    DEFAULTS = {'per_field': 100, 'total': 1000, 'sample_rows': 100, 'stop_on_structure_failure': True}
+    
+    def __init__(self, per_field: int = 100, total: int = 1000, sample_rows: int = 100,
+                 stop_on_structure_failure: bool = True):
+        self.per_field = per_field
+        self.total = total
+        self.sample_rows = sample_rows
+        self.stop_on_structure_failure = stop_on_structure_failure
+        self.kept = 0
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> ErrorBudget:
+        settings = {**cls.DEFAULTS, **(config or {})}
+        return cls(
+            per_field=int(settings['per_field']),
+            total=int(settings['total']),
+            sample_rows=int(settings['sample_rows']),
+            stop_on_structure_failure=bool(settings['stop_on_structure_failure'])
+        )
+    
+    def take(self, wanted: int) -> int:
+        """How many of ``wanted`` new error dicts fit in the global budget"""
+        with self._lock:
+            granted = min(wanted, max(self.total - self.kept, 0))
+            self.kept += granted
+            return granted
+    
+    @property
+    def exhausted(self) -> bool:
+        return self.kept >= self.total
+
+
+class DataTypeCheck:
+    """F-4: Data type and format rules, accumulated over row batches within an error budget"""
+    
+    def __init__(self, plan: ValidatorPlan, budget: ErrorBudget):
+        self.fields = fields = plan.fields
+        self.patterns = plan.patterns
+        self.budget = budget
+        self.null_counts = {field['name']: 0 for field in fields}
+        self.null_rows = {field['name']: [] for field in fields}
+        self.violations = {field['name']: 0 for field in fields}
+        self.value_errors = {field['name']: [] for field in fields}
+    
+    def _check_column(self, field: Dict, column: pd.Series, limit: int) -> Tuple[int, List[int], List[Dict], int]:
+        null_count, null_rows = 0, []
+        if field.get('mandatory', False):
+            null_mask = column.isnull()
+            null_count = int(null_mask.sum())
+            null_rows = [r + 2 for r in column.index[null_mask][:self.budget.sample_rows]]  # +2 for Excel row numbering
+        errors, violations = check_field_rules(field, column, self.patterns.get(field['name']), limit)
+        return null_count, null_rows, errors, violations
+    
+    def consume(self, batch: pd.DataFrame, executor: Optional[ThreadPoolExecutor] = None):
+        """Check every column of the batch, on ``executor`` threads when given"""
+        fields = [field for field in self.fields if field['name'] in batch.columns]
+        columns = [batch[field['name']] for field in fields]
+        limits = [max(self.budget.per_field - len(self.value_errors[field['name']]), 0) for field in fields]
+        if executor is not None and len(fields) > 1:
+            outcomes = executor.map(self._check_column, fields, columns, limits)
+        else:
+            outcomes = map(self._check_column, fields, columns, limits)
+        
+        # map() keeps schema order, so merged errors do not depend on thread timing
+        for field, (null_count, null_rows, errors, violations) in zip(fields, outcomes):
+            field_name = field['name']
+            self.null_counts[field_name] += null_count
+            room = self.budget.sample_rows - len(self.null_rows[field_name])
+            self.null_rows[field_name].extend(null_rows[:max(room, 0)])
+            self.violations[field_name] += violations
+            self.value_errors[field_name].extend(errors[:self.budget.take(len(errors))])
+    
+    def result(self) -> Dict:
+        errors = []
+        error_count = 0
+        for field in self.fields:
+            field_name = field['name']
+            null_count = self.null_counts[field_name]
+            if null_count:
+                errors.append({
+                    'field': field_name,
+                    'message': f'Mandatory field has {null_count} null values',
+                    'rows': self.null_rows[field_name]
+                })
+            value_errors = self.value_errors[field_name]
+            errors.extend(value_errors)
+            
+            suppressed = self.violations[field_name] - len(value_errors)
+            if suppressed > 0:
+                errors.append({
+                    'field': field_name,
+                    'message': f'{suppressed} more invalid values not listed (error limit reached)',
+                    'suppressed_errors': suppressed
+                })
+            error_count += null_count + self.violations[field_name]
+        
+        if errors:
+            return {'status': 'FAILED', 'errors': errors, 'error_count': error_count}
+        
+        return {'status': 'PASSED', 'message': 'Data type validation successful'}
+
+
+class UniquenessCheck:
+    """F-5: Primary key uniqueness, tracked with a hash index across batches"""
+    
+    def __init__(self, pk_fields: List[str], budget: ErrorBudget, field_types: Optional[Dict[str, str]] = None):
+        from excel_streaming import UniquenessIndex
+        
+        self.budget = budget
+        self.pk_fields = pk_fields
+        self.index = UniquenessIndex(pk_fields, field_types=field_types) if pk_fields else None
+    
+    def consume(self, batch: pd.DataFrame):
+        if self.index is not None:
+            self.index.add(batch)
+    
+    def result(self) -> Dict:
+        pk_fields = self.pk_fields
+        if not pk_fields:
+            return {'status': 'PASSED', 'message': 'No primary key defined'}
+        
+        if self.index.has_duplicates:
+            groups = self.index.duplicate_groups()
+            duplicate_groups = [
+                {
+                    'key_values': group['key_values'],
+                    'rows': [r + 2 for r in group['rows'][:self.budget.sample_rows]]  # +2 for Excel row numbering
+                }
+                for group in groups[:self.budget.per_field]
+            ]
+            
+            return {
+                'status': 'FAILED',
+                'errors': [{
+                    'message': f'Duplicate primary key values found',
+                    'primary_key_fields': pk_fields,
+                    'duplicates': duplicate_groups,
+                    'duplicate_group_count': len(groups)
+                }],
+                'error_count': self.index.duplicate_count
+            }
+        
+        return {'status': 'PASSED', 'message': 'Primary key uniqueness validated'}
+
+
+# Rules applied when a schema record does not declare 'business_rules'
+DEFAULT_BUSINESS_RULES = {
+    'Contractors': [
+        {
+            'rule': 'termination_reason_required',
+            'type': 'required_if',
+            'field': 'termination_reason',
+            'when': {'field': 'termination_date', 'present': True},
+            'message': 'Termination reason required when termination date is present'
+        }
+    ]
+}
+
+COMPARISONS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge
+}
+
+
+class BatchColumns:
+    """Columns of one batch, with date/number conversions computed once and shared by all rules"""
+    
+    def __init__(self, batch: pd.DataFrame):
+        self.batch = batch
+        self._converted = {}
+    
+    def get(self, name: str, kind: Optional[str] = None) -> pd.Series:
+        import pandas as pd
+        
+        if kind is None:
+            return self.batch[name]
+        key = (name, kind)
+        if key not in self._converted:
+            column = self.batch[name]
+            if kind == 'date':
+                column = pd.to_datetime(column, format='ISO8601', errors='coerce')
+            elif kind == 'number':
+                column = pd.to_numeric(column, errors='coerce')
+            else:
+                raise ValueError(f'Unknown conversion: {kind}')
+            self._converted[key] = column
+        return self._converted[key]
+
+
+class BusinessRule:
+    """
+    One declarative F-6 rule from the schema record, compiled once into a
+    function that returns a vectorized violation mask for a batch.
+    
+    Supported types (every rule may also carry a ``when`` condition):
+      required_if  {'field', 'when'}
+      compare      {'left', 'op', 'right', 'as': 'date' | 'number' (optional)}
+      in_set       {'field', 'values'}
+      range        {'field', 'min' and/or 'max'}
+    Conditions are {'field', 'present': bool}, {'field', 'equals': value}
+    or {'field', 'in': [values]}. A definition that cannot be compiled
+    raises RuleDefinitionError.
+    """
+    
+    DEFAULT_MESSAGES = {
+        'required_if': '{field} is required',
+        'compare': '{left} must be {op} {right}',
+        'in_set': '{field} has a value outside the allowed set',
+        'range': '{field} is outside the allowed range'
+    }
+    
+    def __init__(self, definition: Dict):
+        try:
+            self._compile(definition)
+        except (KeyError, TypeError, ValueError) as e:
+            rule_id = definition.get('rule') if isinstance(definition, dict) else None
+            raise RuleDefinitionError(f'Invalid business rule {rule_id!r}: {e!r}') from e
+    
+    def _compile(self, definition: Dict):
+        kind = definition['type']
+        builders = {
+            'required_if': self._required_if,
+            'compare': self._compare,
+            'in_set': self._in_set,
+            'range': self._range
+        }
+        if kind not in builders:
+            raise ValueError(f'Unknown business rule type: {kind}')
+        
+        self.rule_id = definition['rule']
+        self.kind = kind
+        self.message = definition.get('message') or self.DEFAULT_MESSAGES[kind].format(
+            field=definition.get('field'), left=definition.get('left'),
+            op=definition.get('op'), right=definition.get('right')
+        )
+        self.when = definition.get('when')
+        self.columns = [definition[key] for key in ('field', 'left', 'right') if key in definition]
+        if self.when:
+            self.columns.append(self.when['field'])
+        self._mask = builders[kind](definition)
+    
+    def applies_to(self, columns) -> bool:
+        """Rules referencing a column the sheet lacks are skipped (F-3 reports the column)"""
+        return all(column in columns for column in self.columns)
+    
+    def violations(self, columns: BatchColumns) -> pd.Series:
+        mask = self._mask(columns)
+        if self.when:
+            mask = mask & self._condition(columns, self.when)
+        return mask
+    
+    @staticmethod
+    def _condition(columns: BatchColumns, when: Dict) -> pd.Series:
+        column = columns.get(when['field'])
+        if 'equals' in when:
+            return column == when['equals']
+        if 'in' in when:
+            return column.isin(list(when['in']))
+        return column.notna() if when.get('present', True) else column.isna()
+    
+    def _required_if(self, definition: Dict):
+        field = definition['field']
+        return lambda columns: columns.get(field).isna()
+    
+    def _compare(self, definition: Dict):
+        left, right, kind = definition['left'], definition['right'], definition.get('as')
+        compare = COMPARISONS[definition['op']]
+        
+        def mask(columns):
+            lhs, rhs = columns.get(left, kind), columns.get(right, kind)
+            return lhs.notna() & rhs.notna() & ~compare(lhs, rhs).fillna(False).astype(bool)
+        return mask
+    
+    def _in_set(self, definition: Dict):
+        field, values = definition['field'], list(definition['values'])
+        
+        def mask(columns):
+            column = columns.get(field)
+            return column.notna() & ~column.isin(values)
+        return mask
+    
+    def _range(self, definition: Dict):
+        field = definition['field']
+        # DynamoDB numbers arrive as Decimal
+        low = float(definition['min']) if 'min' in definition else None
+        high = float(definition['max']) if 'max' in definition else None
+        
+        def mask(columns):
+            present = columns.get(field).notna()
+            number = columns.get(field, 'number')
+            outside = number.isna()
+            if low is not None:
+                outside = outside | (number < low)
+            if high is not None:
+                outside = outside | (number > high)
+            return present & outside
+        return mask
+
+
+class BusinessRuleCheck:
+    """F-6: Declarative business rules, evaluated together on each batch with per-rule timing"""
+    
+    def __init__(self, rules: List[BusinessRule], budget: ErrorBudget):
+        self.rules = rules
+        self.budget = budget
+        self.violations = {}
+        self.row_counts = {rule.rule_id: 0 for rule in rules}
+        self.timings = {rule.rule_id: 0.0 for rule in rules}
+    
+    def _flag(self, rule: str, message: str, rows: List[int]):
+        if rows:
+            self.row_counts[rule] += len(rows)
+            violation = self.violations.setdefault(rule, {'rule': rule, 'message': message, 'rows': []})
+            room = self.budget.sample_rows - len(violation['rows'])
+            violation['rows'].extend(rows[:max(room, 0)])
+    
+    def consume(self, batch: pd.DataFrame):
+        columns = BatchColumns(batch)
+        for rule in self.rules:
+            if not rule.applies_to(batch.columns):
+                continue
+            started = time.perf_counter()
+            mask = rule.violations(columns).to_numpy(dtype=bool)
+            self._flag(rule.rule_id, rule.message, [r + 2 for r in batch.index[mask]])
+            self.timings[rule.rule_id] += time.perf_counter() - started
+    
+    def result(self) -> Dict:
+        # Schema declaration order, independent of which batch hit a rule first
+        errors = [self.violations[rule.rule_id] for rule in self.rules if rule.rule_id in self.violations]
+        timings = {rule: round(seconds * 1000, 3) for rule, seconds in self.timings.items()}
+        
+        if errors:
+            return {
+                'status': 'FAILED',
+                'errors': errors,
+                'error_count': sum(self.row_counts.values()),
+                'rule_timings_ms': timings
+            }
+        
+        return {
+            'status': 'PASSED',
+            'message': 'Business rules validation successful',
+            'rule_timings_ms': timings
+        }
+
+
+class ErrorStore:
+    """
+    F-7: Columnar error list.
+    
+    Each error is one slot in parallel integer arrays: validation stage, field,
+    rule, message, row, value and detail (any other keys, e.g. expected
+    patterns or duplicate groups). Strings are interned once, so a message
+    repeated on thousands of rows costs a few bytes per row; values and details
+    are interned as their JSON text. Error dicts are only rebuilt, one at a
+    time, when the report is serialized.
+    """
+    
+    REPORT_COLUMNS = ['error_id', 'validation_type', 'field', 'rule', 'row', 'message', 'value', 'detail']
+    _MISSING = -1
+    _CORE_KEYS = ('field', 'rule', 'row', 'message', 'value')
+    
     def __init__(self):
-        self.s3_client = boto3.client('s3')
-        self.dynamodb = boto3.resource('dynamodb')
-        self.ssm_client = boto3.client('ssm')
-        self.apigateway_client = boto3.client('apigatewaymanagementapi')
+        self._ids = {}
+        self._strings = []
+        self.stages = array('i')
+        self.fields = array('i')
+        self.rules = array('i')
+        self.messages = array('i')
+        self.rows = array('q')
+        self.values = array('i')
+        self.details = array('i')
+    
+    @classmethod
+    def from_validations(cls, validations: Dict[str, Dict]) -> ErrorStore:
+        store = cls()
+        for validation_type, result in validations.items():
+            for error in result.get('errors', []):
+                store.add(validation_type, error)
+        return store
+    
+    def _intern(self, text: Optional[str]) -> int:
+        if text is None:
+            return self._MISSING
+        string_id = self._ids.get(text)
+        if string_id is None:
+            string_id = self._ids[text] = len(self._strings)
+            self._strings.append(text)
+        return string_id
+    
+    def _string(self, string_id: int) -> Optional[str]:
+        return None if string_id == self._MISSING else self._strings[string_id]
+    
+    def add(self, validation_type: str, error: Dict):
+        detail = {key: value for key, value in error.items() if key not in self._CORE_KEYS}
+        self.stages.append(self._intern(validation_type))
+        self.fields.append(self._intern(error.get('field')))
+        self.rules.append(self._intern(error.get('rule')))
+        self.messages.append(self._intern(error.get('message')))
+        self.rows.append(int(error['row']) if error.get('row') is not None else self._MISSING)
+        self.values.append(self._intern(json.dumps(error['value'], default=str)) if 'value' in error else self._MISSING)
+        self.details.append(self._intern(json.dumps(detail, default=str)) if detail else self._MISSING)
+    
+    def __len__(self) -> int:
+        return len(self.stages)
+    
+    def records(self) -> Iterator[Dict]:
+        """Error dicts in insertion order, built lazily"""
+        for position in range(len(self)):
+            record = {
+                'error_id': f"ERR_{position + 1:04d}",
+                'validation_type': self._strings[self.stages[position]]
+            }
+            for key, column in (('field', self.fields), ('rule', self.rules)):
+                if column[position] != self._MISSING:
+                    record[key] = self._strings[column[position]]
+            if self.rows[position] != self._MISSING:
+                record['row'] = self.rows[position]
+            if self.messages[position] != self._MISSING:
+                record['message'] = self._strings[self.messages[position]]
+            if self.values[position] != self._MISSING:
+                record['value'] = json.loads(self._strings[self.values[position]])
+            if self.details[position] != self._MISSING:
+                record.update(json.loads(self._strings[self.details[position]]))
+            yield record
+    
+    def validation_types(self) -> List[str]:
+        return [self._strings[stage] for stage in sorted(set(self.stages))]
+    
+    def summary(self, top: int = 10) -> Dict:
+        """Counts per validation stage and the most frequent (stage, field, message) groups"""
+        by_stage = Counter(self._strings[stage] for stage in self.stages)
+        groups = Counter(zip(self.stages, self.fields, self.rules, self.messages))
+        return {
+            'by_validation_type': dict(by_stage),
+            'top_errors': [
+                {
+                    'validation_type': self._strings[stage],
+                    'field': self._string(field) or self._string(rule),
+                    'message': self._string(message),
+                    'count': count
+                }
+                for (stage, field, rule, message), count in groups.most_common(top)
+            ]
+        }
+    
+    def write_jsonl(self, stream):
+        """One JSON object per line to a binary stream"""
+        for record in self.records():
+            stream.write(json.dumps(record, default=str).encode('utf-8') + b'\n')
+    
+    def _report_rows(self) -> Iterator[List]:
+        for position, record in enumerate(self.records()):
+            detail = self._string(self.details[position])
+            yield [
+                record['error_id'], record['validation_type'], record.get('field'), record.get('rule'),
+                record.get('row'), record.get('message'), record.get('value'), detail
+            ]
+    
+    def write_csv(self, stream):
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=True)
+        try:
+            writer = csv.writer(text)
+            writer.writerow(self.REPORT_COLUMNS)
+            writer.writerows(self._report_rows())
+        finally:
+            text.detach()
+    
+    def write_xlsx(self, stream):
+        """xlsx needs a finished zip; openpyxl's write-only mode keeps rows out of memory"""
+        from openpyxl import Workbook
         
-        # Load configuration
-        self.schemas_table = self.dynamodb.Table('hc-validation-schemas')
-        self.audit_table = self.dynamodb.Table('hc-validation-audit-log')
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Errors')
+        sheet.append(self.REPORT_COLUMNS)
+        for row in self._report_rows():
+            sheet.append(row)
+        workbook.save(stream)
+
+
+class StageScheduler:
+    """
+    Small DAG runner for validation stages.
+    
+    Each stage names the stages it must run after; stages whose dependencies
+    are done run concurrently on a thread pool. run() returns every stage's
+    return value by name, so callers assemble results in a fixed order no
+    matter which stage finished first. A failing stage re-raises its error
+    and none of its dependents run.
+    """
+    
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._stages = OrderedDict()
+    
+    def add(self, name: str, func: Callable[[], Any], after: Tuple[str, ...] = ()):
+        self._stages[name] = (func, tuple(after))
+    
+    def run(self) -> Dict[str, Any]:
+        outcome = {}
+        pending = OrderedDict(self._stages)
+        running = {}
         
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as pool:
+            while pending or running:
+                ready = [name for name, (_, after) in pending.items() if all(dep in outcome for dep in after)]
+                for name in ready:
+                    func, _ = pending.pop(name)
+                    running[pool.submit(func)] = name
+                
+                if not running:
+                    raise ValueError(f'Unresolvable stage dependencies: {list(pending)}')
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    outcome[running.pop(future)] = future.result()
+        
+        return outcome
+
+
+# Tracer that AWS calls made on the current thread are attributed to
+_ACTIVE_TRACER = threading.local()
+
+
+def peak_rss_bytes() -> int:
+    """Memory high-water mark of the process (ru_maxrss is KiB on Linux)"""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageTracer:
+    """
+    Timing breakdown of one validation.
+    
+    Each stage records wall time, rows, bytes and the process memory
+    high-water mark when it finished; each AWS operation records calls, time,
+    bytes read and errors. AWS calls are picked up from botocore's call events
+    and charged to the tracer active on the calling thread, so no call site
+    needs changing. DAG stages run concurrently, so stage times can overlap
+    and need not add up to total_ms. summary() holds integers only, which
+    keeps it storable in DynamoDB as is.
+    """
+    
+    def __init__(self, labels: Optional[Dict] = None):
+        self.labels = labels or {}
+        self.started = time.perf_counter()
+        self.stages = OrderedDict()
+        self.aws = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def activate(self):
+        """Charge AWS calls made on this thread to this tracer"""
+        previous = getattr(_ACTIVE_TRACER, 'tracer', None)
+        _ACTIVE_TRACER.tracer = self
+        try:
+            yield self
+        finally:
+            _ACTIVE_TRACER.tracer = previous
+    
+    @contextmanager
+    def stage(self, name: str):
+        with self.activate(), self.measure(name):
+            try:
+                yield self
+            finally:
+                self.annotate(name, peak_rss_bytes=peak_rss_bytes())
+    
+    @contextmanager
+    def measure(self, name: str, rows: int = 0):
+        """Add the enclosed wall time to ``name``; repeated use accumulates (per-batch work)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.annotate(name, seconds=time.perf_counter() - started, rows=rows)
+    
+    def timed_batches(self, name: str, batches) -> Iterator:
+        """Yield ``batches`` while charging the time spent producing each one to ``name``"""
+        iterator = iter(batches)
+        while True:
+            started = time.perf_counter()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                self.annotate(name, seconds=time.perf_counter() - started)
+                return
+            self.annotate(name, seconds=time.perf_counter() - started, rows=len(batch))
+            yield batch
+    
+    def annotate(self, name: str, seconds: float = 0.0, rows: int = 0, nbytes: int = 0,
+                 peak_rss_bytes: Optional[int] = None):
+        with self._lock:
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'rows': 0, 'bytes': 0})
+            entry['seconds'] += seconds
+            entry['rows'] += rows
+            entry['bytes'] += nbytes
+            if peak_rss_bytes is not None:
+                entry['peak_rss_bytes'] = peak_rss_bytes
+    
+    def record_call(self, operation: str, seconds: float, nbytes: int = 0, failed: bool = False):
+        with self._lock:
+            entry = self.aws.setdefault(operation, {'calls': 0, 'seconds': 0.0, 'bytes': 0, 'errors': 0})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['bytes'] += nbytes
+            entry['errors'] += int(failed)
+    
+    def summary(self) -> Dict:
+        with self._lock:
+            stages = {
+                name: {
+                    'duration_ms': int(entry['seconds'] * 1000),
+                    **{key: entry[key] for key in ('rows', 'bytes', 'peak_rss_bytes') if entry.get(key)}
+                }
+                for name, entry in self.stages.items()
+            }
+            aws = {
+                operation: {
+                    'calls': entry['calls'],
+                    'duration_ms': int(entry['seconds'] * 1000),
+                    'bytes': entry['bytes'],
+                    'errors': entry['errors']
+                }
+                for operation, entry in self.aws.items()
+            }
+        return {
+            'total_ms': int((time.perf_counter() - self.started) * 1000),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'slowest_stage': max(stages, key=lambda name: stages[name]['duration_ms']) if stages else None,
+            'stages': stages,
+            'aws': aws
+        }
+    
+    def emit(self, summary: Optional[Dict] = None):
+        """One EMF line per stage and per AWS operation, plus the total"""
+        if not EMIT_METRICS:
+            return
+        summary = summary or self.summary()
+        timestamp = int(time.time() * 1000)
+        
+        def line(dimension: str, value: str, metrics: Dict[str, Tuple[Any, str]]):
+            print(json.dumps({
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': METRICS_NAMESPACE,
+                        'Dimensions': [[dimension]],
+                        'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in metrics.items()]
+                    }]
+                },
+                dimension: value,
+                **{name: amount for name, (amount, _) in metrics.items()},
+                **self.labels
+            }, default=str))
+        
+        line('Stage', 'total', {'Duration': (summary['total_ms'], 'Milliseconds'),
+                                'PeakMemory': (summary['peak_rss_bytes'], 'Bytes')})
+        for name, entry in summary['stages'].items():
+            metrics = {'Duration': (entry['duration_ms'], 'Milliseconds')}
+            if 'rows' in entry:
+                metrics['Rows'] = (entry['rows'], 'Count')
+            if 'bytes' in entry:
+                metrics['Bytes'] = (entry['bytes'], 'Bytes')
+            if 'peak_rss_bytes' in entry:
+                metrics['PeakMemory'] = (entry['peak_rss_bytes'], 'Bytes')
+            line('Stage', name, metrics)
+        for operation, entry in summary['aws'].items():
+            line('Operation', operation, {
+                'Calls': (entry['calls'], 'Count'),
+                'Duration': (entry['duration_ms'], 'Milliseconds'),
+                'Bytes': (entry['bytes'], 'Bytes'),
+                'Errors': (entry['errors'], 'Count')
+            })
+
+
+def _before_aws_call(context=None, **kwargs):
+    tracer = getattr(_ACTIVE_TRACER, 'tracer', None)
+    if tracer is not None and context is not None:
+        context['hc_trace'] = (tracer, time.perf_counter())
+
+
+def _after_aws_call(event_name: str, context=None, http_response=None, model=None, exception=None, **kwargs):
+    trace = context.pop('hc_trace', None) if context is not None else None
+    if trace is None:
+        return
+    tracer, started = trace
+    nbytes = 0
+    if http_response is not None and (model is None or model.http.get('method') != 'HEAD'):
+        # Streaming bodies are not read yet, but their length is known; HEAD reads no body
+        nbytes = int(http_response.headers.get('Content-Length') or 0)
+    operation = event_name.split('.', 1)[1]
+    tracer.record_call(operation, time.perf_counter() - started, nbytes, failed=exception is not None)
+
+
+_COLUMN_EXECUTOR = None
+_COLUMN_EXECUTOR_LOCK = threading.Lock()
+
+
+def column_executor() -> Optional[ThreadPoolExecutor]:
+    """Thread pool for per-column F-4 checks, shared across warm invocations"""
+    global _COLUMN_EXECUTOR
+    if COLUMN_WORKERS <= 1:
+        return None
+    with _COLUMN_EXECUTOR_LOCK:
+        if _COLUMN_EXECUTOR is None:
+            _COLUMN_EXECUTOR = ThreadPoolExecutor(max_workers=COLUMN_WORKERS, thread_name_prefix='f4-column')
+        return _COLUMN_EXECUTOR
+
+
+class ProgressChannel:
+    """
+    F-11: Non-blocking progress updates for one validation.
+    
+    update() only enqueues; a background thread posts to the WebSocket. Updates
+    arriving within ``min_interval`` of the last post are coalesced so only the
+    newest is sent, updates older than one already queued are dropped, and the
+    bounded queue discards its oldest entry instead of blocking the validator.
+    close() flushes the newest pending update and waits for the thread.
+    Without ``post`` (no WebSocket client to notify) the channel is inert and
+    starts no thread.
+    """
+    
+    _CLOSE = object()
+    
+    def __init__(self, post: Optional[Callable[[str, int], Any]], min_interval: float = 0.25,
+                 max_pending: int = 32, clock: Callable[[], float] = time.monotonic):
+        self._post = post
+        self.min_interval = min_interval
+        self._clock = clock
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._last_progress = -1
+        self._last_post = float('-inf')
+        self._closed = False
+        self.sent = 0
+        self.dropped = 0
+        self._thread = None
+        if post is not None:
+            self._thread = threading.Thread(target=self._run, name='progress-channel', daemon=True)
+            self._thread.start()
+    
+    def update(self, message: str, progress: int):
+        if self._thread is None:
+            return
+        with self._lock:
+            if self._closed or progress < self._last_progress:
+                self.dropped += 1
+                return
+            self._last_progress = progress
+            while True:
+                try:
+                    self._queue.put_nowait((message, progress))
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+    
+    def _run(self):
+        closing = False
+        while not closing:
+            item = self._queue.get()
+            if item is self._CLOSE:
+                break
+            pending = item
+            
+            # Keep only the newest update seen during the coalescing window
+            deadline = self._last_post + self.min_interval
+            while True:
+                timeout = deadline - self._clock()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is self._CLOSE:
+                    closing = True
+                    break
+                pending = item
+                self.dropped += 1
+            
+            self._deliver(*pending)
+    
+    def _deliver(self, message: str, progress: int):
+        try:
+            self._post(message, progress)
+            self.sent += 1
+        except Exception as e:
+            print(f"Failed to send progress update: {e}")
+        self._last_post = self._clock()
+    
+    def close(self, timeout: float = 5.0):
+        """Flush the newest pending update and stop the sender thread"""
+        with self._lock:
+            if self._closed or self._thread is None:
+                return
+            self._closed = True
+        self._queue.put(self._CLOSE)
+        self._thread.join(timeout)
+
+
+class AuditWriter:
+    """
+    F-10: Audit records written off the critical path.
+    
+    add() only enqueues; a background thread, started on first use, sends up
+    to 25 records per batch_write_item call. Items DynamoDB leaves unprocessed
+    are retried with exponential backoff and full jitter, up to
+    ``max_attempts`` calls per batch, after which they are logged and counted
+    as failed. flush() blocks until everything queued so far is written or
+    given up; the Lambda handler calls it before returning, since a frozen
+    container would otherwise hold the records until its next invocation.
+    """
+    
+    MAX_BATCH = 25  # batch_write_item limit
+    
+    def __init__(self, write_batch: Callable[[List[Dict]], Dict], table_name: str,
+                 max_attempts: int = 5, base_delay: float = 0.05, max_delay: float = 2.0,
+                 sleep: Callable[[float], Any] = time.sleep):
+        self._write_batch = write_batch
+        self.table_name = table_name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._queue = queue.Queue()
+        self._idle = threading.Condition()
+        self._pending = 0
+        self._thread = None
+        self.written = 0
+        self.failed = 0
+    
+    def add(self, item: Dict):
+        with self._idle:
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+        self._queue.put(item)
+    
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait for every queued record; False if some were still pending at the timeout"""
+        with self._idle:
+            done = self._idle.wait_for(lambda: self._pending == 0, timeout)
+        if not done:
+            print(f"Audit flush timed out with {self._pending} records pending")
+        return done
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Failed to log audit entries: {e}")
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+    
+    def _write(self, batch: List[Dict]):
+        requests = [{'PutRequest': {'Item': item}} for item in batch]
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self._sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+            try:
+                response = self._write_batch(requests)
+            except Exception as e:
+                # Throttling and transient errors: retry the whole batch
+                print(f"Audit batch write failed (attempt {attempt + 1}): {e}")
+                continue
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            self.written += len(requests) - len(unprocessed)
+            requests = unprocessed
+            if not requests:
+                return
+        self.failed += len(requests)
+        print(f"Dropped {len(requests)} audit entries after {self.max_attempts} attempts")
+
+
+class AWSClientPool:
+    """
+    boto3 session, clients, resources and tables created on first use and
+    shared by every engine in the container. boto3 itself is only imported
+    when the first client is needed.
+    """
+    
+    def __init__(self):
+        self._session = None
+        self._instances = {}
+        # Re-entrant: creating a table creates its resource, which creates the session
+        self._lock = threading.RLock()
+    
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import boto3
+                self._session = boto3.session.Session()
+                # Every client created from the session reports its calls to the active StageTracer
+                self._session.events.register('before-call', _before_aws_call)
+                self._session.events.register('after-call', _after_aws_call)
+                self._session.events.register('after-call-error', _after_aws_call)
+            return self._session
+    
+    def _get(self, key: Tuple, create: Callable[[], Any]):
+        instance = self._instances.get(key)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is None:
+                    instance = self._instances[key] = create()
+        return instance
+    
+    def client(self, service: str):
+        return self._get(('client', service), lambda: self.session.client(service))
+    
+    def resource(self, service: str):
+        return self._get(('resource', service), lambda: self.session.resource(service))
+    
+    def table(self, name: str):
+        return self._get(('table', name), lambda: self.resource('dynamodb').Table(name))
+    
+    def register(self, kind: str, name: str, instance: Any):
+        """Install a pre-built client, resource or table (stubs, local stand-ins)"""
+        with self._lock:
+            self._instances[(kind, name)] = instance
+    
+    def reset(self):
+        with self._lock:
+            self._session = None
+            self._instances.clear()
+
+
+AWS_CLIENTS = AWSClientPool()
+
+
+class HeadCountValidationEngine:
+    def __init__(self, clients: Optional[AWSClientPool] = None):
+        # Clients are resolved lazily from the shared pool
+        self.clients = clients or AWS_CLIENTS
+        self.result_cache = ResultCache(lambda: self.result_cache_table)
+        self.audit_writer = AuditWriter(
+            lambda requests: self.dynamodb.batch_write_item(RequestItems={AUDIT_TABLE: requests}),
+            AUDIT_TABLE
+        )
+    
+    @property
+    def s3_client(self):
+        return self.clients.client('s3')
+    
+    @property
+    def dynamodb(self):
+        return self.clients.resource('dynamodb')
+    
+    @property
+    def ssm_client(self):
+        return self.clients.client('ssm')
+    
+    @property
+    def apigateway_client(self):
+        return self.clients.client('apigatewaymanagementapi')
+    
+    @property
+    def schemas_table(self):
+        return self.clients.table('hc-validation-schemas')
+    
+    @property
+    def result_cache_table(self):
+        return self.clients.table(RESULT_CACHE_TABLE)
+    
     def validate_file(self, file_info: Dict, partner_id: str, connection_id: str) -> Dict:
-        """Main validation orchestrator"""
+        """Main validation orchestrator; every run is traced stage by stage"""
         validation_id = str(uuid.uuid4())
+        tracer = StageTracer({
+            'validation_id': validation_id,
+            'partner_id': partner_id,
+            'hc_type': file_info.get('hc_type')
+        })
+        with tracer.activate():
+            results = self._validate_file(validation_id, file_info, partner_id, connection_id, tracer)
+        tracer.emit(results.get('timings'))
+        return results
+    
+    def _validate_file(self, validation_id: str, file_info: Dict, partner_id: str, connection_id: str,
+                       tracer: StageTracer) -> Dict:
         results = {
             'validation_id': validation_id,
             'partner_id': partner_id,
@@ -36,40 +1548,74 @@ class HeadCountValidationEngine:
             'errors': [],
             'status': 'IN_PROGRESS'
         }
+        if connection_id:
+            def post(message: str, value: int):
+                # Runs on the channel's thread, which does not inherit the tracer
+                with tracer.activate():
+                    self._send_progress(connection_id, message, value)
+            progress = ProgressChannel(post)
+        else:
+            # Batch and S3-triggered runs have no WebSocket client to notify
+            progress = ProgressChannel(None)
         
         try:
-            # F-1: Filename validation
-            self._send_progress(connection_id, 'Validating filename pattern...', 10)
-            filename_result = self._validate_filename(file_info)
-            results['validations']['filename'] = filename_result
-            
-            # F-2: File size validation
-            self._send_progress(connection_id, 'Checking file size...', 20)
-            size_result = self._validate_file_size(file_info)
-            results['validations']['file_size'] = size_result
-            
-            # F-3: Template structure validation
-            self._send_progress(connection_id, 'Validating template structure...', 30)
-            structure_result = self._validate_structure(file_info)
-            results['validations']['structure'] = structure_result
-            
-            # Load file data for detailed validations
-            df = self._load_excel_file(file_info['s3_key'])
-            
-            # F-4: Data type and format validation
-            self._send_progress(connection_id, 'Validating data types and formats...', 50)
-            data_result = self._validate_data_types(df, file_info['hc_type'])
-            results['validations']['data_types'] = data_result
-            
-            # F-5: Primary key uniqueness
-            self._send_progress(connection_id, 'Checking for duplicates...', 70)
-            uniqueness_result = self._validate_uniqueness(df, file_info['hc_type'])
-            results['validations']['uniqueness'] = uniqueness_result
-            
-            # F-6: Business rules validation
-            self._send_progress(connection_id, 'Applying business rules...', 85)
-            business_result = self._validate_business_rules(df, file_info['hc_type'])
-            results['validations']['business_rules'] = business_result
+            # F-3 to F-6 share one download, one parse and one schema lookup
+            context = ValidationContext(self, file_info, partner_id=partner_id, tracer=tracer)
+            try:
+                outcome = self._build_stages(context, progress).run()
+                
+                # Merge in a fixed order, whatever order the stages finished in
+                checks = outcome['scan']
+                results['validations']['filename'] = outcome['filename']
+                results['validations']['file_size'] = outcome['file_size']
+                
+                if context.cached is not None:
+                    # Same content and schema as an earlier run: reuse its F-3 to F-6 results
+                    results['validations'].update(context.cached['validations'])
+                    results['error_budget'] = context.cached.get('error_budget')
+                    progress.update('Identical file already validated, reusing results...', 85)
+                else:
+                    results['validations']['structure'] = outcome['structure']
+                    
+                    if checks is None:
+                        # F-3 failed: row-level results would only repeat the column errors
+                        skipped = {'status': 'SKIPPED', 'message': 'Skipped because template structure validation failed'}
+                        for name in ('data_types', 'uniqueness', 'business_rules'):
+                            results['validations'][name] = dict(skipped)
+                    else:
+                        results['validations']['data_types'] = checks['data_types'].result()
+                        
+                        # F-5: Primary key uniqueness
+                        progress.update('Checking for duplicates...', 70)
+                        results['validations']['uniqueness'] = checks['uniqueness'].result()
+                        
+                        # F-6: Business rules validation
+                        progress.update('Applying business rules...', 85)
+                        results['validations']['business_rules'] = checks['business_rules'].result()
+                    
+                    budget = context.budget
+                    results['error_budget'] = {
+                        'per_field': budget.per_field,
+                        'total': budget.total,
+                        'errors_listed': budget.kept,
+                        'rows_scanned': context.rows_scanned,
+                        'stopped_early': context.stopped_early,
+                        'truncated': budget.exhausted or any(
+                            'suppressed_errors' in error
+                            for error in results['validations'].get('data_types', {}).get('errors', [])
+                        )
+                    }
+                    if context.delta is not None:
+                        results['delta'] = context.delta.summary()
+                    if context.cache_key is not None:
+                        self.result_cache.put(context.cache_key, {
+                            'validations': {name: results['validations'][name] for name in CONTENT_STAGES},
+                            'error_budget': results['error_budget']
+                        })
+                
+                results['result_cache'] = {'hit': context.cached is not None, **self.result_cache.stats()}
+            finally:
+                context.close()
             
             # Determine overall status
             has_errors = any(v.get('errors', []) for v in results['validations'].values())
@@ -77,13 +1623,21 @@ class HeadCountValidationEngine:
             if has_errors:
                 results['status'] = 'FAILED'
                 # F-7: Generate detailed error report
-                results['error_report'] = self._generate_error_report(results)
-                self._send_progress(connection_id, 'Validation failed. Generating error report...', 100)
+                with tracer.stage('error_report'):
+                    results['error_report'] = self._generate_error_report(results)
+                progress.update('Validation failed. Generating error report...', 100)
             else:
                 results['status'] = 'PASSED'
                 # F-9: Generate presigned URL for upload
-                results['presigned_url'] = self._generate_presigned_url(file_info, partner_id)
-                self._send_progress(connection_id, 'Validation successful! Ready for upload.', 100)
+                with tracer.stage('presigned_url'):
+                    results['presigned_url'] = self._generate_presigned_url(file_info, partner_id)
+                # This file becomes the baseline for the partner's next incremental run
+                if context.delta is not None and not context.stopped_early:
+                    self._save_row_index(context)
+                progress.update('Validation successful! Ready for upload.', 100)
+            
+            progress.close()
+            results['timings'] = tracer.summary()
             
             # F-10: Audit logging
             self._log_validation_attempt(results)
@@ -93,34 +1647,152 @@ class HeadCountValidationEngine:
         except Exception as e:
             results['status'] = 'ERROR'
             results['error'] = str(e)
-            self._send_progress(connection_id, f'Validation error: {str(e)}', 100)
+            results['retryable'] = is_retryable(e)
+            progress.update(f'Validation error: {str(e)}', 100)
+            progress.close()
+            results['timings'] = tracer.summary()
             self._log_validation_attempt(results)
             return results
     
-    def _validate_filename(self, file_info: Dict) -> Dict:
-        """F-1: Validate filename pattern"""
+    def validate_files(self, requests: List[Dict], max_workers: int = BATCH_WORKERS) -> List[Dict]:
+        """
+        Validate several files in one invocation, at most ``max_workers`` at a
+        time. Each request is ``{'file_info', 'partner_id', 'connection_id'}``;
+        results come back in request order. The schema cache, result cache and
+        AWS clients are shared; one file failing does not affect the others.
+        """
+        def run(request: Dict) -> Dict:
+            try:
+                return self.validate_file(
+                    request.get('file_info', {}),
+                    request.get('partner_id', ''),
+                    request.get('connection_id', '')
+                )
+            except Exception as e:
+                # validate_file reports its own errors; this covers malformed requests
+                return {
+                    'partner_id': request.get('partner_id', ''),
+                    'file_info': request.get('file_info', {}),
+                    'status': 'ERROR',
+                    'error': str(e)
+                }
+        
+        if len(requests) <= 1 or max_workers <= 1:
+            return [run(request) for request in requests]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(requests)), thread_name_prefix='hc-batch') as pool:
+            return list(pool.map(run, requests))
+    
+    def _build_stages(self, context: ValidationContext, progress: ProgressChannel) -> StageScheduler:
+        """
+        Validation DAG. F-2 needs only file_info and runs while the schema
+        loads; F-1 takes its filename pattern from the schema and runs while
+        the result cache is checked. On a cache hit nothing else runs.
+        Otherwise the workbook downloads, F-3 reads the header row and the
+        F-4 to F-6 scan reads the rows, after F-3 so that a structural
+        failure can skip the scan.
+        """
+        file_info = context.file_info
+        tracer = context.tracer
+        
+        def lookup():
+            if context.incremental:
+                # The result depends on the baseline, and a PASSED run must refresh it
+                return
+            content_id = self._content_id(file_info)
+            if content_id:
+                context.cache_key = ResultCache.key(file_info, context.plan, content_id)
+                context.cached = self.result_cache.get(context.cache_key)
+        
+        def download():
+            if context.cached is None:
+                tracer.annotate('download', nbytes=os.path.getsize(context.download()))
+        
+        def baseline():
+            if context.cached is None and context.incremental:
+                context.baseline = self._load_row_index(context)
+        
+        def filename():
+            # F-1: Filename validation
+            progress.update('Validating filename pattern...', 10)
+            return self._validate_filename(file_info, context.plan)
+        
+        def file_size():
+            # F-2: File size validation
+            progress.update('Checking file size...', 20)
+            return self._validate_file_size(file_info)
+        
+        def open_sheet():
+            # Header and row estimate are read once, before any stage shares the reader.
+            # A missing required sheet is left to F-3, which reports it with found_sheets.
+            if context.cached is None and context.plan.required_sheet in context.sheet_names:
+                context.reader.header
+        
+        structure_result = {}
+        
+        def structure():
+            if context.cached is not None:
+                return None
+            # F-3: Template structure validation
+            progress.update('Validating template structure...', 30)
+            structure_result.update(self._validate_structure(context))
+            return structure_result
+        
+        def scan():
+            if context.cached is not None:
+                return None
+            # Without the required sheet there are no rows to check, whatever the budget says
+            if context.plan.required_sheet not in context.sheet_names:
+                return None
+            if context.budget.stop_on_structure_failure and structure_result.get('status') == 'FAILED':
+                return None
+            # F-4 to F-6 consume the same row batches in a single pass
+            progress.update('Validating data types and formats...', 50)
+            return self._scan_data(context, progress)
+        
+        def traced(name: str, func: Callable[[], Any]) -> Callable[[], Any]:
+            def run():
+                with tracer.stage(name):
+                    return func()
+            return run
+        
+        stages = StageScheduler()
+        for name, func, after in (
+            ('filename', filename, ('schema',)),
+            ('file_size', file_size, ()),
+            ('schema', lambda: context.plan, ()),
+            ('lookup', lookup, ('schema',)),
+            ('download', download, ('lookup',)),
+            ('open_sheet', open_sheet, ('download',)),
+            ('structure', structure, ('open_sheet',)),
+            ('baseline', baseline, ('lookup',)),
+            ('scan', scan, ('structure', 'baseline'))
+        ):
+            stages.add(name, traced(name, func), after=after)
+        return stages
+    
+    def _validate_filename(self, file_info: Dict, plan: Optional[ValidatorPlan] = None) -> Dict:
+        """F-1: Validate filename pattern (the schema's filename_pattern, else the built-in one)"""
         filename = file_info['filename']
         hc_type = file_info['hc_type']
         
-        patterns = {
-            'Contractors': r'^HC_Contratistas_[A-Za-z0-9]+_\d{6}\.xlsx$',
-            'Stores': r'^HC_Tiendas_\d{6}\.xlsx$',
-            'D2D': r'^HC_D2D_\d{6}\.xlsx$'
-        }
-        
-        pattern = patterns.get(hc_type)
+        if plan is not None:
+            pattern = plan.filename_pattern
+        elif hc_type in DEFAULT_FILENAME_PATTERNS:
+            pattern = PATTERNS.compile(DEFAULT_FILENAME_PATTERNS[hc_type])
+        else:
+            pattern = None
         if not pattern:
             return {
                 'status': 'FAILED',
                 'errors': [{'message': f'Unknown HC type: {hc_type}'}]
             }
         
-        if not re.match(pattern, filename):
+        if not pattern.match(filename):
             return {
                 'status': 'FAILED',
                 'errors': [{
                     'message': f'Filename does not match required pattern for {hc_type}',
-                    'expected_pattern': pattern,
+                    'expected_pattern': pattern.pattern,
                     'actual_filename': filename
                 }]
             }
@@ -130,11 +1802,12 @@ class HeadCountValidationEngine:
     def _validate_file_size(self, file_info: Dict) -> Dict:
         """F-2: Validate file size"""
         try:
-            max_size_mb = int(self.ssm_client.get_parameter(
-                Name='/hc-validation/config/max-file-size-mb'
-            )['Parameter']['Value'])
+            max_size_mb = int(SCHEMA_CACHE.get_or_load(
+                ('ssm', MAX_FILE_SIZE_PARAMETER),
+                lambda: self.ssm_client.get_parameter(Name=MAX_FILE_SIZE_PARAMETER)['Parameter']['Value']
+            ))
         except:
-            max_size_mb = 50  # Default
+            max_size_mb = DEFAULT_MAX_FILE_SIZE_MB
         
         file_size_mb = file_info['size_bytes'] / (1024 * 1024)
         
@@ -153,41 +1826,40 @@ class HeadCountValidationEngine:
             'message': f'File size {file_size_mb:.2f}MB is within limits'
         }
     
-    def _validate_structure(self, file_info: Dict) -> Dict:
+    def _validate_structure(self, context: ValidationContext) -> Dict:
         """F-3: Validate template structure"""
         try:
-            # Get schema configuration
-            schema = self._get_schema_config(file_info['hc_type'])
-            
-            # Load Excel file to check structure
-            excel_file = self._load_excel_file(file_info['s3_key'], header_only=True)
+            plan = context.plan
             
             errors = []
             
             # Check sheet name
-            if schema['required_sheet'] not in excel_file.sheet_names:
-                errors.append({
-                    'message': f'Required sheet "{schema["required_sheet"]}" not found',
-                    'found_sheets': excel_file.sheet_names
-                })
+            if plan.required_sheet not in context.sheet_names:
+                return {
+                    'status': 'FAILED',
+                    'errors': [{
+                        'message': f'Required sheet "{plan.required_sheet}" not found',
+                        'found_sheets': context.sheet_names
+                    }]
+                }
             
             # Check columns
-            df = pd.read_excel(excel_file, sheet_name=schema['required_sheet'], nrows=0)
-            expected_columns = [field['name'] for field in schema['fields']]
-            actual_columns = df.columns.tolist()
+            expected_columns = plan.expected_columns
+            actual_columns = context.header
             
-            missing_columns = set(expected_columns) - set(actual_columns)
+            # Lists in schema/sheet order so the result does not depend on set ordering
+            missing_columns = [c for c in expected_columns if c not in set(actual_columns)]
             if missing_columns:
                 errors.append({
                     'message': 'Missing required columns',
-                    'missing_columns': list(missing_columns)
+                    'missing_columns': missing_columns
                 })
             
-            extra_columns = set(actual_columns) - set(expected_columns)
+            extra_columns = [c for c in actual_columns if c not in set(expected_columns)]
             if extra_columns:
                 errors.append({
                     'message': 'Unexpected columns found',
-                    'extra_columns': list(extra_columns)
+                    'extra_columns': extra_columns
                 })
             
             if errors:
@@ -201,181 +1873,137 @@ class HeadCountValidationEngine:
                 'errors': [{'message': f'Structure validation error: {str(e)}'}]
             }
     
-    def _validate_data_types(self, df: pd.DataFrame, hc_type: str) -> Dict:
-        """F-4: Validate data types and formats"""
-        schema = self._get_schema_config(hc_type)
-        errors = []
-        
-        for field in schema['fields']:
-            field_name = field['name']
-            if field_name not in df.columns:
-                continue
-            
-            column_data = df[field_name]
-            
-            # Check mandatory fields
-            if field.get('mandatory', False):
-                null_count = column_data.isnull().sum()
-                if null_count > 0:
-                    null_rows = df[column_data.isnull()].index.tolist()
-                    errors.append({
-                        'field': field_name,
-                        'message': f'Mandatory field has {null_count} null values',
-                        'rows': [r + 2 for r in null_rows]  # +2 for Excel row numbering
-                    })
-            
-            # Validate data type
-            if field['type'] == 'string':
-                # String length validation
-                if 'min_length' in field or 'max_length' in field:
-                    for idx, value in column_data.items():
-                        if pd.notna(value):
-                            value_len = len(str(value))
-                            if field.get('min_length', 0) > value_len:
-                                errors.append({
-                                    'field': field_name,
-                                    'row': idx + 2,
-                                    'message': f'Value too short (min: {field["min_length"]})',
-                                    'value': str(value)
-                                })
-                            if field.get('max_length', float('inf')) < value_len:
-                                errors.append({
-                                    'field': field_name,
-                                    'row': idx + 2,
-                                    'message': f'Value too long (max: {field["max_length"]})',
-                                    'value': str(value)
-                                })
-                
-                # Pattern validation
-                if 'pattern' in field:
-                    pattern = re.compile(field['pattern'])
-                    for idx, value in column_data.items():
-                        if pd.notna(value) and not pattern.match(str(value)):
-                            errors.append({
-                                'field': field_name,
-                                'row': idx + 2,
-                                'message': f'Value does not match required pattern',
-                                'pattern': field['pattern'],
-                                'value': str(value)
-                            })
-            
-            elif field['type'] == 'date':
-                # ISO 8601 date validation
-                for idx, value in column_data.items():
-                    if pd.notna(value):
-                        try:
-                            pd.to_datetime(value, format='%Y-%m-%d')
-                        except:
-                            errors.append({
-                                'field': field_name,
-                                'row': idx + 2,
-                                'message': 'Invalid date format (expected: YYYY-MM-DD)',
-                                'value': str(value)
-                            })
-            
-            elif field['type'] == 'email':
-                # Email validation
-                email_pattern = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
-                for idx, value in column_data.items():
-                    if pd.notna(value) and not email_pattern.match(str(value)):
-                        errors.append({
-                            'field': field_name,
-                            'row': idx + 2,
-                            'message': 'Invalid email format',
-                            'value': str(value)
-                        })
-        
-        if errors:
-            return {'status': 'FAILED', 'errors': errors}
-        
-        return {'status': 'PASSED', 'message': 'Data type validation successful'}
-    
-    def _validate_uniqueness(self, df: pd.DataFrame, hc_type: str) -> Dict:
-        """F-5: Validate primary key uniqueness"""
-        schema = self._get_schema_config(hc_type)
+    def _scan_data(self, context: ValidationContext, progress: Optional[ProgressChannel] = None) -> Dict[str, Any]:
+        """
+        F-4, F-5 and F-6 over one streaming pass of the required sheet. The pass
+        stops early once the error budget is spent: the report is already full
+        and reading the remaining rows would not change the verdict.
         
-        # Get primary key fields
-        pk_fields = [f['name'] for f in schema['fields'] if f.get('primary_key_component', False)]
+        In incremental mode F-4 and F-6, which only look at one row at a time,
+        skip rows identical to the partner's last PASSED file under the same
+        schema; F-5 still sees every row.
+        """
+        from excel_streaming import RowDelta
         
-        if not pk_fields:
-            return {'status': 'PASSED', 'message': 'No primary key defined'}
-        
-        # Check for duplicates
-        duplicates = df[df.duplicated(subset=pk_fields, keep=False)]
+        plan = context.plan
+        budget = context.budget
+        checks = {
+            'data_types': DataTypeCheck(plan, budget),
+            'uniqueness': UniquenessCheck(plan.pk_fields, budget, plan.field_types),
+            'business_rules': BusinessRuleCheck(plan.business_rules, budget)
+        }
+        if context.incremental:
+            header = set(context.header)
+            context.delta = RowDelta(
+                [name for name in plan.pk_fields if name in header],
+                [name for name in plan.expected_columns if name in header],
+                context.baseline,
+                field_types=plan.field_types
+            )
         
-        if not duplicates.empty:
-            duplicate_groups = []
-            for _, group in duplicates.groupby(pk_fields):
-                rows = group.index.tolist()
-                duplicate_groups.append({
-                    'key_values': {field: group[field].iloc[0] for field in pk_fields},
-                    'rows': [r + 2 for r in rows]  # +2 for Excel row numbering
-                })
-            
-            return {
-                'status': 'FAILED',
-                'errors': [{
-                    'message': f'Duplicate primary key values found',
-                    'primary_key_fields': pk_fields,
-                    'duplicates': duplicate_groups
-                }]
-            }
+        # Row-level progress moves between the 50% and 70% milestones
+        expected_rows = context.reader.row_estimate
+        rows_checked = 0
+        executor = column_executor()
+        tracer = context.tracer
+        for batch in tracer.timed_batches('parse', context.batches()):
+            with tracer.measure('uniqueness', len(batch)):
+                checks['uniqueness'].consume(batch)
+            rows = batch if context.delta is None else context.delta.split(batch)
+            with tracer.measure('data_types', len(rows)):
+                checks['data_types'].consume(rows, executor)
+            with tracer.measure('business_rules', len(rows)):
+                checks['business_rules'].consume(rows)
+            rows_checked += len(batch)
+            context.rows_scanned = rows_checked
+            tracer.annotate('scan', rows=len(batch))
+            if budget.exhausted:
+                context.stopped_early = True
+                break
+            if progress is not None:
+                share = min(rows_checked / expected_rows, 1.0) if expected_rows else 0.0
+                progress.update(f'Validating data types and formats... {rows_checked:,} rows checked',
+                                50 + int(share * 19))
         
-        return {'status': 'PASSED', 'message': 'Primary key uniqueness validated'}
+        return checks
     
-    def _validate_business_rules(self, df: pd.DataFrame, hc_type: str) -> Dict:
-        """F-6: Validate business rules"""
-        schema = self._get_schema_config(hc_type)
-        errors = []
-        
-        # Apply business rules based on HC type
-        if hc_type == 'Contractors':
-            # Example: Termination reason required if termination date present
-            if 'termination_date' in df.columns and 'termination_reason' in df.columns:
-                mask = df['termination_date'].notna() & df['termination_reason'].isna()
-                invalid_rows = df[mask].index.tolist()
-                if invalid_rows:
-                    errors.append({
-                        'rule': 'termination_reason_required',
-                        'message': 'Termination reason required when termination date is present',
-                        'rows': [r + 2 for r in invalid_rows]
-                    })
-        
-        # Add more business rules as needed
-        
-        if errors:
-            return {'status': 'FAILED', 'errors': errors}
+    def _row_index_key(self, context: ValidationContext) -> str:
+        return f"{ROW_INDEX_PREFIX}/{context.hc_type}/{context.partner_id or '_'}.npz"
+    
+    def _load_row_index(self, context: ValidationContext):
+        """Baseline for incremental validation; None means validate every row"""
+        from excel_streaming import RowDelta
         
-        return {'status': 'PASSED', 'message': 'Business rules validation successful'}
+        try:
+            response = self.s3_client.get_object(Bucket=STATE_BUCKET, Key=self._row_index_key(context))
+            return RowDelta.baseline_from_bytes(response['Body'].read(), context.plan.fingerprint)
+        except Exception as e:
+            print(f"No row index baseline for {context.partner_id}/{context.hc_type}: {str(e)}")
+            return None
+    
+    def _save_row_index(self, context: ValidationContext):
+        try:
+            self.s3_client.put_object(
+                Bucket=STATE_BUCKET,
+                Key=self._row_index_key(context),
+                Body=context.delta.to_bytes(context.plan.fingerprint)
+            )
+        except Exception as e:
+            print(f"Failed to store row index: {str(e)}")
     
     def _generate_error_report(self, validation_results: Dict) -> Dict:
-        """F-7: Generate comprehensive error report"""
-        total_errors = 0
-        detailed_errors = []
-        
-        for validation_type, result in validation_results['validations'].items():
-            if result.get('errors'):
-                for error in result['errors']:
-                    total_errors += 1
-                    detailed_errors.append({
-                        'validation_type': validation_type,
-                        'error_id': f"ERR_{total_errors:04d}",
-                        'timestamp': datetime.now().isoformat(),
-                        **error
-                    })
+        """
+        F-7: Error report. Errors go into a columnar ErrorStore and are
+        streamed to S3 as JSON Lines, CSV or xlsx; the result keeps only the
+        summary and a download link.
+        """
+        store = ErrorStore.from_validations(validation_results['validations'])
+        report_id = str(uuid.uuid4())
+        file_info = validation_results['file_info']
         
-        return {
-            'report_id': str(uuid.uuid4()),
+        report = {
+            'report_id': report_id,
             'timestamp': datetime.now().isoformat(),
-            'total_errors': total_errors,
-            'file_info': validation_results['file_info'],
-            'errors': detailed_errors,
-            'suggested_actions': self._generate_suggested_actions(detailed_errors)
+            'total_errors': len(store),
+            'file_info': file_info,
+            'summary': store.summary(),
+            'suggested_actions': self._generate_suggested_actions(store.validation_types())
+        }
+        report_format = file_info.get('report_format', ERROR_REPORT_FORMAT)
+        key = f"{ERROR_REPORT_PREFIX}/{validation_results['partner_id'] or '_'}/{report_id}.{report_format}"
+        try:
+            report['report_file'] = self._upload_error_report(store, report_format, key)
+        except Exception as e:
+            print(f"Failed to upload error report: {str(e)}")
+            report['report_file'] = None
+            report['report_error'] = str(e)
+        return report
+    
+    def _upload_error_report(self, store: ErrorStore, report_format: str, key: str) -> Dict:
+        from excel_streaming import S3MultipartWriter
+        
+        writers = {
+            'jsonl': (store.write_jsonl, 'application/x-ndjson'),
+            'csv': (store.write_csv, 'text/csv'),
+            'xlsx': (store.write_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
         }
+        if report_format not in writers:
+            raise ValueError(f'Unsupported report format: {report_format}')
+        write, content_type = writers[report_format]
+        
+        with S3MultipartWriter(self.s3_client, STATE_BUCKET, key, content_type=content_type) as stream:
+            write(stream)
+        
+        url = self.s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': STATE_BUCKET, 'Key': key},
+            ExpiresIn=3600  # 1 hour
+        )
+        return {'bucket': STATE_BUCKET, 'key': key, 'format': report_format, 'url': url, 'expires_in': 3600}
     
     def _generate_presigned_url(self, file_info: Dict, partner_id: str) -> Dict:
         """F-9: Generate secure presigned URL"""
-        bucket_name = 'hc-validation-s3-exchange-prod'
+        bucket_name = EXCHANGE_BUCKET
         key = f"{partner_id}/{file_info['hc_type']}/{datetime.now().strftime('%Y/%m/%d')}/{file_info['filename']}"
         
         presigned_url = self.s3_client.generate_presigned_url(
@@ -398,7 +2026,7 @@ class HeadCountValidationEngine:
         }
     
     def _send_progress(self, connection_id: str, message: str, progress: int):
-        """F-11: Send real-time progress updates via WebSocket"""
+        """F-11: Post one progress update via WebSocket (runs on the ProgressChannel thread)"""
         try:
             self.apigateway_client.post_to_connection(
                 ConnectionId=connection_id,
@@ -413,32 +2041,52 @@ class HeadCountValidationEngine:
             print(f"Failed to send progress update: {e}")
     
     def _log_validation_attempt(self, results: Dict):
-        """F-10: Audit logging"""
-        try:
-            self.audit_table.put_item(
-                Item={
-                    'partner_id': results['partner_id'],
-                    'timestamp': results['timestamp'],
-                    'validation_id': results['validation_id'],
-                    'status': results['status'],
-                    'file_info': results['file_info'],
-                    'error_count': len(results.get('errors', [])),
-                    'ttl': int((datetime.now() + timedelta(days=90)).timestamp())
-                }
-            )
-        except Exception as e:
-            print(f"Failed to log audit entry: {e}")
+        """F-10: Audit logging; queued for the AuditWriter, flushed before the handler returns"""
+        item = {
+            'partner_id': results['partner_id'],
+            'timestamp': results['timestamp'],
+            'validation_id': results['validation_id'],
+            'status': results['status'],
+            'file_info': results['file_info'],
+            'error_count': error_count(results),
+            'timings': results.get('timings'),
+            'ttl': int((datetime.now() + timedelta(days=AUDIT_TTL_DAYS)).timestamp())
+        }
+        if results.get('error'):
+            item['error'] = results['error']
+        self.audit_writer.add(item)
+    
+    def _get_schema_config(self, hc_type: str, version: str = 'latest') -> Dict:
+        """Load schema configuration (cached) from DynamoDB"""
+        return self._get_validator_plan(hc_type, version).schema
     
-    def _get_schema_config(self, hc_type: str) -> Dict:
-        """Load schema configuration from DynamoDB"""
+    def _get_validator_plan(self, hc_type: str, version: str = 'latest') -> ValidatorPlan:
+        """Compiled schema from the warm-container cache, loading it from DynamoDB on a miss"""
+        key = ('schema', hc_type, version)
+        plan = SCHEMA_CACHE.get(key)
+        if plan is None:
+            record = self._get_schema_record(hc_type, version)
+            if record is None:
+                # Default schema when the record is missing; not cached so the table is retried next time
+                return ValidatorPlan(self._get_default_schema(hc_type))
+            # A bad regex or business rule in the record raises here: it must be fixed,
+            # not replaced by the defaults
+            plan = ValidatorPlan(record)
+            SCHEMA_CACHE.put(key, plan)
+        return plan
+    
+    def _get_schema_record(self, hc_type: str, version: str) -> Optional[Dict]:
+        """Schema record from DynamoDB; None when it does not exist or cannot be read"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        
         try:
             response = self.schemas_table.get_item(
-                Key={'hc_type': hc_type, 'version': 'latest'}
+                Key={'hc_type': hc_type, 'version': version}
             )
-            return response['Item']
-        except:
-            # Return default schema if not found
-            return self._get_default_schema(hc_type)
+        except (BotoCoreError, ClientError) as e:
+            print(f"Schema lookup failed for {hc_type}/{version}: {str(e)}")
+            return None
+        return response.get('Item')
     
     def _get_default_schema(self, hc_type: str) -> Dict:
         """Default schema configurations"""
@@ -461,21 +2109,47 @@ class HeadCountValidationEngine:
                         'pattern': r'^[A-Za-z0-9]{4,12}$',
                         'primary_key_component': True
                     }
-                ]
+                ],
+                'business_rules': DEFAULT_BUSINESS_RULES['Contractors']
             }
         }
         return schemas.get(hc_type, {})
     
-    def _load_excel_file(self, s3_key: str, header_only: bool = False):
-        """Load Excel file from S3"""
-        # Implementation to load Excel file from S3
-        pass
+    def _content_id(self, file_info: Dict) -> Optional[str]:
+        """
+        Identity of the uploaded bytes: a client-supplied content hash, the
+        ETag carried in file_info, or the object's ETag from a HEAD request.
+        None disables the result cache for this file.
+        """
+        if file_info.get('content_hash'):
+            return f"sha256:{file_info['content_hash']}"
+        etag = file_info.get('etag')
+        if not etag:
+            try:
+                etag = self.s3_client.head_object(
+                    Bucket=file_info.get('s3_bucket', EXCHANGE_BUCKET),
+                    Key=file_info['s3_key']
+                )['ETag']
+            except Exception as e:
+                print(f"Could not read ETag for {file_info.get('s3_key')}: {str(e)}")
+                return None
+        return f"etag:{etag.strip(chr(34))}"
     
-    def _generate_suggested_actions(self, errors: List[Dict]) -> List[str]:
-        """Generate suggested actions based on errors"""
+    def _load_excel_file(self, file_info: Dict) -> str:
+        """Spool Excel file from S3 to local disk and return its path"""
+        from excel_streaming import spool_s3_object
+        
+        return spool_s3_object(
+            self.s3_client,
+            file_info.get('s3_bucket', EXCHANGE_BUCKET),
+            file_info['s3_key']
+        )
+    
+    def _generate_suggested_actions(self, validation_types: List[str]) -> List[str]:
+        """Generate suggested actions based on the validations that reported errors"""
         suggestions = []
         
-        error_types = set(error.get('validation_type', '') for error in errors)
+        error_types = set(validation_types)
         
         if 'filename' in error_types:
             suggestions.append("Check filename follows the pattern: HC_<FileType><_PartnerID><YYYYMM>.xlsx")
@@ -489,17 +2163,187 @@ class HeadCountValidationEngine:
         return suggestions
 
 
+_ENGINE = None
+
+
+def get_engine() -> HeadCountValidationEngine:
+    """Engine reused across warm invocations of this container"""
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = HeadCountValidationEngine()
+    return _ENGINE
+
+
+def error_count(results: Dict) -> int:
+    """Errors found across all validations, including those left out of capped error lists"""
+    return sum(
+        result.get('error_count', len(result.get('errors', [])))
+        for result in results.get('validations', {}).values()
+    )
+
+
+def response_summary(results: Dict) -> Dict:
+    """
+    Results as returned by the Lambda: each validation is reduced to its
+    status and error count; the errors themselves are in the F-7 report file.
+    If that file could not be uploaded, the first INLINE_ERROR_SAMPLE errors
+    of each validation stay inline so the caller still sees what failed.
+    """
+    report = results.get('error_report')
+    sample = INLINE_ERROR_SAMPLE if report is not None and not report.get('report_file') else 0
+    summary = {key: value for key, value in results.items() if key not in ('validations', 'errors')}
+    summary['validations'] = {}
+    for name, result in results.get('validations', {}).items():
+        compact = {key: value for key, value in result.items() if key != 'errors'}
+        if result.get('errors'):
+            compact.setdefault('error_count', len(result['errors']))
+            if sample:
+                compact['errors'] = result['errors'][:sample]
+        summary['validations'][name] = compact
+    return summary
+
+
+# Filename prefix of each HC type, for files that arrive through S3 events
+HC_TYPE_PREFIXES = {
+    'HC_Contratistas_': 'Contractors',
+    'HC_Tiendas_': 'Stores',
+    'HC_D2D_': 'D2D'
+}
+
+
+def file_request_from_s3_record(record: Dict) -> Dict:
+    """
+    Validation request for one S3 event record. The object's folder is taken
+    as the partner id (``.../<partner_id>/<filename>``) and the HC type comes
+    from the filename prefix.
+    """
+    from urllib.parse import unquote_plus
+    
+    bucket = record['s3']['bucket']['name']
+    key = unquote_plus(record['s3']['object']['key'])
+    folders, _, filename = key.rpartition('/')
+    hc_type = next((hc for prefix, hc in HC_TYPE_PREFIXES.items() if filename.startswith(prefix)), None)
+    if hc_type is None:
+        raise ValueError(f'Cannot infer HC type from filename: {filename}')
+    
+    file_info = {
+        'filename': filename,
+        'hc_type': hc_type,
+        'size_bytes': record['s3']['object'].get('size', 0),
+        's3_bucket': bucket,
+        's3_key': key
+    }
+    etag = record['s3']['object'].get('eTag')
+    if etag:
+        file_info['etag'] = etag
+    return {'file_info': file_info, 'partner_id': folders.rpartition('/')[2], 'connection_id': ''}
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether an error may pass on a later attempt: AWS throttling, server-side
+    and timeout errors, and connection failures. Everything else (a corrupt
+    workbook, a missing object, a bad schema) is permanent.
+    """
+    from botocore.exceptions import ClientError, ConnectionError as AWSConnectionError, HTTPClientError
+    
+    if isinstance(error, ClientError):
+        code = error.response.get('Error', {}).get('Code', '')
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        return code in RETRYABLE_ERROR_CODES or status >= 500
+    return isinstance(error, (AWSConnectionError, HTTPClientError, ConnectionError, TimeoutError))
+
+
+def _batch_requests(event: Dict) -> List[Tuple[Optional[str], Any]]:
+    """
+    (item id, request or error) pairs for a batch event: ``{'files': [...]}``,
+    S3 event records, or SQS records whose bodies are S3 events. The item id
+    is the SQS message id, used for partial-batch failure reporting.
+    """
+    if 'files' in event:
+        return [(None, request) for request in event['files']]
+    
+    items = []
+    for record in event.get('Records', []):
+        if record.get('eventSource') == 'aws:sqs':
+            message_id = record['messageId']
+            try:
+                body = json.loads(record['body'])
+                s3_records = body.get('Records', [])
+            except (TypeError, ValueError) as e:
+                items.append((message_id, e))
+                continue
+        else:
+            message_id, s3_records = None, [record]
+        for s3_record in s3_records:
+            try:
+                items.append((message_id, file_request_from_s3_record(s3_record)))
+            except (KeyError, ValueError) as e:
+                items.append((message_id, e))
+    return items
+
+
 def lambda_handler(event, context):
-    """Lambda handler for validation engine"""
-    engine = HeadCountValidationEngine()
+    """Lambda handler for validation engine: one file_info, or a batch of files"""
+    engine = get_engine()
+    
+    if 'files' in event or 'Records' in event:
+        response = batch_handler(engine, event)
+        engine.audit_writer.flush()
+        return response
     
     file_info = event.get('file_info', {})
     partner_id = event.get('partner_id', '')
     connection_id = event.get('connection_id', '')
     
     results = engine.validate_file(file_info, partner_id, connection_id)
+    engine.audit_writer.flush()
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps(response_summary(results), default=str)
+    }
+
+
+def batch_handler(engine: HeadCountValidationEngine, event: Dict) -> Dict:
+    """
+    Validate every file of a batch event. FAILED is a verdict on the file and
+    counts as processed. An ERROR is reported in batchItemFailures, so that
+    SQS redelivers the message, only when it is retryable (see is_retryable).
+    Permanent errors, such as an unparseable body, a key without a known HC
+    prefix or a corrupt workbook, are logged and dropped: a redelivery would
+    fail again and re-validate the message's other files each time.
+    """
+    items = _batch_requests(event)
+    runnable = [(position, request) for position, (_, request) in enumerate(items) if isinstance(request, dict)]
+    validated = engine.validate_files([request for _, request in runnable])
+    
+    results = [None] * len(items)
+    for (position, _), result in zip(runnable, validated):
+        results[position] = result
+    for position, (_, request) in enumerate(items):
+        if results[position] is None:
+            results[position] = {'status': 'ERROR', 'error': str(request)}
+    
+    failed_items = []
+    for (item_id, _), result in zip(items, results):
+        if result['status'] != 'ERROR' or item_id is None:
+            continue
+        if result.get('retryable'):
+            if item_id not in failed_items:
+                failed_items.append(item_id)
+        else:
+            print(f"Dropping message {item_id} after a permanent error: {result.get('error')}")
+    
+    summary = {status: 0 for status in ('PASSED', 'FAILED', 'ERROR')}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
     
     return {
         'statusCode': 200,
-        'body': json.dumps(results)
+        'body': json.dumps(
+            {'summary': {'total': len(results), **summary}, 'results': [response_summary(r) for r in results]},
+            default=str
+        ),
+        'batchItemFailures': [{'itemIdentifier': item_id} for item_id in failed_items]
     }
\ No newline at end of file
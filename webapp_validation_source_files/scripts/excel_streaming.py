@@ -0,0 +1,708 @@
+#!/usr/bin/env python3
+"""
+Streaming Excel helpers shared by the validation engine and the Excel processor.
+
+The S3 body is spooled to local disk in fixed-size chunks and the sheet is read
+with openpyxl in read-only mode, yielding fixed-size row batches as DataFrames.
+Peak memory is bounded by the batch size instead of the workbook size.
+Columns declared in a schema are typed as each batch is built (string[pyarrow],
+nullable integers and floats, datetime64, categoricals for enums), and both
+validation and the CSV/Parquet writers work on that typed frame.
+Checks that span the whole sheet, such as key uniqueness, keep compact
+NumPy state between batches instead of the rows themselves. Output goes the
+same way: batches are written as CSV or Parquet straight into an S3
+multipart upload, so no stage ever holds the whole file.
+"""
+
+import io
+import os
+import tempfile
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+DEFAULT_BATCH_SIZE = 5000
+SPOOL_CHUNK_BYTES = 1024 * 1024
+# S3 rejects multipart parts under 5 MiB, except the last one
+MULTIPART_PART_BYTES = 8 * 1024 * 1024
+
+
+def spool_s3_object(s3_client, bucket: str, key: str, directory: Optional[str] = None) -> str:
+    """Copy an S3 object to a local temporary file without holding it in memory"""
+    response = s3_client.get_object(Bucket=bucket, Key=key)
+    suffix = os.path.splitext(key)[1] or '.xlsx'
+    handle, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as spool:
+            for chunk in response['Body'].iter_chunks(chunk_size=SPOOL_CHUNK_BYTES):
+                spool.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def _normalize_cell(value):
+    """Match pandas' openpyxl conversion: blanks are missing, integral floats are ints"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class ExcelBatchReader:
+    """
+    Read-only, batch-at-a-time view of one worksheet.
+
+    Each batch is indexed by its position in the sheet (Excel row - 2), so the
+    existing ``idx + 2`` row numbering keeps pointing at the right Excel row
+    even across batches and blank lines. Blank rows are skipped, like
+    ``pd.read_excel`` does.
+
+    ``fields`` maps column names to schema field definitions (``type`` and,
+    for enums, ``values``); those columns are converted with coerce_column in
+    strict mode, other columns keep pandas' inferred dtype.
+    """
+
+    def __init__(self, path: str, sheet_name: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, fields: Optional[Dict[str, Dict]] = None):
+        self.path = path
+        self.batch_size = batch_size
+        self.fields = fields or {}
+        self._workbook = load_workbook(path, read_only=True, data_only=True)
+        self._sheet_name = sheet_name
+        self._header = None
+        self._row_estimate = None
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return self._workbook.sheetnames
+
+    def _worksheet(self):
+        if self._sheet_name is None:
+            worksheet = self._workbook.worksheets[0]
+        else:
+            worksheet = self._workbook[self._sheet_name]
+        if self._row_estimate is None and worksheet.max_row:
+            self._row_estimate = max(worksheet.max_row - 1, 0)
+        worksheet.reset_dimensions()
+        return worksheet
+
+    @property
+    def row_estimate(self) -> Optional[int]:
+        """Data rows according to the sheet's dimension record; None if it has none"""
+        self.header
+        return self._row_estimate
+
+    @property
+    def header(self) -> List[str]:
+        """Column names from the first row; only the first row is parsed"""
+        if self._header is None:
+            rows = self._worksheet().iter_rows(max_row=1, values_only=True)
+            first = next(rows, ())
+            while first and first[-1] is None:
+                first = first[:-1]
+            self._header = ['' if value is None else str(value) for value in first]
+        return self._header
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        columns = self.header
+        width = len(columns)
+        rows, index = [], []
+
+        values = self._worksheet().iter_rows(min_row=2, values_only=True)
+        for position, row in enumerate(values):
+            row = [_normalize_cell(value) for value in row[:width]]
+            if not any(value is not None for value in row):
+                continue
+            row.extend([None] * (width - len(row)))
+            rows.append(row)
+            index.append(position)
+            if len(rows) >= self.batch_size:
+                yield self._frame(rows, index, columns)
+                rows, index = [], []
+
+        if rows:
+            yield self._frame(rows, index, columns)
+
+    def _frame(self, rows: List[List], index: List[int], columns: List[str]) -> pd.DataFrame:
+        # Start from the raw cells so declared columns are converted from the
+        # original values, not from whatever dtype pandas would have inferred
+        frame = pd.DataFrame(np.array(rows, dtype=object).reshape(len(rows), len(columns)),
+                             index=index, columns=columns)
+        for position, name in enumerate(columns):
+            field = self.fields.get(name)
+            if field is not None:
+                frame.isetitem(position, coerce_column(
+                    frame.iloc[:, position], field.get('type'), strict=True, categories=field.get('values')
+                ))
+        return frame.infer_objects()
+
+    def read_all(self) -> pd.DataFrame:
+        """Whole sheet as one frame, for callers that still need it"""
+        batches = list(self)
+        if not batches:
+            return pd.DataFrame(columns=self.header)
+        return pd.concat(batches)
+
+    def close(self):
+        self._workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _plain_text(column: pd.Series) -> pd.Series:
+    # Missing cells stay None, which pandas hashes apart from every string,
+    # the text 'None' included
+    text = column.astype(object).astype(str).astype(object)
+    return text.where(column.notna().to_numpy(dtype=bool), None)
+
+
+def canonical_text(column: pd.Series, field_type: Optional[str] = None) -> pd.Series:
+    """
+    Cells as text in one form per schema field type, whether the batch was
+    typed at read time or kept raw because a cell did not convert. Dates and
+    numbers are rendered from their parsed value (a datetime64 cell and its
+    ISO string agree, so do 5, 5.0 and '5'); cells that do not parse, and
+    every other type, render as ``str(value)``; missing cells stay missing.
+    """
+    dtype = COLUMN_DTYPES.get(field_type)
+    if dtype is None or not (dtype.startswith('datetime64') or dtype in ('Int64', 'Float64')):
+        return _plain_text(column)
+
+    text = _plain_text(column)
+    if dtype.startswith('datetime64'):
+        parsed = column if pd.api.types.is_datetime64_dtype(column) else \
+            pd.to_datetime(column, errors='coerce', format='mixed')
+        valid = parsed.notna().to_numpy(dtype=bool)
+        stamps = np.datetime_as_string(parsed.to_numpy(dtype='datetime64[s]')[valid], unit='s')
+        text[valid] = stamps
+        return text
+
+    parsed = column if str(column.dtype) in ('Int64', 'Float64') else pd.to_numeric(column, errors='coerce')
+    parsed = parsed.astype('Float64') if str(parsed.dtype) != 'Int64' else parsed
+    valid = parsed.notna().to_numpy(dtype=bool)
+    integral = valid & (parsed % 1 == 0).fillna(False).to_numpy(dtype=bool) & \
+        (parsed.abs() < 2 ** 63).fillna(False).to_numpy(dtype=bool)
+    text[integral] = parsed[integral].astype('Int64').astype(str)
+    fractional = valid & ~integral
+    text[fractional] = parsed[fractional].astype(str)
+    return text
+
+
+def hash_rows(frame: pd.DataFrame, field_types: Optional[Dict[str, str]] = None) -> np.ndarray:
+    """
+    64-bit hash of each row's canonical text form (see canonical_text, with
+    ``field_types`` mapping columns to schema field types), so a key hashes
+    the same in a typed batch and in one where strict coercion fell back to
+    raw cells. Never returns 0, which marks empty table slots.
+    """
+    field_types = field_types or {}
+    text = pd.DataFrame(
+        {column: canonical_text(frame[column], field_types.get(column)) for column in frame.columns},
+        index=frame.index
+    )
+    hashes = pd.util.hash_pandas_object(text, index=False).to_numpy(dtype=np.uint64, copy=True)
+    hashes[hashes == 0] = 1
+    return hashes
+
+
+class UniquenessIndex:
+    """
+    Incremental duplicate detector for key tuples over row batches.
+
+    Each key tuple is reduced to a 64-bit hash with ``pd.util.hash_pandas_object``
+    and inserted into a NumPy open-addressing table (linear probing, resized at
+    half load). Inserts are vectorized per batch: every probing round resolves
+    all pending keys of the batch at once. Only the rows that turn out to be
+    duplicates are kept in Python structures, so memory grows with 16 bytes per
+    distinct key rather than with the rows. Two different keys sharing a 64-bit
+    hash would be reported as duplicates; at HeadCount file sizes the odds are
+    negligible.
+    """
+
+    MAX_LOAD = 0.5
+    EMPTY = np.uint64(0)
+
+    def __init__(self, key_columns: List[str], capacity: int = 1 << 16, skip_null_keys: bool = True,
+                 field_types: Optional[Dict[str, str]] = None):
+        self.key_columns = key_columns
+        self.field_types = field_types or {}
+        self.skip_null_keys = skip_null_keys
+        self._capacity = 1 << max(int(capacity - 1).bit_length(), 4)
+        self._hashes = np.zeros(self._capacity, dtype=np.uint64)
+        self._rows = np.zeros(self._capacity, dtype=np.int64)
+        self._size = 0
+        self._dup_hashes = []
+        self._dup_rows = []
+        self._dup_keys = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def duplicate_count(self) -> int:
+        """Rows whose key was already seen earlier in the sheet"""
+        return sum(len(rows) for rows in self._dup_rows)
+
+    @property
+    def has_duplicates(self) -> bool:
+        return any(len(rows) for rows in self._dup_rows)
+
+    def _hash(self, keys: pd.DataFrame) -> np.ndarray:
+        return hash_rows(keys, self.field_types)
+
+    def _insert(self, hashes: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Insert hashes and return which of them were already present. When
+        several rows of a batch claim the same empty slot the earliest wins,
+        so the first row of a group is always its first appearance.
+        """
+        mask = np.uint64(self._capacity - 1)
+        slots = (hashes & mask).astype(np.int64)
+        found = np.zeros(len(hashes), dtype=bool)
+        pending = np.arange(len(hashes))
+
+        while pending.size:
+            current = self._hashes[slots[pending]]
+            hit = current == hashes[pending]
+            found[pending[hit]] = True
+            settled = hit.copy()
+
+            empty = current == self.EMPTY
+            if empty.any():
+                claimants = pending[empty]
+                _, first = np.unique(slots[claimants], return_index=True)
+                winners = claimants[first]
+                self._hashes[slots[winners]] = hashes[winners]
+                self._rows[slots[winners]] = rows[winners]
+                self._size += winners.size
+                settled |= np.isin(pending, winners)
+
+            # Losing claimants re-read their slot; everything else moves on
+            collided = ~hit & ~empty
+            slots[pending[collided]] = (slots[pending[collided]] + 1) & (self._capacity - 1)
+            pending = pending[~settled]
+
+        return found
+
+    def _grow(self, needed: int):
+        capacity = self._capacity
+        while needed > capacity * self.MAX_LOAD:
+            capacity *= 2
+        occupied = self._hashes != self.EMPTY
+        hashes, rows = self._hashes[occupied], self._rows[occupied]
+        self._capacity = capacity
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._rows = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._insert(hashes, rows)
+
+    def add(self, batch: pd.DataFrame):
+        """Insert the keys of one batch; the batch index is the row position"""
+        keys = batch[self.key_columns]
+        if self.skip_null_keys:
+            keys = keys[keys.notna().all(axis=1)]
+        if keys.empty:
+            return
+
+        if self._size + len(keys) > self._capacity * self.MAX_LOAD:
+            self._grow(self._size + len(keys))
+
+        hashes = self._hash(keys)
+        rows = keys.index.to_numpy(dtype=np.int64)
+        duplicate = self._insert(hashes, rows)
+        if duplicate.any():
+            self._dup_hashes.append(hashes[duplicate])
+            self._dup_rows.append(rows[duplicate])
+            self._dup_keys.append(keys[duplicate])
+
+    def first_rows(self, hashes: np.ndarray) -> np.ndarray:
+        """Row position where each (present) hash was first seen"""
+        mask = self._capacity - 1
+        slots = (hashes & np.uint64(mask)).astype(np.int64)
+        pending = np.arange(len(hashes))
+        while pending.size:
+            miss = self._hashes[slots[pending]] != hashes[pending]
+            slots[pending[miss]] = (slots[pending[miss]] + 1) & mask
+            pending = pending[miss]
+        return self._rows[slots]
+
+    def duplicate_groups(self) -> List[Dict]:
+        """
+        One entry per duplicated key, in order of first appearance:
+        ``{'key_values': {...}, 'rows': [positions...]}``
+        """
+        if not self.has_duplicates:
+            return []
+
+        hashes = np.concatenate(self._dup_hashes)
+        rows = np.concatenate(self._dup_rows)
+        keys = pd.concat(self._dup_keys)
+
+        unique_hashes, first_event = np.unique(hashes, return_index=True)
+        first_rows = self.first_rows(unique_hashes)
+        group_of = np.searchsorted(unique_hashes, hashes)
+
+        # Later rows of every group, grouped and in sheet order
+        order = np.lexsort((rows, group_of))
+        boundaries = np.searchsorted(group_of[order], np.arange(len(unique_hashes) + 1))
+        sorted_rows = rows[order]
+
+        first_keys = keys.iloc[first_event]
+        key_values = {column: first_keys[column].tolist() for column in self.key_columns}
+
+        groups = []
+        for group in np.argsort(first_rows, kind='stable').tolist():
+            later = sorted_rows[boundaries[group]:boundaries[group + 1]]
+            groups.append({
+                'key_values': {column: values[group] for column, values in key_values.items()},
+                'rows': [int(first_rows[group])] + later.tolist()
+            })
+        return groups
+
+
+class RowDelta:
+    """
+    Splits a sheet into unchanged and new/changed rows against the row-hash
+    index of an earlier file.
+
+    Rows are matched by a hash of their key columns (the whole row when there
+    is no key) and compared by a hash of their values. The baseline is two
+    uint64 arrays sorted by key hash, looked up with one searchsorted per
+    batch. While splitting, the current file's own index is collected so it
+    can become the next baseline; 16 bytes per row either way.
+    """
+
+    def __init__(self, key_columns: List[str], value_columns: List[str],
+                 baseline: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                 field_types: Optional[Dict[str, str]] = None):
+        self.key_columns = key_columns
+        self.value_columns = value_columns
+        self.field_types = field_types or {}
+        self.has_baseline = baseline is not None
+        self._base_keys, self._base_rows = baseline if baseline is not None else (
+            np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)
+        )
+        self._matched = np.zeros(len(self._base_keys), dtype=bool)
+        self._keys = []
+        self._rows = []
+        self.added = 0
+        self.changed = 0
+        self.unchanged = 0
+
+    def split(self, batch: pd.DataFrame) -> pd.DataFrame:
+        """Rows of ``batch`` that are new or changed since the baseline"""
+        rows = hash_rows(batch[self.value_columns], self.field_types)
+        keys = hash_rows(batch[self.key_columns], self.field_types) if self.key_columns else rows
+        self._keys.append(keys)
+        self._rows.append(rows)
+
+        if not len(self._base_keys):
+            self.added += len(batch)
+            return batch
+
+        positions = np.minimum(np.searchsorted(self._base_keys, keys), len(self._base_keys) - 1)
+        found = self._base_keys[positions] == keys
+        same = found & (self._base_rows[positions] == rows)
+        self._matched[positions[found]] = True
+
+        self.unchanged += int(same.sum())
+        self.changed += int((found & ~same).sum())
+        self.added += int((~found).sum())
+        return batch[~same]
+
+    @property
+    def removed(self) -> int:
+        """Baseline keys that no row of the current file matched"""
+        return int(len(self._matched) - self._matched.sum())
+
+    def summary(self) -> Dict:
+        return {
+            'baseline': self.has_baseline,
+            'added': self.added,
+            'changed': self.changed,
+            'removed': self.removed if self.has_baseline else 0,
+            'unchanged': self.unchanged,
+            'rows_validated': self.added + self.changed
+        }
+
+    def index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(key hashes, row hashes) of the current file, sorted by key"""
+        if not self._keys:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)
+        keys = np.concatenate(self._keys)
+        rows = np.concatenate(self._rows)
+        order = np.argsort(keys, kind='stable')
+        return keys[order], rows[order]
+
+    def to_bytes(self, fingerprint: str) -> bytes:
+        keys, rows = self.index()
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, keys=keys, rows=rows, fingerprint=np.array(fingerprint))
+        return buffer.getvalue()
+
+    @staticmethod
+    def baseline_from_bytes(data: bytes, fingerprint: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Stored index, or None when it was built under a different schema"""
+        with np.load(io.BytesIO(data), allow_pickle=False) as stored:
+            if str(stored['fingerprint']) != fingerprint:
+                return None
+            return stored['keys'], stored['rows']
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Binary file object that uploads to S3 as it is written.
+
+    Bytes are buffered up to ``part_size`` and sent as multipart parts, so at
+    most one part is held in memory. Objects smaller than one part are sent
+    with a single put_object instead. close() completes the upload; abort()
+    discards it (later writes are dropped), and leaving a ``with`` block on an
+    exception aborts too.
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str, content_type: str = 'application/octet-stream',
+                 part_size: int = MULTIPART_PART_BYTES):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._position = 0
+        self._aborted = False
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError('write to closed S3MultipartWriter')
+        if self._aborted:
+            return len(data)
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, body: bytes):
+        if self._upload_id is None:
+            self._upload_id = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )['UploadId']
+        number = len(self._parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=number, Body=body
+        )
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': number})
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if not self._aborted:
+                if self._upload_id is None:
+                    self.s3_client.put_object(
+                        Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer), ContentType=self.content_type
+                    )
+                else:
+                    if self._buffer:
+                        self._upload_part(bytes(self._buffer))
+                    self.s3_client.complete_multipart_upload(
+                        Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                        MultipartUpload={'Parts': self._parts}
+                    )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._buffer = bytearray()
+            super().close()
+
+    @property
+    def aborted(self) -> bool:
+        return self._aborted
+
+    def abort(self):
+        """Drop everything written so far; nothing becomes visible in S3"""
+        if self._upload_id is not None and not self._aborted:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        self._aborted = True
+        self._buffer = bytearray()
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            self.abort()
+        self.close()
+        return False
+
+
+# Schema field types (engine vocabulary) to the pandas dtype each column is
+# parsed into and written as; anything undeclared is text. Only types the
+# F-4 checks validate belong here: a typed column is taken as valid, so an
+# unchecked alias would silently turn bad cells into missing ones
+COLUMN_DTYPES = {
+    'string': 'text',
+    'email': 'text',
+    'int': 'Int64',
+    'decimal': 'Float64',
+    'date': 'datetime64[ms]',
+    'enum': 'category',
+}
+
+
+@lru_cache(maxsize=None)
+def text_dtype() -> pd.StringDtype:
+    """string[pyarrow] when pyarrow is installed, else pandas' Python-backed strings"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return pd.StringDtype()
+    return pd.StringDtype('pyarrow')
+
+
+def coerce_column(column: pd.Series, field_type: Optional[str], strict: bool = False,
+                  categories: Optional[List] = None) -> pd.Series:
+    """
+    ``column`` in the compact dtype of ``field_type``; a column that already
+    has it is returned as is. Text renders every cell as ``str(value)``, dates
+    must be ISO ``YYYY-MM-DD`` strings or real dates when ``strict``, and enums
+    become categoricals over ``categories`` plus any other value seen.
+
+    Cells that do not convert become missing, unless ``strict``: then the
+    whole column is returned unchanged, so validation still sees and reports
+    the offending values.
+    """
+    dtype = COLUMN_DTYPES.get(field_type, 'text')
+
+    if dtype == 'text':
+        if isinstance(column.dtype, pd.StringDtype):
+            return column
+        # Integral floats print as ints whatever dtype the batch inferred
+        if pd.api.types.is_float_dtype(column):
+            values = column.dropna()
+            if (values == values.round()).all():
+                column = column.astype('Int64')
+        return column.astype(text_dtype())
+
+    if dtype == 'category':
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return column
+        text = coerce_column(column, 'string')
+        allowed = [str(value) for value in categories or []]
+        seen = set(allowed)
+        extra = sorted(value for value in text.dropna().unique() if value not in seen)
+        return text.astype(pd.CategoricalDtype(allowed + extra))
+
+    if dtype.startswith('datetime64'):
+        if pd.api.types.is_datetime64_dtype(column):
+            return column
+        date_format = '%Y-%m-%d' if strict and field_type == 'date' else 'mixed'
+        converted = pd.to_datetime(column, errors='coerce', format=date_format)
+    else:
+        if str(column.dtype) == dtype:
+            return column
+        converted = pd.to_numeric(column, errors='coerce')
+        if dtype == 'Int64':
+            converted = converted.where(converted.isna() | (converted % 1 == 0))
+
+    if strict and (converted.isna() & column.notna()).any():
+        return column
+    return converted.astype(dtype)
+
+
+class ColumnarS3Writer:
+    """
+    Writes DataFrame batches to one S3 object as CSV or Parquet.
+
+    Every batch is coerced to the same column types (``column_types`` maps a
+    column to a schema field type, e.g. ``{'date': 'date'}``), so values do
+    not change representation between batches and Parquet gets a single,
+    typed schema. Batches already typed by ExcelBatchReader pass through
+    without conversion. Parquet needs pyarrow, imported only when used; each batch
+    becomes one row group.
+    """
+
+    CONTENT_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+    def __init__(self, s3_client, bucket: str, key: str, columns: List[str], output_format: str = 'csv',
+                 column_types: Optional[Dict[str, str]] = None, compression: str = 'snappy'):
+        if output_format not in self.CONTENT_TYPES:
+            raise ValueError(f'Unsupported output format: {output_format}')
+        self.columns = columns
+        self.output_format = output_format
+        self.column_types = column_types or {}
+        self.compression = compression
+        self.rows_written = 0
+        self._sink = S3MultipartWriter(s3_client, bucket, key, content_type=self.CONTENT_TYPES[output_format])
+        self._parquet = None
+        self._arrow_schema = None
+
+    def _coerce(self, batch: pd.DataFrame) -> pd.DataFrame:
+        return pd.DataFrame(
+            {column: coerce_column(batch[column], self.column_types.get(column)) for column in self.columns}
+        )
+
+    def write(self, batch: pd.DataFrame):
+        frame = self._coerce(batch)
+        if self.output_format == 'csv':
+            self._sink.write(frame.to_csv(index=False, header=self.rows_written == 0).encode('utf-8'))
+        else:
+            self._write_parquet(frame)
+        self.rows_written += len(frame)
+
+    def _write_parquet(self, frame: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._parquet is None:
+            self._arrow_schema = pa.Schema.from_pandas(frame, preserve_index=False)
+            self._parquet = pq.ParquetWriter(self._sink, self._arrow_schema, compression=self.compression)
+        self._parquet.write_table(pa.Table.from_pandas(frame, schema=self._arrow_schema, preserve_index=False))
+
+    def close(self):
+        """Finish the file and complete the upload"""
+        if self._sink.aborted:
+            self._sink.close()
+            return
+        if self.output_format == 'csv' and self.rows_written == 0:
+            self._sink.write(','.join(self.columns).encode('utf-8') + b'\n')
+        if self.output_format == 'parquet' and self._parquet is None:
+            self._write_parquet(self._coerce(pd.DataFrame(columns=self.columns)))
+        if self._parquet is not None:
+            self._parquet.close()
+        self._sink.close()
+
+    def abort(self):
+        """Cancel the upload; further writes are dropped"""
+        self._sink.abort()
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            self.abort()
+        self.close()
+        return False
@@ -1,48 +1,100 @@
 import json
 import boto3
 import pandas as pd
-import io
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import unquote_plus
+
+from excel_streaming import ColumnarS3Writer, ExcelBatchReader, UniquenessIndex, spool_s3_object
 
 s3_client = boto3.client('s3')
 eventbridge_client = boto3.client('events')
 
+# Formato de salida: 'csv' (por defecto) o 'parquet' (tipado y comprimido, requiere pyarrow)
+OUTPUT_FORMAT = os.environ.get('OUTPUT_FORMAT', 'csv').lower()
+PARQUET_COMPRESSION = os.environ.get('PARQUET_COMPRESSION', 'snappy')
+
+# Archivos procesados en paralelo cuando un evento trae varios registros S3
+PROCESSOR_WORKERS = int(os.environ.get('PROCESSOR_WORKERS', 2))
+
+# Tipos de columna para la salida (vocabulario de tipos del esquema de validación)
+REQUIRED_COLUMNS = ['id', 'name', 'date']  # Personalizar según necesidades
+COLUMN_TYPES = {'id': 'string', 'name': 'string', 'date': 'date'}
+
 def lambda_handler(event, context):
     """
-    Procesa archivos Excel cargados en S3, los convierte a CSV y ejecuta validaciones
+    Procesa todos los archivos Excel del evento S3 (no solo el primero).
+    
+    Con un único registro la respuesta es la de process_file. Con varios, los
+    archivos se procesan en paralelo (PROCESSOR_WORKERS) y se devuelve el
+    resultado de cada uno. Si alguno falló por error (500) se lanza una
+    excepción después de procesarlos todos: en la invocación asíncrona de S3
+    batchItemFailures se ignora, así que solo el error activa los reintentos
+    y la DLQ. El reintento repite el evento completo; los archivos que ya
+    se procesaron se vuelven a escribir con la misma clave.
     """
+    records = [
+        (record['s3']['bucket']['name'], unquote_plus(record['s3']['object']['key']))
+        for record in event['Records']
+    ]
+    
+    if len(records) == 1:
+        return process_file(*records[0])
     
-    # Obtener información del archivo desde el evento S3
-    bucket = event['Records'][0]['s3']['bucket']['name']
-    key = event['Records'][0]['s3']['object']['key']
+    with ThreadPoolExecutor(max_workers=max(1, min(PROCESSOR_WORKERS, len(records)))) as pool:
+        responses = list(pool.map(lambda record: process_file(*record), records))
+    
+    results = [
+        {'bucket': bucket, 'key': key, 'statusCode': response['statusCode'], **json.loads(response['body'])}
+        for (bucket, key), response in zip(records, responses)
+    ]
+    fallidos = [f"{r['bucket']}/{r['key']}" for r in results if r['statusCode'] == 500]
+    if fallidos:
+        raise RuntimeError(f"Error procesando {len(fallidos)} de {len(results)} archivos: {', '.join(fallidos)}")
+    return {
+        'statusCode': 200 if all(r['statusCode'] == 200 for r in results) else 207,
+        'body': json.dumps({'results': results})
+    }
+
+def process_file(bucket, key):
+    """
+    Procesa un archivo Excel cargado en S3, lo convierte a CSV o Parquet y ejecuta validaciones.
     
+    El archivo se lee por lotes y cada lote se valida y se escribe directamente
+    en S3 (multipart upload), en una sola pasada; si la validación falla, la
+    carga se cancela y no queda ningún objeto parcial en el bucket processed.
+    """
+    local_path = None
     try:
-        # Descargar archivo Excel desde S3
-        response = s3_client.get_object(Bucket=bucket, Key=key)
-        excel_content = response['Body'].read()
+        # Descargar archivo Excel desde S3 a /tmp por bloques, sin cargarlo en memoria
+        local_path = spool_s3_object(s3_client, bucket, key)
         
-        # Leer Excel con pandas
-        df = pd.read_excel(io.BytesIO(excel_content))
+        processed_key = output_key(key, OUTPUT_FORMAT)
+        processed_bucket = bucket.replace('-raw', '-processed')
         
-        # Validaciones de calidad
-        validation_result = validate_data(df, key)
+        # Leer Excel por lotes de filas (openpyxl en modo read-only), validar
+        # y convertir cada lote sin materializar el archivo completo. Las
+        # columnas declaradas se tipan al leer y el escritor reutiliza ese marco
+        fields = {column: {'type': column_type} for column, column_type in COLUMN_TYPES.items()}
+        with ExcelBatchReader(local_path, fields=fields) as reader:
+            quality = DataQualityCheck(reader.header)
+            with ColumnarS3Writer(
+                s3_client, processed_bucket, processed_key, reader.header,
+                output_format=OUTPUT_FORMAT, column_types=COLUMN_TYPES, compression=PARQUET_COMPRESSION
+            ) as writer:
+                for batch in reader:
+                    quality.consume(batch)
+                    if quality.errors:
+                        # El archivo ya es inválido: se sigue validando pero no se escribe
+                        writer.abort()
+                    else:
+                        writer.write(batch)
+                validation_result = quality.result()
+                if not validation_result['valid']:
+                    writer.abort()
         
         if validation_result['valid']:
-            # Convertir a CSV
-            csv_buffer = io.StringIO()
-            df.to_csv(csv_buffer, index=False)
-            
-            # Subir CSV a bucket processed
-            processed_key = key.replace('.xlsx', '.csv').replace('.xls', '.csv')
-            processed_bucket = bucket.replace('-raw', '-processed')
-            
-            s3_client.put_object(
-                Bucket=processed_bucket,
-                Key=processed_key,
-                Body=csv_buffer.getvalue(),
-                ContentType='text/csv'
-            )
-            
             # Disparar evento para Glue Crawler
             trigger_glue_crawler(processed_bucket, processed_key)
             
@@ -71,36 +123,64 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
         }
+    finally:
+        if local_path and os.path.exists(local_path):
+            os.remove(local_path)
 
-def validate_data(df, filename):
-    """Validaciones de calidad de datos"""
-    errors = []
-    
-    # Validar que no esté vacío
-    if df.empty:
-        errors.append("El archivo está vacío")
-    
-    # Validar columnas requeridas (ejemplo)
-    required_columns = ['id', 'name', 'date']  # Personalizar según necesidades
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        errors.append(f"Columnas faltantes: {missing_columns}")
+def output_key(key, output_format):
+    """Clave del archivo convertido: misma ruta con la extensión del formato de salida"""
+    base, extension = os.path.splitext(key)
+    if extension.lower() not in ('.xlsx', '.xls'):
+        base = key
+    return f"{base}.{output_format}"
+
+class DataQualityCheck:
+    """Validaciones de calidad de datos, acumuladas lote a lote"""
     
-    # Validar tipos de datos
-    if 'date' in df.columns:
-        try:
-            pd.to_datetime(df['date'])
-        except:
-            errors.append("Formato de fecha inválido en columna 'date'")
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.rows = 0
+        self.invalid_dates = False
+        self.duplicates = UniquenessIndex(self.columns, skip_null_keys=False, field_types=COLUMN_TYPES)
+        
+        # Validar columnas requeridas (ejemplo)
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in self.columns]
+        self.errors = [f"Columnas faltantes: {missing_columns}"] if missing_columns else []
     
-    # Validar duplicados
-    if df.duplicated().any():
-        errors.append("Se encontraron filas duplicadas")
+    def consume(self, batch):
+        self.rows += len(batch)
+        
+        # Validar tipos de datos
+        if 'date' in batch.columns and not self.invalid_dates:
+            try:
+                pd.to_datetime(batch['date'])
+            except (ValueError, TypeError):
+                self.invalid_dates = True
+                self.errors.append("Formato de fecha inválido en columna 'date'")
+        
+        # Validar duplicados (índice por hash entre lotes)
+        self.duplicates.add(batch)
     
-    return {
-        'valid': len(errors) == 0,
-        'errors': errors
-    }
+    def result(self):
+        errors = list(self.errors)
+        
+        # Validar que no esté vacío
+        if self.rows == 0:
+            errors.insert(0, "El archivo está vacío")
+        
+        if self.duplicates.has_duplicates:
+            errors.append("Se encontraron filas duplicadas")
+        
+        return {
+            'valid': len(errors) == 0,
+            'errors': errors
+        }
+
+def validate_data(df, filename):
+    """Validaciones de calidad de datos sobre un DataFrame completo"""
+    quality = DataQualityCheck(df.columns)
+    quality.consume(df.reset_index(drop=True))
+    return quality.result()
 
 def move_to_rejected(bucket, key, errors):
     """Mueve archivo a bucket rejected con metadata de errores"""
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Catastrophic-backtracking check for schema regexes, done on the pattern text.
+
+A small tokenizer splits the pattern into single-character atoms, groups,
+alternations and quantifiers; the private re parser is not used, so the
+check does not depend on the Python version. A pattern is rejected when it
+has one of the shapes that make a backtracking engine blow up:
+
+* a quantifier with a variable count nested inside another repeat, as in
+  (a+)+ or (\\w+\\s?)+, unless each repetition starts or ends with a
+  delimiter the rest of the body cannot match, as in (\\.[a-z]+)+. A fixed
+  count over bounded quantifiers, as in (\\d{1,3}\\.){3}, is only a sequence
+  written n times and is accepted; (.*a){20} is not;
+* a repeated alternation whose branches can start with the same character
+  or match nothing, as in (a|ab)*, and any repeat of a body that can match
+  the empty string.
+
+Whether two atoms can match the same character is decided by compiling each
+atom on its own and trying it on a fixed sample: printable ASCII, a few
+non-ASCII letters, digits and spaces, and every character written in the
+pattern. The work is bounded by the pattern length, whatever Unicode
+categories it uses. This is a heuristic that leans towards rejection:
+atoms are taken as overlapping with anything when the pattern is
+case-insensitive or when they match nothing in the sample, and verbose
+patterns are rejected outright.
+"""
+
+import re
+import string
+from typing import FrozenSet, List, Optional
+
+# Characters every atom is tried against, besides those written in the pattern
+SAMPLE = string.printable + '\u00a0\u2003\u00aa\u00b2\u00c6\u00df\u00e9\u0394\u0436\u0663\u2160\u4e2d'
+
+_SIMPLE_REPEATS = {'*': (0, None), '+': (1, None), '?': (0, 1)}
+_BRACES = re.compile(r'\{(\d*)(?:(,)(\d*))?\}')
+_INLINE_FLAGS = re.compile(r'([aiLmsux]*)(?:-[imsx]*)?([:)])')
+_ANCHORS = 'bBAZ'
+# Hex digits following \x, \u and \U
+_HEX_ESCAPES = {'x': 2, 'u': 4, 'U': 8}
+_OCTAL = re.compile(r'[0-7]{3}')
+_OCTAL_TAIL = re.compile(r'[0-7]{0,2}')
+_DIGIT = re.compile(r'\d?')
+
+
+class _Parser:
+    """
+    Pattern text to nested tuples: ('atom', source) for one character,
+    ('group', branches), ('opaque', branches) for lookarounds and
+    conditionals, ('repeat', node, low, high) with high None when unbounded,
+    ('anchor',) and ('unknown',) for back-references. The pattern must
+    already compile.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.pos = 0
+        self.flags = set()
+
+    def parse(self) -> tuple:
+        return 'group', self._branches()
+
+    def _branches(self) -> List[list]:
+        branches = [[]]
+        while self.pos < len(self.pattern) and self.pattern[self.pos] != ')':
+            if self.pattern[self.pos] == '|':
+                self.pos += 1
+                branches.append([])
+                continue
+            node = self._item()
+            if node is not None:
+                branches[-1].append(self._quantified(node))
+        return branches
+
+    def _item(self) -> Optional[tuple]:
+        pattern, start = self.pattern, self.pos
+        char = pattern[start]
+        if char == '(':
+            return self._group()
+        if char == '\\':
+            return self._escape()
+        if char == '[':
+            end = start + 1
+            if pattern.startswith('^', end):
+                end += 1
+            if pattern.startswith(']', end):
+                end += 1
+            while pattern[end] != ']':
+                end += 2 if pattern[end] == '\\' else 1
+            self.pos = end + 1
+            return 'atom', pattern[start:self.pos]
+        self.pos += 1
+        return ('anchor',) if char in '^$' else ('atom', char)
+
+    def _escape(self) -> tuple:
+        pattern, start = self.pattern, self.pos
+        char = pattern[start + 1]
+        self.pos = start + 2
+        if char in _ANCHORS:
+            return ('anchor',)
+        if char in _HEX_ESCAPES:
+            self.pos += _HEX_ESCAPES[char]
+        elif char == 'N':
+            self.pos = pattern.index('}', self.pos) + 1
+        elif char == '0':
+            self.pos = _OCTAL_TAIL.match(pattern, self.pos).end()
+        elif char.isdigit():
+            octal = _OCTAL.match(pattern, start + 1)
+            if octal is None:
+                self.pos = _DIGIT.match(pattern, self.pos).end()
+                return ('unknown',)
+            self.pos = octal.end()
+        return 'atom', pattern[start:self.pos]
+
+    def _group(self) -> Optional[tuple]:
+        pattern = self.pattern
+        self.pos += 1
+        kind = 'group'
+        if pattern.startswith('?', self.pos):
+            self.pos += 1
+            char = pattern[self.pos]
+            if char == '#' or pattern.startswith('P=', self.pos):
+                self.pos = pattern.index(')', self.pos) + 1
+                return None if char == '#' else ('unknown',)
+            if char == 'P':
+                self.pos = pattern.index('>', self.pos) + 1
+            elif char in '=!>':
+                self.pos += 1
+                kind = 'group' if char == '>' else 'opaque'
+            elif char == '<':
+                self.pos += 2
+                kind = 'opaque'
+            elif char == '(':
+                self.pos = pattern.index(')', self.pos) + 1
+                kind = 'opaque'
+            else:
+                flags = _INLINE_FLAGS.match(pattern, self.pos)
+                self.flags.update(flags.group(1))
+                self.pos = flags.end()
+                if flags.group(2) == ')':
+                    return None
+        branches = self._branches()
+        self.pos += 1
+        return kind, branches
+
+    def _quantified(self, node: tuple) -> tuple:
+        pattern = self.pattern
+        char = pattern[self.pos:self.pos + 1]
+        if char and char in _SIMPLE_REPEATS:
+            low, high = _SIMPLE_REPEATS[char]
+            self.pos += 1
+        else:
+            braces = _BRACES.match(pattern, self.pos)
+            # '{' that does not open a valid count is a literal, as in re
+            if braces is None or not (braces.group(1) or braces.group(2)):
+                return node
+            low = int(braces.group(1) or 0)
+            if braces.group(2) is None:
+                high = low
+            else:
+                high = int(braces.group(3)) if braces.group(3) else None
+            self.pos = braces.end()
+        # Lazy and possessive modifiers do not change what may be tried
+        if pattern[self.pos:self.pos + 1] in ('?', '+'):
+            self.pos += 1
+        return 'repeat', node, low, high
+
+
+class _Characters:
+    """Sample characters each atom can match; None stands for unknown"""
+
+    def __init__(self, pattern: str, flags: set):
+        self.sample = ''.join(sorted(set(SAMPLE) | set(pattern)))
+        self.flags = (re.ASCII if 'a' in flags else 0) | (re.DOTALL if 's' in flags else 0)
+        # With case folding a class matches more than the sample shows
+        self.known = 'i' not in flags
+        self._atoms = {}
+
+    def atom(self, source: str) -> Optional[FrozenSet[str]]:
+        if not self.known:
+            return None
+        chars = self._atoms.get(source)
+        if chars is None:
+            matcher = re.compile(source, self.flags)
+            chars = self._atoms[source] = frozenset(c for c in self.sample if matcher.fullmatch(c))
+        # Nothing matched: a character outside the sample, written as an escape
+        return chars or None
+
+    def first(self, items) -> Optional[FrozenSet[str]]:
+        """Characters the sequence can start with; None when it may match nothing"""
+        for node in items:
+            kind = node[0]
+            if kind == 'anchor':
+                continue
+            if kind == 'atom':
+                return self.atom(node[1])
+            if kind == 'repeat':
+                return self.first([node[1]]) if node[2] else None
+            if kind == 'group':
+                firsts = [self.first(branch) for branch in node[1]]
+                return None if None in firsts else frozenset().union(*firsts)
+            return None
+        return None
+
+    def anywhere(self, items) -> Optional[FrozenSet[str]]:
+        """Characters the sequence can match at any position"""
+        found = set()
+        for node in items:
+            kind = node[0]
+            if kind == 'anchor':
+                continue
+            if kind == 'atom':
+                chars = self.atom(node[1])
+            elif kind == 'repeat':
+                chars = self.anywhere([node[1]])
+            elif kind == 'group':
+                chars = self.anywhere([item for branch in node[1] for item in branch])
+            else:
+                return None
+            if chars is None:
+                return None
+            found |= chars
+        return frozenset(found)
+
+
+def backtracking_risk(pattern: str) -> Optional[str]:
+    """Why the pattern is unsafe, or None; re.error when it does not compile"""
+    re.compile(pattern)
+    parser = _Parser(pattern)
+    tree = parser.parse()
+    if 'x' in parser.flags:
+        return 'verbose patterns are not vetted'
+    return _scan([tree], False, _Characters(pattern, parser.flags))
+
+
+def _scan(items, repeated: bool, chars: _Characters) -> Optional[str]:
+    for node in items:
+        kind = node[0]
+        if kind == 'repeat':
+            _, body, low, high = node
+            variable = low != high
+            if repeated and variable:
+                return 'variable quantifier nested inside a repeated group'
+            if variable:
+                repeats = high is None or high > 1
+                if repeats:
+                    if _nullable(body):
+                        return 'repeat of a pattern that can match nothing'
+                    problem = _ambiguous_branch([body], chars)
+                    if problem:
+                        return problem
+            else:
+                # A fixed count is the body written n times; only unbounded quantifiers inside it can blow up
+                repeats = high > 1 and _unbounded([body])
+            problem = _scan([body], repeated or (repeats and not _delimited([body], chars)), chars)
+        elif kind in ('group', 'opaque'):
+            problem = next(filter(None, (_scan(branch, repeated, chars) for branch in node[1])), None)
+        else:
+            problem = None
+        if problem:
+            return problem
+    return None
+
+
+def _nullable(node: tuple) -> bool:
+    kind = node[0]
+    if kind == 'atom':
+        return False
+    if kind == 'repeat':
+        return node[2] == 0 or _nullable(node[1])
+    if kind == 'group':
+        return any(all(_nullable(item) for item in branch) for branch in node[1])
+    return True
+
+
+def _unbounded(items) -> bool:
+    for node in items:
+        if node[0] == 'repeat' and (node[3] is None or _unbounded([node[1]])):
+            return True
+        if node[0] in ('group', 'opaque') and any(_unbounded(branch) for branch in node[1]):
+            return True
+    return False
+
+
+def _delimited(items, chars: _Characters) -> bool:
+    """Whether the body starts or ends with one character the rest of it can never match"""
+    while len(items) == 1 and items[0][0] == 'group' and len(items[0][1]) == 1:
+        items = items[0][1][0]
+    if len(items) < 2:
+        return False
+    for edge, rest in ((items[0], items[1:]), (items[-1], items[:-1])):
+        delimiter = chars.atom(edge[1]) if edge[0] == 'atom' else None
+        others = chars.anywhere(rest)
+        if delimiter is not None and others is not None and not delimiter & others:
+            return True
+    return False
+
+
+def _ambiguous_branch(items, chars: _Characters) -> Optional[str]:
+    for node in items:
+        if node[0] != 'group':
+            continue
+        if len(node[1]) == 1:
+            problem = _ambiguous_branch(node[1][0], chars)
+            if problem:
+                return problem
+            continue
+        seen = frozenset()
+        for branch in node[1]:
+            # Empty branches, and branches whose first characters are unknown, overlap with anything
+            firsts = chars.first(branch)
+            if firsts is None or firsts & seen:
+                return 'repeated alternation with overlapping branches'
+            seen |= firsts
+    return None
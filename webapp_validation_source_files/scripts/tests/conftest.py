@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from benchmark_startup import STUB_ENVIRONMENT, _load_engine  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def engine_module():
+    """The engine module, loaded by path (its file name is not importable)"""
+    os.environ.update({key: value for key, value in STUB_ENVIRONMENT.items() if key not in os.environ})
+    return _load_engine()
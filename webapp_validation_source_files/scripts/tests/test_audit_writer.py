@@ -0,0 +1,91 @@
+import threading
+
+from botocore.exceptions import ClientError
+
+TABLE = 'hc-validation-audit-log'
+
+
+class FakeBatchWrite:
+    """batch_write_item stand-in; ``unprocessed`` decides, per call, how many items come back"""
+
+    def __init__(self, unprocessed=lambda call, requests: 0, error=None):
+        self.calls = []
+        self.unprocessed = unprocessed
+        self.error = error
+        self.released = threading.Event()
+        self.released.set()
+
+    def __call__(self, requests):
+        self.released.wait(5)
+        self.calls.append(list(requests))
+        if self.error is not None:
+            raise self.error
+        left = self.unprocessed(len(self.calls), requests)
+        return {'UnprocessedItems': {TABLE: requests[len(requests) - left:]} if left else {}}
+
+
+def _items(count):
+    return [{'validation_id': str(index)} for index in range(count)]
+
+
+def test_records_are_written_in_batches_of_at_most_25(engine_module):
+    write = FakeBatchWrite()
+    write.released.clear()
+    writer = engine_module.AuditWriter(write, TABLE)
+    for item in _items(60):
+        writer.add(item)
+    # The first call was held until everything was queued: the rest is packed 25 at a time
+    write.released.set()
+    assert writer.flush()
+
+    sizes = [len(call) for call in write.calls]
+    rest = 60 - sizes[0]
+    assert sizes[1:] == [25] * (rest // 25) + ([rest % 25] if rest % 25 else [])
+    written = [request['PutRequest']['Item'] for call in write.calls for request in call]
+    assert written == _items(60)
+    assert (writer.written, writer.failed) == (60, 0)
+
+
+def test_unprocessed_items_are_retried_with_bounded_backoff(engine_module):
+    delays = []
+    write = FakeBatchWrite(unprocessed=lambda call, requests: min(3, len(requests)) if call == 1 else 0)
+    write.released.clear()
+    writer = engine_module.AuditWriter(write, TABLE, base_delay=0.05, max_delay=2.0, sleep=delays.append)
+    for item in _items(10):
+        writer.add(item)
+    write.released.set()
+    assert writer.flush()
+
+    assert (writer.written, writer.failed) == (10, 0)
+    # Only what DynamoDB left unprocessed is sent again, after one jittered delay
+    assert write.calls[1] == write.calls[0][-3:]
+    assert len(delays) == 1 and 0 <= delays[0] <= 0.05 * 2
+
+
+def test_failing_writes_are_given_up_after_max_attempts(engine_module):
+    throttled = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'BatchWriteItem')
+    delays = []
+    write = FakeBatchWrite(error=throttled)
+    writer = engine_module.AuditWriter(write, TABLE, max_attempts=4, base_delay=0.05, max_delay=0.2,
+                                       sleep=delays.append)
+    for item in _items(5):
+        writer.add(item)
+    assert writer.flush()
+
+    assert (writer.written, writer.failed) == (0, 5)
+    # Four calls and three delays per batch, each delay capped by max_delay
+    assert len(write.calls) * 3 == len(delays) * 4
+    assert all(0 <= delay <= 0.2 for delay in delays)
+
+
+def test_validations_are_audited_once_flushed(engine_module):
+    from benchmark_validation import local_engine, synthetic_schema
+
+    engine_module.SCHEMA_CACHE.clear()
+    engine, _ = local_engine(engine_module, synthetic_schema(6))
+    file_info = {'filename': 'bad name.xlsx', 'hc_type': 'Contractors', 'size_bytes': 10, 's3_key': 'missing.xlsx'}
+    results = [engine.validate_file(dict(file_info), 'P1', '') for _ in range(3)]
+    assert engine.audit_writer.flush()
+
+    audited = engine.dynamodb.written
+    assert sorted(item['validation_id'] for item in audited) == sorted(r['validation_id'] for r in results)
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from benchmark_validation import generate_workbook, local_engine
+
+GOOD_KEY = 'P1/HC_Contratistas_P1_202401.xlsx'
+THROTTLED_KEY = 'P2/HC_Contratistas_P2_202401.xlsx'
+MISSING_KEY = 'P3/HC_Contratistas_P3_202401.xlsx'
+
+
+@pytest.fixture(scope='module')
+def clean_workbook(tmp_path_factory):
+    path = tmp_path_factory.mktemp('batch') / 'clean.xlsx'
+    schema = generate_workbook(str(path), rows=20, columns=6)['schema']
+    return path.read_bytes(), schema
+
+
+def _s3_record(bucket, key):
+    return {'s3': {'bucket': {'name': bucket}, 'object': {'key': key, 'size': 1000}}}
+
+
+def _sqs_record(message_id, body):
+    return {'eventSource': 'aws:sqs', 'messageId': message_id, 'body': body}
+
+
+def _sqs_event(engine_module, *keys_by_message, raw_bodies=()):
+    records = [
+        _sqs_record(f'm{index}', json.dumps({'Records': [_s3_record(engine_module.EXCHANGE_BUCKET, key) for key in keys]}))
+        for index, keys in enumerate(keys_by_message)
+    ]
+    records += [_sqs_record(f'raw{index}', body) for index, body in enumerate(raw_bodies)]
+    return {'Records': records}
+
+
+def _engine(engine_module, clean_workbook, throttled_error=None):
+    engine_module.SCHEMA_CACHE.clear()
+    workbook, schema = clean_workbook
+    engine, s3 = local_engine(engine_module, schema)
+    s3.objects[(engine_module.EXCHANGE_BUCKET, GOOD_KEY)] = workbook
+    s3.objects[(engine_module.EXCHANGE_BUCKET, THROTTLED_KEY)] = workbook
+    if throttled_error is not None:
+        get_object = s3.get_object
+
+        def flaky_get_object(Bucket, Key, **kwargs):
+            if Key == THROTTLED_KEY:
+                raise throttled_error
+            return get_object(Bucket, Key, **kwargs)
+        s3.get_object = flaky_get_object
+    return engine
+
+
+def test_permanent_errors_are_not_redelivered(engine_module, clean_workbook):
+    engine = _engine(engine_module, clean_workbook)
+    event = _sqs_event(
+        engine_module,
+        [GOOD_KEY],
+        [GOOD_KEY, 'P1/unknown_prefix.xlsx'],
+        [MISSING_KEY],
+        raw_bodies=['{not json'],
+    )
+    response = engine_module.batch_handler(engine, event)
+    body = json.loads(response['body'])
+    assert body['summary'] == {'total': 5, 'PASSED': 2, 'FAILED': 0, 'ERROR': 3}
+    assert response['batchItemFailures'] == []
+
+
+@pytest.mark.parametrize('error', [
+    ClientError({'Error': {'Code': 'SlowDown', 'Message': 'slow down'}}, 'GetObject'),
+    ClientError({'Error': {'Code': 'Unknown'}, 'ResponseMetadata': {'HTTPStatusCode': 503}}, 'GetObject'),
+    EndpointConnectionError(endpoint_url='https://s3.local'),
+])
+def test_transient_errors_are_redelivered(engine_module, clean_workbook, error):
+    engine = _engine(engine_module, clean_workbook, throttled_error=error)
+    event = _sqs_event(engine_module, [GOOD_KEY], [THROTTLED_KEY], raw_bodies=['{not json'])
+    response = engine_module.batch_handler(engine, event)
+    assert json.loads(response['body'])['summary']['ERROR'] == 2
+    assert response['batchItemFailures'] == [{'itemIdentifier': 'm1'}]
+
+
+def test_retryable_classification(engine_module):
+    denied = ClientError({'Error': {'Code': 'AccessDenied'}, 'ResponseMetadata': {'HTTPStatusCode': 403}}, 'GetObject')
+    assert not engine_module.is_retryable(denied)
+    assert not engine_module.is_retryable(ValueError('corrupt workbook'))
+    assert engine_module.is_retryable(TimeoutError())
@@ -0,0 +1,89 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from excel_streaming import RowDelta, UniquenessIndex, coerce_column, hash_rows
+
+
+def _typed_and_raw(values, bad, field_type):
+    """The same cells read as a typed batch and as a raw batch whose strict coercion failed"""
+    typed = coerce_column(pd.Series(values, dtype=object), field_type, strict=True)
+    raw = coerce_column(pd.Series(values + [bad], dtype=object), field_type, strict=True)
+    assert str(typed.dtype) != str(raw.dtype)
+    return typed, raw.iloc[:len(values)]
+
+
+def test_hash_matches_between_typed_and_raw_dates():
+    typed, raw = _typed_and_raw(['2024-01-05', datetime.datetime(2024, 2, 1)], 'not a date', 'date')
+    fields = {'start': 'date'}
+    assert np.array_equal(hash_rows(typed.to_frame('start'), fields), hash_rows(raw.to_frame('start'), fields))
+
+
+def test_hash_matches_between_typed_and_raw_decimals():
+    typed, raw = _typed_and_raw([5, 2.5], 'n/a', 'decimal')
+    fields = {'amount': 'decimal'}
+    assert np.array_equal(hash_rows(typed.to_frame('amount'), fields), hash_rows(raw.to_frame('amount'), fields))
+
+
+def test_duplicates_found_across_typed_and_raw_batches():
+    fields = {'id': 'string', 'start': 'date'}
+    typed = pd.DataFrame({'id': ['A', 'B'], 'start': ['2024-01-05', '2024-01-06']}, index=[0, 1])
+    raw = pd.DataFrame({'id': ['A', 'C'], 'start': ['2024-01-05', '05/01/2024']}, index=[2, 3])
+    typed['start'] = coerce_column(typed['start'], 'date', strict=True)
+    raw['start'] = coerce_column(raw['start'], 'date', strict=True)
+
+    index = UniquenessIndex(['id', 'start'], field_types=fields)
+    index.add(typed)
+    index.add(raw)
+    assert index.duplicate_count == 1
+
+    delta = RowDelta(['id'], ['id', 'start'], field_types=fields)
+    delta.split(typed)
+    baseline = delta.index()
+    again = RowDelta(['id'], ['id', 'start'], baseline, field_types=fields)
+    again.split(pd.concat([typed.iloc[:1].astype(object), raw.iloc[1:]]))
+    assert (again.unchanged, again.added) == (1, 1)
+
+
+@pytest.mark.parametrize('batch_size', [7, 250, 3000])
+def test_duplicates_match_pandas_duplicated(batch_size):
+    rng = np.random.default_rng(4)
+    rows = 3000
+    frame = pd.DataFrame({
+        'company': rng.choice(['Acme', 'Beta', 'Gamma'], rows).astype(object),
+        'employee': rng.integers(0, 900, rows).astype(str).astype(object),
+    })
+    frame.loc[rng.choice(rows, 50, replace=False), 'employee'] = None
+
+    # Small initial capacity so the table has to grow several times
+    index = UniquenessIndex(['company', 'employee'], capacity=16)
+    for start in range(0, rows, batch_size):
+        index.add(frame.iloc[start:start + batch_size])
+
+    # The original F-5: every row of a duplicated key, grouped, null keys ignored
+    keys = frame.dropna(subset=['company', 'employee'])
+    duplicated = keys[keys.duplicated(subset=['company', 'employee'], keep=False)]
+    expected = {tuple(group.index) for _, group in duplicated.groupby(['company', 'employee'])}
+
+    groups = index.duplicate_groups()
+    assert {tuple(group['rows']) for group in groups} == expected
+    assert index.duplicate_count == len(duplicated) - len(expected)
+    for group in groups:
+        first = frame.loc[group['rows'][0]]
+        assert group['key_values'] == {'company': first['company'], 'employee': first['employee']}
+    assert [group['rows'][0] for group in groups] == sorted(group['rows'][0] for group in groups)
+
+
+def test_missing_cells_hash_apart_from_the_text_none():
+    frame = pd.DataFrame({'id': ['A', 'A', 'A'], 'note': [None, 'None', np.nan]}, dtype=object)
+    hashes = hash_rows(frame, {'id': 'string', 'note': 'string'})
+    assert hashes[0] != hashes[1]
+    assert hashes[0] == hashes[2]
+
+
+def test_untyped_field_types_keep_their_cells():
+    # Types F-4 does not validate stay text; bad cells are not turned into missing ones
+    column = pd.Series(['1.5', 'abc'], dtype=object)
+    assert coerce_column(column, 'number').tolist() == ['1.5', 'abc']
@@ -0,0 +1,60 @@
+import subprocess
+import sys
+
+import pytest
+
+ACCEPTED = [
+    r'^(\d{1,3}\.){3}\d{1,3}$',             # fixed count around a bounded quantifier
+    r'^[\w.+-]+@[\w-]+(\.[\w-]+)+$',        # each repeat starts with a '.' the rest cannot match
+    r'^([A-Z][a-z]+ )*[A-Z][a-z]+$',        # each repeat starts with a capital, ends with a space
+    r'^(?:[A-Z]{2}|[0-9]{2})+$',            # branches start with disjoint classes
+    r'^(\d{1,3}\.)+\d+$',                   # delimiter at the end of the repeated body
+    r'^(\d{1,3}){2}$',                      # fixed count over bounded quantifiers
+    r'^(\w+\.){3}\w+$',                     # fixed count over an unbounded but delimited body
+    r'^HC_Contratistas_[A-Za-z0-9]+_\d{6}\.xlsx$',
+    r'^(\s\w+)+$',                          # no character is both space and word
+    r'^(?:\d[a-z]+)+$',                     # \d and [a-z] are disjoint
+]
+
+REJECTED = [
+    r'(a+)+',
+    r'(\w+\s?)+$',
+    r'(a|ab)*',
+    r'(?:[a-z]+|\d+)+',
+    r'(?:\d|x|)+',                          # an empty branch overlaps with anything
+    r'(?:\w{2}|\d{2})+',                    # \w and \d share the digits
+    r'(.*,)+',                              # '.' also matches the ','
+    r'([a-z][a-z]+)+',
+    r'(.*a){20}',                           # fixed count over an unbounded, overlapping body
+    r'(?i)([A-Z][a-z]+ )+',                 # case-insensitive: [A-Z] and [a-z] overlap
+    r'(\w[\u0660-\u0669]+)+',               # \w also matches Arabic-Indic digits
+    r'(\u4e01[^a]+)+',                      # delimiter outside the probe sample: unknown
+    r'(?x)(a+)+',                           # verbose patterns are not vetted
+]
+
+
+@pytest.mark.parametrize('pattern', ACCEPTED)
+def test_accepts_unambiguous_repeats(engine_module, pattern):
+    assert engine_module.PatternRegistry.backtracking_risk(pattern) is None
+    assert engine_module.PatternRegistry().compile(pattern).pattern == pattern
+
+
+@pytest.mark.parametrize('pattern', REJECTED)
+def test_rejects_backtracking_shapes(engine_module, pattern):
+    assert engine_module.PatternRegistry.backtracking_risk(pattern)
+    with pytest.raises(engine_module.UnsafePatternError):
+        engine_module.PatternRegistry().compile(pattern)
+
+
+def test_accepted_patterns_finish_on_adversarial_input():
+    # Long runs a nested repeat could split in many ways, each ending in a
+    # character that makes the match fail; a pattern that slipped through
+    # vetting would run for minutes instead of milliseconds
+    script = (
+        'import re, sys\n'
+        'inputs = [c * 2000 + "!" for c in "a1 .A_"] + ["a." * 1000 + "!", "Ab " * 700 + "!"]\n'
+        'for pattern in sys.argv[1:]:\n'
+        '    for text in inputs:\n'
+        '        re.compile(pattern).search(text)\n'
+    )
+    subprocess.run([sys.executable, '-c', script, *ACCEPTED], check=True, timeout=20)
@@ -0,0 +1,98 @@
+import json
+import threading
+
+from benchmark_validation import generate_workbook, local_engine
+
+
+class Recorder:
+    """post_to_connection stand-in that keeps every message it is given"""
+
+    def __init__(self):
+        self.posts = []
+        self.threads = set()
+
+    def __call__(self, message, progress):
+        self.posts.append((message, progress))
+        self.threads.add(threading.current_thread().name)
+
+    def post_to_connection(self, ConnectionId, Data):
+        payload = json.loads(Data)
+        self(payload['message'], payload['progress'])
+        return {}
+
+
+def test_updates_within_the_interval_are_coalesced(engine_module):
+    recorder = Recorder()
+    channel = engine_module.ProgressChannel(recorder, min_interval=60)
+    for value in (10, 20, 30, 40):
+        channel.update(f'step {value}', value)
+    channel.close()
+
+    # The first update goes out at once; the rest collapse into the newest, sent on close
+    assert recorder.posts == [('step 10', 10), ('step 40', 40)]
+    assert channel.sent == 2
+    assert recorder.threads == {'progress-channel'}
+
+
+def test_out_of_order_updates_are_dropped(engine_module):
+    recorder = Recorder()
+    channel = engine_module.ProgressChannel(recorder, min_interval=0)
+    for value in (10, 50, 40, 60, 55, 100):
+        channel.update(f'step {value}', value)
+    channel.close()
+
+    progress = [value for _, value in recorder.posts]
+    assert progress == sorted(progress)
+    assert progress[-1] == 100
+    assert not {40, 55} & set(progress)
+
+
+def test_close_flushes_and_later_updates_are_ignored(engine_module):
+    recorder = Recorder()
+    channel = engine_module.ProgressChannel(recorder, min_interval=60)
+    channel.update('started', 0)
+    channel.update('done', 100)
+    channel.close()
+    channel.update('late', 100)
+    channel.close()
+
+    assert recorder.posts[-1] == ('done', 100)
+    assert ('late', 100) not in recorder.posts
+
+
+def test_inert_channel_starts_no_thread(engine_module):
+    channel = engine_module.ProgressChannel(None)
+    channel.update('ignored', 10)
+    channel.close()
+    assert channel._thread is None
+    assert channel.sent == 0
+
+
+def test_validation_posts_progress_in_order_to_the_connection(engine_module, tmp_path, monkeypatch):
+    path = tmp_path / 'clean.xlsx'
+    schema = generate_workbook(str(path), rows=20, columns=6)['schema']
+    workbook = path.read_bytes()
+    engine_module.SCHEMA_CACHE.clear()
+    engine, s3 = local_engine(engine_module, schema)
+    s3.objects[(engine_module.EXCHANGE_BUCKET, 'P1/clean.xlsx')] = workbook
+    file_info = {'filename': 'HC_Contratistas_P1_202401.xlsx', 'hc_type': 'Contractors',
+                 'size_bytes': len(workbook), 's3_key': 'P1/clean.xlsx'}
+    recorder = Recorder()
+    monkeypatch.setattr(engine.apigateway_client, 'post_to_connection', recorder.post_to_connection)
+
+    assert engine.validate_file(file_info, 'P1', 'connection-1')['status'] == 'PASSED'
+    progress = [value for _, value in recorder.posts]
+    assert progress == sorted(progress)
+    assert recorder.posts[-1] == ('Validation successful! Ready for upload.', 100)
+
+    started = []
+    thread_class = threading.Thread
+
+    def tracking_thread(*args, **kwargs):
+        started.append(kwargs.get('name'))
+        return thread_class(*args, **kwargs)
+    monkeypatch.setattr(engine_module.threading, 'Thread', tracking_thread)
+    recorder.posts.clear()
+    assert engine.validate_file(file_info, 'P1', '')['status'] == 'PASSED'
+    assert 'progress-channel' not in started
+    assert recorder.posts == []
@@ -0,0 +1,56 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from benchmark_validation import local_engine
+
+SCHEMA = {
+    'hc_type': 'Contractors',
+    'version': 'latest',
+    'required_sheet': 'Contractors_Data',
+    'fields': [{'name': 'employee_id', 'type': 'string', 'mandatory': True}],
+}
+
+MALFORMED_RULES = [
+    {'rule': 'r1', 'type': 'unknown_kind', 'field': 'employee_id'},
+    {'rule': 'r2', 'type': 'compare', 'left': 'a', 'op': '=>', 'right': 'b'},
+    {'type': 'required_if', 'field': 'a', 'when': {'field': 'b'}},
+    {'rule': 'r4', 'type': 'range', 'field': 'a', 'min': 'low'},
+]
+
+
+@pytest.fixture(autouse=True)
+def empty_schema_cache(engine_module):
+    engine_module.SCHEMA_CACHE.clear()
+    yield
+    engine_module.SCHEMA_CACHE.clear()
+
+
+@pytest.mark.parametrize('rule', MALFORMED_RULES)
+def test_malformed_rule_is_not_replaced_by_defaults(engine_module, rule):
+    engine, _ = local_engine(engine_module, {**SCHEMA, 'business_rules': [rule]})
+    with pytest.raises(engine_module.RuleDefinitionError):
+        engine._get_validator_plan('Contractors')
+    assert engine_module.SCHEMA_CACHE.get(('schema', 'Contractors', 'latest')) is None
+
+
+def test_missing_record_falls_back_to_defaults(engine_module):
+    engine, _ = local_engine(engine_module, {**SCHEMA, 'hc_type': 'Stores'})
+    plan = engine._get_validator_plan('Contractors')
+    assert plan.schema == engine._get_default_schema('Contractors')
+    assert engine_module.SCHEMA_CACHE.get(('schema', 'Contractors', 'latest')) is None
+
+
+def test_lookup_failure_falls_back_to_defaults(engine_module):
+    engine, _ = local_engine(engine_module, SCHEMA)
+
+    def denied(Key):
+        raise ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}}, 'GetItem')
+    engine.schemas_table.get_item = denied
+    assert engine._get_validator_plan('Contractors').schema == engine._get_default_schema('Contractors')
+
+
+def test_record_is_compiled_and_cached(engine_module):
+    engine, _ = local_engine(engine_module, SCHEMA)
+    plan = engine._get_validator_plan('Contractors')
+    assert plan.schema == SCHEMA
+    assert engine._get_validator_plan('Contractors') is plan
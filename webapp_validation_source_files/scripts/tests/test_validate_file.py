@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+from benchmark_validation import local_engine, synthetic_schema
+
+FILENAME = 'HC_Contratistas_P1_202401.xlsx'
+
+
+def _workbook(sheet_name, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _validate(engine_module, schema, workbook, **file_info):
+    engine_module.SCHEMA_CACHE.clear()
+    engine, s3 = local_engine(engine_module, schema)
+    s3.objects[(engine_module.EXCHANGE_BUCKET, 'P1/' + FILENAME)] = workbook
+    info = {'filename': FILENAME, 'hc_type': 'Contractors', 'size_bytes': len(workbook),
+            's3_key': 'P1/' + FILENAME, **file_info}
+    return engine.validate_file(info, 'P1', '')
+
+
+@pytest.mark.parametrize('stop_on_structure_failure', [True, False])
+def test_missing_sheet_fails_structure_and_skips_data_checks(engine_module, stop_on_structure_failure):
+    schema = {**synthetic_schema(6), 'error_budget': {'stop_on_structure_failure': stop_on_structure_failure}}
+    workbook = _workbook('Sheet1', [['company_name'], ['Acme Corp']])
+    results = _validate(engine_module, schema, workbook)
+
+    assert results['status'] == 'FAILED'
+    structure = results['validations']['structure']
+    assert structure['status'] == 'FAILED'
+    assert structure['errors'][0]['found_sheets'] == ['Sheet1']
+    for name in ('data_types', 'uniqueness', 'business_rules'):
+        assert results['validations'][name]['status'] == 'SKIPPED'
+
+
+def test_structure_failure_still_scans_rows_when_configured(engine_module):
+    schema = {**synthetic_schema(6), 'error_budget': {'stop_on_structure_failure': False}}
+    names = [field['name'] for field in schema['fields']]
+    workbook = _workbook(schema['required_sheet'], [names + ['extra'], ['AB', 'EMP0000001', 'a@b.com',
+                                                                       '2020-01-01', None, None, 'x']])
+    results = _validate(engine_module, schema, workbook)
+
+    assert results['validations']['structure']['status'] == 'FAILED'
+    assert results['validations']['data_types']['status'] == 'FAILED'
+
+
+def test_incremental_run_refreshes_baseline_after_full_run_of_same_content(engine_module, tmp_path):
+    from benchmark_validation import generate_workbook
+
+    first, second = tmp_path / 'first.xlsx', tmp_path / 'second.xlsx'
+    schema = generate_workbook(str(first), rows=30, columns=6)['schema']
+    generate_workbook(str(second), rows=31, columns=6)
+    engine_module.SCHEMA_CACHE.clear()
+    engine, s3 = local_engine(engine_module, schema)
+    index_key = (engine_module.STATE_BUCKET, 'row-index/Contractors/P1.npz')
+
+    def validate(path, **extra):
+        workbook = path.read_bytes()
+        s3.objects[(engine_module.EXCHANGE_BUCKET, 'P1/' + FILENAME)] = workbook
+        info = {'filename': FILENAME, 'hc_type': 'Contractors', 'size_bytes': len(workbook),
+                's3_key': 'P1/' + FILENAME, **extra}
+        return engine.validate_file(info, 'P1', '')
+
+    assert validate(first, incremental=True)['status'] == 'PASSED'
+    first_index = s3.objects[index_key]
+    assert validate(second)['result_cache']['hit'] is False
+
+    # Content already validated in full: the incremental run still scans and moves the baseline
+    results = validate(second, incremental=True)
+    assert results['result_cache']['hit'] is False
+    assert results['delta'] == {'baseline': True, 'added': 1, 'changed': 0, 'removed': 0,
+                                'unchanged': 30, 'rows_validated': 1}
+    assert s3.objects[index_key] != first_index
+
+    # The full result stored before is still served to full runs
+    assert validate(second)['result_cache']['hit'] is True